@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react"
+import React, { useState, useEffect, useRef } from "react"
 import "./style.css"
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "./components/ui/card"
 import { Button } from "./components/ui/button"
@@ -7,9 +7,11 @@ import { Label } from "./components/ui/label"
 
 function SidePanel() {
   const [selectedText, setSelectedText] = useState("")
-  const [searchResults, setSearchResults] = useState([])
+  const [searchResults, setSearchResults] = useState<any[]>([])
   const [isLoading, setIsLoading] = useState(false)
   const [hasServerError, setHasServerError] = useState(false)
+  // 目前搜尋的編號，舊搜尋的串流事件會被忽略
+  const searchIdRef = useRef(0)
   // 內部解析後的參數物件
   const parseQueryParams = (text: string) => {
     try {
@@ -46,10 +48,44 @@ function SidePanel() {
     return obj
   }
 
+  // 讀取 Server-Sent Events 串流，每個事件呼叫一次 onEvent
+  const readEventStream = async (
+    body: ReadableStream<Uint8Array>,
+    onEvent: (event: string, data: any) => boolean
+  ) => {
+    const reader = body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ""
+    try {
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        let boundary = buffer.indexOf("\n\n")
+        while (boundary >= 0) {
+          const block = buffer.slice(0, boundary)
+          buffer = buffer.slice(boundary + 2)
+          let event = "message"
+          let data = ""
+          for (const line of block.split("\n")) {
+            if (line.startsWith("event:")) event = line.slice(6).trim()
+            else if (line.startsWith("data:")) data += line.slice(5).trim()
+          }
+          // onEvent 返回 false 時停止讀取 (例如已開始新的搜尋)
+          if (data && !onEvent(event, JSON.parse(data))) return
+          boundary = buffer.indexOf("\n\n")
+        }
+      }
+    } finally {
+      reader.cancel().catch(() => {})
+    }
+  }
+
   // 搜索功能
   const handleSearch = async (textToSearch: string) => {
     if (!textToSearch.trim()) return
 
+    const searchId = ++searchIdRef.current
     setIsLoading(true)
     setSearchResults([]) // 開始新搜尋前清空舊結果
     setHasServerError(false) // 重置錯誤狀態
@@ -76,21 +112,39 @@ function SidePanel() {
         params.query = textToSearch
       }
 
+      // 桌面程式支援以 Server-Sent Events 逐批返回結果，其他後端仍返回 JSON
       const response = await fetch(backendUrl, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", Accept: "text/event-stream, application/json" },
         body: JSON.stringify(params)
       })
 
-      const data = await response.json()
-      setSearchResults(data.results || [])
+      const contentType = response.headers.get("Content-Type") || ""
+      if (contentType.includes("text/event-stream") && response.body) {
+        // 每個 results 事件立即加入列表，不必等整個搜尋完成
+        await readEventStream(response.body, (event, data) => {
+          if (searchId !== searchIdRef.current) return false
+          if (event === "results") {
+            setSearchResults((prev) => [...prev, ...(data.results || [])])
+            setIsLoading(false)
+          } else if (event === "error") {
+            throw new Error(data.error)
+          }
+          return true
+        })
+      } else {
+        const data = await response.json()
+        if (searchId !== searchIdRef.current) return
+        setSearchResults(data.results || [])
+      }
       setHasServerError(false) // 清除錯誤狀態
     } catch (error) {
+      if (searchId !== searchIdRef.current) return
       console.error("Search error:", error)
       setSearchResults([])
       setHasServerError(true) // 設置網路錯誤標記
     } finally {
-      setIsLoading(false)
+      if (searchId === searchIdRef.current) setIsLoading(false)
     }
   }
 
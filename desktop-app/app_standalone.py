@@ -4,18 +4,30 @@ Everything Flask 搜尋應用程式 - 打包版本入口點
 """
 import sys
 import os
-import webbrowser
 import threading
 import time
+from utils.startup_profile import StartupTimeline
+
+# 啟動時間軸 - 從這裡開始計時 (--startup-profile 輸出，/status 的 startup 欄位)
+STARTUP = StartupTimeline()
+
 import socket
 import signal
 import atexit
-import yaml
 import logging
-import logging.handlers
-from filelock import FileLock
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_cors import CORS
+from utils.search_backend import SearchBackendRegistry, register_default_backends
+from utils.result_cache import create_result_cache
+from utils.query_refiner import QueryRefiner
+from utils.result_batch import TIME_FORMAT_ISO, ResultBatch, parse_fields, parse_time_format, results_to_dicts
+from utils.pagination import MAX_PAGE_SIZE, decode_cursor, next_cursor, parse_limit, parse_offset
+from utils.ranking import SORT_RELEVANCE, create_ranker, parse_sort, ranking_fields
+from utils.result_stream import SSE_CONTENT_TYPE, STREAM_FORMATS, StreamStats, iter_sse, iter_stream
+# yaml、filelock、logging.handlers、webbrowser 與伺服器引擎只在用到的函式中匯入，
+# 搜尋後端模組則由註冊表在探測時才匯入
+
+STARTUP.mark('imports')
 
 # 確保資源路徑正確
 
@@ -45,13 +57,47 @@ def load_config():
             'host': '127.0.0.1',
             'port': 5000,
             'debug': False,
-            'use_reloader': False
+            'use_reloader': False,
+            'engine': 'waitress',
+            'threads': 8,
+            'backlog': 64,
+            'keep_alive': 15,
+            'shutdown_timeout': 5
         },
         'app': {
             'name': 'Everything Flask 搜尋應用程式',
             'auto_open_browser': True,
             'browser_delay': 2
         },
+        'local_index': {
+            'enabled': True,
+            'roots': ['~'],
+            'exclude': ['.git', 'node_modules', '__pycache__', '$Recycle.Bin'],
+            'follow_symlinks': False,
+            'index_file': 'local_index.lewidx',
+            'save_interval': 600,
+            'refresh_on_start': True,
+            'watch': True,
+            'watch_mode': 'auto',
+            'poll_interval': 60,
+            'trigram_index': True
+        },
+        'simple_search': {
+            'use_powershell': False,
+            'shell_workers': 2
+        },
+        'cache': {
+            'enabled': True,
+            'max_entries': 1024,
+            'max_memory_mb': 32,
+            'ttl': 30,
+            'refine': True
+        },
+        'ranking': {
+            'candidates': 1000,
+            'batch_candidates': 20,
+            'recency_half_life_days': 180
+        },
         'logging': {
             'level': 'INFO',
             'enable_file': True,
@@ -66,6 +112,7 @@ def load_config():
 
     try:
         if os.path.exists(config_path):
+            import yaml
             with open(config_path, 'r', encoding='utf-8') as f:
                 config = yaml.safe_load(f)
                 # 合併默認配置和載入的配置
@@ -110,15 +157,103 @@ server:
   # 是否使用自動重載 (生產環境建議設為 false)
   use_reloader: false
 
+  # 伺服器引擎: waitress (預設，未安裝時改用 werkzeug)、werkzeug 或 development (開發伺服器)
+  # debug 或 use_reloader 為 true 時一律使用開發伺服器
+  engine: 'waitress'
+
+  # 同時處理請求的執行緒數量
+  threads: 8
+
+  # 等待接受的連線佇列長度
+  backlog: 64
+
+  # 閒置的 keep-alive 連線保留秒數
+  keep_alive: 15
+
+  # 關閉時等待進行中請求完成的秒數
+  shutdown_timeout: 5
+
 app:
   # 應用程式名稱
   name: 'Everything Flask 搜尋應用程式'
   
     # 是否啟動後自動開啟瀏覽器 (true=自動開啟, false=不自動開啟)
     auto_open_browser: true
-    # 瀏覽器自動開啟延遲時間 (秒)
+    # 開啟瀏覽器前最多等待伺服器啟動的時間 (秒)，伺服器開始監聽後立即開啟
     browser_delay: 2
 
+local_index:
+  # 其他搜尋引擎都不可用時，是否建立本機檔名索引 (適用於 Linux / 無 Windows 環境)
+  enabled: true
+
+  # 要索引的根目錄
+  roots:
+    - '~'
+
+  # 略過的目錄名稱
+  exclude:
+    - '.git'
+    - 'node_modules'
+    - '__pycache__'
+    - '$Recycle.Bin'
+
+  # 是否跟隨符號連結目錄
+  follow_symlinks: false
+
+  # 索引檔名 (保存在 config.yml 同目錄，下次啟動以 mmap 直接載入)
+  index_file: 'local_index.lewidx'
+
+  # 有變更時自動保存索引的間隔 (秒)
+  save_interval: 600
+
+  # 載入已保存的索引後是否在背景重新爬取 (watch 為 true 時改以目錄 mtime 比對補上變更)
+  refresh_on_start: true
+
+  # 是否監看檔案變更並增量更新索引
+  watch: true
+
+  # 監看方式: auto (Linux 使用 inotify，其他平台輪詢), inotify, polling
+  watch_mode: 'auto'
+
+  # 輪詢比對目錄 mtime 的間隔 (秒)
+  poll_interval: 60
+
+  # 是否在背景建立 trigram 子字串索引 (查詢只驗證候選項目，約需名稱池 1~2 倍的記憶體)
+  trigram_index: true
+
+simple_search:
+  # 是否改用常駐的 PowerShell 行程執行 Get-ChildItem (預設以平行爬蟲直接遍歷目錄)
+  use_powershell: false
+
+  # PowerShell 模式最多同時存在的 PowerShell 行程數量
+  shell_workers: 2
+
+cache:
+  # 是否快取搜尋結果 (重複查詢直接由記憶體返回)
+  enabled: true
+
+  # 最多快取的查詢數量
+  max_entries: 1024
+
+  # 快取估計記憶體上限 (MB)，超過時淘汰最久未使用的結果
+  max_memory_mb: 32
+
+  # 結果有效秒數 (本機索引更新時也會立即失效)
+  ttl: 30
+
+  # 逐字輸入時，以同一用戶端前一次的完整結果在記憶體中縮小延伸查詢
+  refine: true
+
+ranking:
+  # sort=relevance 時向搜尋引擎取得的候選結果數量 (只在這些結果中排序與分頁)
+  candidates: 1000
+
+  # 批次查詢 top1 模式每個詞語的候選結果數量
+  batch_candidates: 20
+
+  # 修改時間加權的半衰期 (天)
+  recency_half_life_days: 180
+
 logging:
   # 日誌級別: DEBUG, INFO, WARNING, ERROR, CRITICAL
   level: 'INFO'
@@ -199,11 +334,12 @@ def setup_logging(config):
                 os.makedirs(log_dir, exist_ok=True)
 
             # 創建旋轉文件處理器
+            from logging.handlers import RotatingFileHandler
             max_size = log_config.get(
                 'max_size', 10) * 1024 * 1024  # 轉換為 bytes
             backup_count = log_config.get('backup_count', 5)
 
-            file_handler = logging.handlers.RotatingFileHandler(
+            file_handler = RotatingFileHandler(
                 log_path,
                 maxBytes=max_size,
                 backupCount=backup_count,
@@ -227,76 +363,199 @@ def setup_logging(config):
 
 # 載入配置
 CONFIG = load_config()
+STARTUP.mark('config')
 
 # 設置日誌系統
 APP_LOGGER = setup_logging(CONFIG)
+STARTUP.mark('logging')
 
 
-# 嘗試載入 Everything SDK 並建立實例
-everything_sdk_instance = None
-mock_sdk_instance = None
-windows_search_instance = None
-simple_windows_search_instance = None
-
-APP_LOGGER.info("開始初始化搜尋引擎...")
-
-try:
-    from utils.everything_sdk import get_everything_sdk
-    EVERYTHING_AVAILABLE = True
-    DEMO_MODE = False
-    WINDOWS_SEARCH_MODE = False
-    SIMPLE_SEARCH_MODE = False
-    # 建立 SDK 實例 (單例)
-    everything_sdk_instance = get_everything_sdk()
-    APP_LOGGER.info("✓ Everything SDK 載入成功")
-    print("✓ Everything SDK 載入成功")
-except Exception as e:
-    APP_LOGGER.warning(f"Everything SDK 載入失敗: {e}")
-    print(f"⚠ Everything SDK 載入失敗: {e}")
-
-    # 嘗試使用 Windows Search API 作為備用
-    try:
-        from utils.windows_search_api import get_windows_search_api
-        windows_search_instance = get_windows_search_api()
-
-        # 測試 Windows Search API 是否可用
-        if windows_search_instance.is_windows_search_available():
-            EVERYTHING_AVAILABLE = False
-            DEMO_MODE = False
-            WINDOWS_SEARCH_MODE = True
-            SIMPLE_SEARCH_MODE = False
-            print("✓ 使用 Windows Search API 作為備用搜索引擎")
-        else:
-            raise RuntimeError("Windows Search API 不可用")
+# 搜尋後端註冊表 - 每次請求時依備援順序選擇可用的後端
+SEARCH_REGISTRY = register_default_backends(
+    SearchBackendRegistry(), CONFIG,
+    data_dir=os.path.dirname(get_resource_path('config.yml')))
+
+# 批次查詢的模式與詞語數量上限
+BATCH_MODES = ('top1', 'count')
+MAX_BATCH_TERMS = 1000
+
+# Server-Sent Events 每個批次的筆數 (第一批由後端盡快送出)
+SSE_BATCH_SIZE = 100
+
+# 搜尋結果快取 - 包在所有後端前面
+RESULT_CACHE = create_result_cache(CONFIG.get('cache'))
+
+# 增量查詢縮小 - 延伸查詢直接過濾同一用戶端先前的完整結果
+QUERY_REFINER = QueryRefiner(ttl=RESULT_CACHE.ttl,
+                             enabled=bool(CONFIG.get('cache', {}).get('refine', True)))
+
+# 相關度排序 - sort=relevance 與批次查詢的 top1 模式使用
+RANKER = create_ranker(CONFIG.get('ranking'))
+STARTUP.mark('registry')
+
+
+def get_search_backend(preferred=None):
+    """取得本次請求要使用的搜尋後端"""
+    backend = SEARCH_REGISTRY.get_active_backend(preferred)
+    APP_LOGGER.debug(f"使用 {backend.display_name} 執行搜尋")
+    return backend
+
+
+def run_search(backend, query, max_results, fields=None, offset=0):
+    """
+    透過增量縮小與結果快取執行搜尋 (fields 為要求的結果欄位，None 代表全部)
+
+    Returns:
+        (results, total_count, source)：source 為 'backend'、'cache' 或 'refined'
+    """
+    client = request.headers.get('X-Client-Id') or request.remote_addr
+    cached = False
+
+    def backend_search():
+        if offset and not backend.supports_offset:
+            # 不支援位移的後端：取到本頁結尾後再切片
+            results, total_count = backend.search(query, offset + max_results, fields=fields)
+            return results[offset:], total_count
+        return backend.search(query, max_results, fields=fields, offset=offset)
+
+    def search_func():
+        nonlocal cached
+        results, total_count, cached = RESULT_CACHE.search(
+            backend, query, max_results, fields=fields, search_func=backend_search,
+            offset=offset)
+        return results, total_count
+
+    results, total_count, refined = QUERY_REFINER.search(
+        backend, query, max_results, client, search_func, fields=fields, offset=offset)
+    source = 'refined' if refined else 'cache' if cached else 'backend'
+    return results, total_count, source
+
+
+def run_ranked_search(backend, query, max_results, fields=None, offset=0):
+    """
+    依相關度排序的搜尋：向後端取得候選結果 (經過快取與增量縮小)，再以有界堆積選出前 offset + max_results 名
+
+    Returns:
+        (results, total_count, source, ranked_count)：ranked_count 為參與排序的候選數量 (可分頁的上限)
+    """
+    candidates, total_count, source = run_search(
+        backend, query, max(RANKER.candidates, max_results), ranking_fields(fields))
+    ranked = RANKER.rank(candidates, query, offset + max_results)
+    return ranked[offset:], total_count, source, len(candidates)
+
+
+def parse_flag(value) -> bool:
+    """解析布林參數 (JSON 的 true 或查詢字串的 1 / true / yes / on)"""
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def run_count(backend, query):
+    """
+    只取得結果總數 (backend.count()，不建立任何結果物件)
+
+    Returns:
+        (total_count, cached)
+    """
+    return RESULT_CACHE.count(backend, query)
+
+
+def wants_event_stream():
+    """請求是否要以 Server-Sent Events 逐批接收結果"""
+    return (request.path == '/search/events'
+            or 'text/event-stream' in request.headers.get('Accept', ''))
+
+
+def combine_batches(batches):
+    """串接事件串流送出的批次 (ResultBatch 或結果列表)，供存入結果快取"""
+    if batches and all(isinstance(batch, ResultBatch) for batch in batches):
+        return ResultBatch.concat(batches)
+    return [result for batch in batches for result in batch]
 
-    except Exception as ws_error:
-        print(f"⚠ Windows Search API 也無法使用: {ws_error}")
 
-        # 嘗試使用簡化的 Windows Search
+def search_event_stream(backend, query, max_results, fields=None, time_format=TIME_FORMAT_ISO,
+                        page=None, offset=0, next_page=None):
+    """
+    以 Server-Sent Events 送出結果
+
+    page 為 None 時逐批送出 backend.iter_search_batches() 的結果：第一個 results 事件在後端產生第一批結果後
+    立即送出，完整送出的結果會存入結果快取。page 為一般搜尋路徑已取得的 (results, total_count, source) 時
+    (快取命中、相關度排序、分頁或快速的後端)，以單一 results 事件送出。最後以 summary 事件提供總數與計時。
+    """
+    stats = StreamStats()
+    mode_flags = get_backend_mode_flags(backend)
+    collected = []
+    if page is None:
+        source = 'backend'
+        batches = backend.iter_search_batches(query, SSE_BATCH_SIZE, fields, max_results)
+    else:
+        results, page_total, source = page
+        batches = iter([results])
+
+    def collect(batches):
+        for batch in batches:
+            collected.append(batch)
+            yield batch
+
+    def summary(stats):
+        if page is not None:
+            total_count = page_total
+            truncated = offset + stats.rows < total_count
+        else:
+            total_count = stats.rows
+            truncated = stats.rows >= max_results
+            exact = not truncated
+            if truncated and backend.supports_count_only:
+                # 結果被截斷時另外取得真正的總數 (計數查詢不建立結果物件)
+                try:
+                    total_count, _ = run_count(backend, query)
+                    exact = True
+                except Exception as e:
+                    APP_LOGGER.warning(f"取得結果總數失敗: {e}")
+            if exact:
+                # summary 只在全部批次都已送出後呼叫；總數確定時結果可供之後的搜尋使用
+                RESULT_CACHE.store(backend, query, max_results, combine_batches(collected),
+                                   total_count, fields)
+        return {
+            'query': query,
+            'total_count': total_count,
+            'truncated': truncated,
+            'offset': offset,
+            'next_cursor': next_page,
+            'search_engine': backend.display_name,
+            'cached': source == 'cache',
+            'refined': source == 'refined',
+            'demo_mode': mode_flags['demo_mode'],
+            'windows_search_mode': mode_flags['windows_search_mode'],
+            'simple_search_mode': mode_flags['simple_search_mode'],
+        }
+
+    def generate():
         try:
-            from utils.simple_windows_search import get_simple_windows_search
-            simple_windows_search_instance = get_simple_windows_search()
-
-            if simple_windows_search_instance.is_windows_search_available():
-                EVERYTHING_AVAILABLE = False
-                DEMO_MODE = False
-                WINDOWS_SEARCH_MODE = False
-                SIMPLE_SEARCH_MODE = True
-                print("✓ 使用簡化 Windows Search 作為備用搜索引擎")
-            else:
-                raise RuntimeError("簡化 Windows Search 不可用")
+            yield from iter_sse(collect(batches), fields, stats, summary, time_format)
+        finally:
+            close = getattr(batches, 'close', None)
+            if close is not None:
+                close()
+            APP_LOGGER.info(
+                f"事件串流搜尋結束: 返回 {stats.rows} 個結果 ({stats.batches} 批)，"
+                f"第一批 {stats.first_batch_ms()} ms，共 {stats.elapsed_ms()} ms ({source})")
 
-        except Exception as sws_error:
-            print(f"⚠ 簡化 Windows Search 也無法使用: {sws_error}")
-            EVERYTHING_AVAILABLE = False
-            DEMO_MODE = True
-            WINDOWS_SEARCH_MODE = False
-            SIMPLE_SEARCH_MODE = False
-            print("  應用程式將以示範模式運行")
+    # X-Accel-Buffering 讓反向代理不要緩衝事件
+    return Response(generate(), content_type=SSE_CONTENT_TYPE,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def get_backend_mode_flags(backend):
+    """取得與舊版 API 相容的搜尋模式旗標"""
+    return {
+        'everything_available': backend.name == 'everything',
+        'demo_mode': backend.name == 'demo',
+        'windows_search_mode': backend.name == 'windows_search',
+        'simple_search_mode': backend.name == 'simple_search',
+    }
 
-            # 載入示範模組並建立實例
-            from utils.mock_everything import get_mock_everything_sdk
-            mock_sdk_instance = get_mock_everything_sdk()
 
 # 設定 Flask 應用程式
 app = Flask(__name__,
@@ -312,20 +571,57 @@ def index():
 
 
 @app.route('/search', methods=['GET', 'POST'])
+@app.route('/search/events', methods=['GET', 'POST'])
 def search():
-    """搜尋 API 端點"""
+    """搜尋 API 端點 (/search/events 或 Accept: text/event-stream 時以 Server-Sent Events 逐批返回)"""
     try:
         APP_LOGGER.debug("收到搜尋請求")
 
         if request.method == 'GET':
             query = request.args.get('q', '')
-            max_results = int(request.args.get('max', 50))
+            requested_max = request.args.get('max')
+            max_name = 'max'
+            preferred_backend = request.args.get('backend')
+            requested_fields = request.args.get('fields')
+            requested_offset = request.args.get('offset')
+            cursor = request.args.get('cursor')
+            count_only = parse_flag(request.args.get('count_only'))
+            requested_time_format = request.args.get('time_format')
+            requested_sort = request.args.get('sort')
         else:  # POST
             data = request.get_json()
             query = data.get('query', '')
-            max_results = int(data.get('max_results', 50))
+            requested_max = data.get('max_results')
+            max_name = 'max_results'
+            preferred_backend = data.get('backend')
+            requested_fields = data.get('fields')
+            requested_offset = data.get('offset')
+            cursor = data.get('cursor')
+            count_only = parse_flag(data.get('count_only'))
+            requested_time_format = data.get('time_format')
+            requested_sort = data.get('sort')
 
-        APP_LOGGER.info(f"搜尋查詢: '{query}', 最大結果數: {max_results}")
+        try:
+            max_results = parse_limit(requested_max, 50, max_name)
+            fields = parse_fields(requested_fields)
+            time_format = parse_time_format(requested_time_format)
+            offset = parse_offset(requested_offset)
+            sort = parse_sort(requested_sort)
+            if cursor:
+                # cursor 帶有上一頁的查詢、位移、每頁筆數、後端、欄位與排序方式
+                page = decode_cursor(cursor)
+                query, offset, max_results = page['query'], page['offset'], page['limit']
+                fields = page['fields']
+                sort = parse_sort(page['sort'])
+                preferred_backend = preferred_backend or page['backend']
+        except ValueError as e:
+            APP_LOGGER.warning(f"搜尋請求的參數無效: {e}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+
+        APP_LOGGER.info(f"搜尋查詢: '{query}', 最大結果數: {max_results}, 位移: {offset}, 排序: {sort}")
 
         if not query:
             APP_LOGGER.warning("搜尋請求缺少查詢參數")
@@ -334,34 +630,61 @@ def search():
                 'error': '請提供搜尋查詢'
             }), 400
 
-        # 限制最大結果數
-        max_results = min(max_results, 500)
+        # 限制每頁最大結果數 (更深的結果以 offset / cursor 取得)
+        max_results = min(max_results, MAX_PAGE_SIZE)
+
+        backend = get_search_backend(preferred_backend)
+        mode_flags = get_backend_mode_flags(backend)
+        if count_only:
+            # 只返回總數，不建立任何結果物件
+            start_time = time.time()
+            total_count, cached = run_count(backend, query)
+            APP_LOGGER.info(
+                f"計數完成: 共 {total_count} 個結果，耗時 {time.time() - start_time:.3f} 秒")
+            return jsonify({
+                'success': True,
+                'query': query,
+                'results': [],
+                'total_count': total_count,
+                'displayed_count': 0,
+                'count_only': True,
+                'search_engine': backend.display_name,
+                'cached': cached,
+                'demo_mode': mode_flags['demo_mode'],
+                'windows_search_mode': mode_flags['windows_search_mode'],
+                'simple_search_mode': mode_flags['simple_search_mode']
+            })
+        event_stream = wants_event_stream()
+        if event_stream and backend.streams_progressively and sort != SORT_RELEVANCE and not offset \
+                and RESULT_CACHE.peek(backend, query, max_results, fields) is None:
+            # 慢速後端逐批送出，第一批結果不必等整個搜尋完成
+            return search_event_stream(backend, query, max_results, fields, time_format)
 
         # 執行搜尋
         start_time = time.time()
 
-        if DEMO_MODE:
-            APP_LOGGER.debug("使用示範模式執行搜尋")
-            results, total_count = mock_sdk_instance.search(query, max_results)
-        elif WINDOWS_SEARCH_MODE:
-            APP_LOGGER.debug("使用 Windows Search API 執行搜尋")
-            results, total_count = windows_search_instance.search(
-                query, max_results)
-        elif SIMPLE_SEARCH_MODE:
-            APP_LOGGER.debug("使用簡化搜尋模式執行搜尋")
-            results, total_count = simple_windows_search_instance.search(
-                query, max_results)
+        if sort == SORT_RELEVANCE:
+            results, total_count, source, ranked_count = run_ranked_search(
+                backend, query, max_results, fields, offset)
         else:
-            APP_LOGGER.debug("使用 Everything SDK 執行搜尋")
-            results, total_count = everything_sdk_instance.search(
-                query, max_results)
+            results, total_count, source = run_search(backend, query, max_results, fields, offset)
+            ranked_count = total_count
 
         search_time = time.time() - start_time
         APP_LOGGER.info(
-            f"搜尋完成: 找到 {total_count} 個結果，返回 {len(results)} 個，耗時 {search_time:.3f} 秒")
+            f"搜尋完成: 找到 {total_count} 個結果，返回 {len(results)} 個，耗時 {search_time:.3f} 秒"
+            f" ({source})")
+
+        cursor_token = next_cursor(query, offset, max_results, len(results),
+                                   min(total_count, ranked_count), backend.name, fields, sort)
+        if event_stream:
+            # 其他情況 (快取命中、相關度排序、分頁或快速的後端) 走一般搜尋路徑，以單一 results 事件送出
+            return search_event_stream(backend, query, max_results, fields, time_format,
+                                       page=(results, total_count, source), offset=offset,
+                                       next_page=cursor_token)
 
         # 轉換結果為字典格式
-        results_data = [result.to_dict() for result in results]
+        results_data = results_to_dicts(results, fields, time_format)
 
         return jsonify({
             'success': True,
@@ -369,9 +692,15 @@ def search():
             'results': results_data,
             'total_count': total_count,
             'displayed_count': len(results_data),
-            'demo_mode': DEMO_MODE,
-            'windows_search_mode': WINDOWS_SEARCH_MODE if 'WINDOWS_SEARCH_MODE' in globals() else False,
-            'simple_search_mode': SIMPLE_SEARCH_MODE if 'SIMPLE_SEARCH_MODE' in globals() else False
+            'offset': offset,
+            'sort': sort,
+            'next_cursor': cursor_token,
+            'search_engine': backend.display_name,
+            'cached': source == 'cache',
+            'refined': source == 'refined',
+            'demo_mode': mode_flags['demo_mode'],
+            'windows_search_mode': mode_flags['windows_search_mode'],
+            'simple_search_mode': mode_flags['simple_search_mode']
         })
 
     except Exception as e:
@@ -382,33 +711,180 @@ def search():
         }), 500
 
 
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    """
+    批次查詢多個詞語 (頁面連結偵測使用)
+
+    請求: {"terms": [...], "mode": "top1" | "count", "fields": [...], "backend": ..., "sort": ...}
+    回應的 results 以詞語為鍵: {"count": 總數, "match": 最佳結果 (僅 top1 模式)}
+    top1 模式預設取每個詞語的前幾筆候選結果並依相關度選出最佳結果；"sort": "backend" 時直接使用後端的第一筆
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        terms = data.get('terms')
+        mode = data.get('mode', 'top1')
+        if not isinstance(terms, list):
+            return jsonify({'success': False, 'error': '請以 terms 列表提供查詢詞語'}), 400
+        if mode not in BATCH_MODES:
+            return jsonify({
+                'success': False,
+                'error': f"不支援的模式: {mode}；可用模式: {', '.join(BATCH_MODES)}"
+            }), 400
+        try:
+            fields = parse_fields(data.get('fields'))
+            time_format = parse_time_format(data.get('time_format'))
+            sort = parse_sort(data.get('sort'), SORT_RELEVANCE)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        # 去除空白與重複的詞語，保留原順序
+        unique_terms = list(dict.fromkeys(
+            term.strip() for term in terms if isinstance(term, str) and term.strip()))
+        if len(unique_terms) > MAX_BATCH_TERMS:
+            return jsonify({
+                'success': False,
+                'error': f'一次最多查詢 {MAX_BATCH_TERMS} 個詞語'
+            }), 400
+
+        start_time = time.time()
+        backend = get_search_backend(data.get('backend'))
+        if mode == 'count':
+            # 計數模式只需要總數，不建立任何結果物件
+            outcomes = RESULT_CACHE.count_many(backend, unique_terms)
+        elif sort == SORT_RELEVANCE:
+            outcomes = RESULT_CACHE.search_many(
+                backend, unique_terms, RANKER.batch_candidates, ranking_fields(fields))
+        else:
+            outcomes = RESULT_CACHE.search_many(backend, unique_terms, 1, fields)
+
+        results = {}
+        cached_count = 0
+        for term, outcome in zip(unique_terms, outcomes):
+            if isinstance(outcome, Exception):
+                results[term] = {'error': str(outcome)}
+                continue
+            if mode == 'count':
+                total_count, cached = outcome
+                results[term] = {'count': total_count}
+            else:
+                matches, total_count, cached = outcome
+                if sort == SORT_RELEVANCE:
+                    matches = RANKER.rank(matches, term, 1)
+                match = results_to_dicts(matches[:1], fields, time_format)[0] if len(matches) else None
+                results[term] = {'count': total_count, 'match': match}
+            cached_count += cached
+
+        search_time = time.time() - start_time
+        APP_LOGGER.info(
+            f"批次查詢完成: {len(unique_terms)} 個詞語 ({cached_count} 個來自快取)，"
+            f"模式 {mode}，耗時 {search_time:.3f} 秒")
+
+        return jsonify({
+            'success': True,
+            'mode': mode,
+            'sort': sort if mode == 'top1' else None,
+            'results': results,
+            'term_count': len(unique_terms),
+            'cached_count': cached_count,
+            'search_engine': backend.display_name,
+            'elapsed_ms': round(search_time * 1000, 1),
+        })
+
+    except Exception as e:
+        APP_LOGGER.error(f"批次查詢時發生錯誤: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/search/stream')
+def search_stream():
+    """串流匯出搜尋結果 (NDJSON 或 CSV)，不限筆數，伺服器端只保留一個批次"""
+    query = request.args.get('q', '')
+    format_name = request.args.get('format', 'ndjson').lower()
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        time_format = parse_time_format(request.args.get('time_format'))
+        # 未指定或為 0 時不限筆數
+        max_results = parse_limit(request.args.get('limit'), 0) or None
+        batch_size = min(max(parse_limit(request.args.get('batch_size'), 1000, 'batch_size'), 1), 10000)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if not query:
+        return jsonify({'success': False, 'error': '請提供搜尋查詢'}), 400
+    if format_name not in STREAM_FORMATS:
+        return jsonify({
+            'success': False,
+            'error': f"不支援的格式: {format_name}；可用格式: {', '.join(STREAM_FORMATS)}"
+        }), 400
+
+    backend = get_search_backend(request.args.get('backend'))
+    APP_LOGGER.info(f"串流搜尋: '{query}', 格式: {format_name}, 後端: {backend.display_name}")
+
+    # 先取得第一個批次，讓後端錯誤仍能以一般的錯誤回應返回
+    try:
+        batches = iter(backend.iter_search_batches(query, batch_size, fields, max_results))
+        first = next(batches, None)
+    except Exception as e:
+        APP_LOGGER.error(f"串流搜尋失敗: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    def all_batches():
+        if first is not None:
+            yield first
+            yield from batches
+
+    stats = StreamStats()
+    start_time = time.time()
+
+    def generate():
+        try:
+            yield from iter_stream(format_name, all_batches(), fields, stats, time_format)
+        finally:
+            # 用戶端中斷下載時關閉產生器，讓後端停止走訪
+            close = getattr(batches, 'close', None)
+            if close is not None:
+                close()
+            APP_LOGGER.info(
+                f"串流搜尋結束: 輸出 {stats.rows} 個結果 ({stats.batches} 批)，"
+                f"耗時 {time.time() - start_time:.3f} 秒")
+
+    return Response(generate(), content_type=STREAM_FORMATS[format_name],
+                    headers={'X-Search-Engine': backend.name, 'Cache-Control': 'no-cache'})
+
+
 @app.route('/status')
 def status():
     """檢查 Everything 服務狀態"""
     try:
-        APP_LOGGER.debug("檢查 Everything 服務狀態")
+        APP_LOGGER.debug("檢查搜尋服務狀態")
+
+        backend = get_search_backend()
+        mode_flags = get_backend_mode_flags(backend)
 
-        if DEMO_MODE:
-            is_running = mock_sdk_instance.is_everything_running()
+        if backend.name == 'demo':
             message = '示範模式 - 使用模擬資料'
-            APP_LOGGER.info("狀態檢查: 示範模式")
         else:
-            is_running = everything_sdk_instance.is_everything_running()
-            message = 'Everything 正在運行' if is_running else 'Everything 未運行或無法連接'
-            APP_LOGGER.info(
-                f"狀態檢查: Everything {'運行中' if is_running else '未運行'}")
+            message = f'{backend.display_name} 正在運行'
+        APP_LOGGER.info(f"狀態檢查: {backend.display_name}")
 
-        """取得應用程式狀態"""
         return jsonify({
             'success': True,
-            'everything_available': EVERYTHING_AVAILABLE,
-            'demo_mode': DEMO_MODE,
-            'windows_search_mode': WINDOWS_SEARCH_MODE if 'WINDOWS_SEARCH_MODE' in globals() else False,
-            'simple_search_mode': SIMPLE_SEARCH_MODE if 'SIMPLE_SEARCH_MODE' in globals() else False,
-            'search_engine': ('Everything' if EVERYTHING_AVAILABLE else
-                              ('Windows Search' if WINDOWS_SEARCH_MODE else
-                               ('Simple Search' if SIMPLE_SEARCH_MODE else 'Demo'))),
+            'everything_available': mode_flags['everything_available'],
+            'demo_mode': mode_flags['demo_mode'],
+            'windows_search_mode': mode_flags['windows_search_mode'],
+            'simple_search_mode': mode_flags['simple_search_mode'],
+            'search_engine': backend.display_name,
             'message': message,
+            'backend_status': backend.status(),
+            'backends': SEARCH_REGISTRY.describe(),
+            'cache': RESULT_CACHE.stats(),
+            'refinement': QUERY_REFINER.stats(),
+            'ranking': RANKER.stats(),
+            'server': HTTP_SERVER.describe() if HTTP_SERVER is not None else {'engine': 'development'},
+            'startup': STARTUP.snapshot(),
         })
 
     except Exception as e:
@@ -423,20 +899,53 @@ def status():
 def api_search(query):
     """RESTful API 搜尋端點"""
     try:
-        max_results = int(request.args.get('limit', 50))
-
-        if DEMO_MODE:
-            results, total_count = mock_sdk_instance.search(query, max_results)
+        preferred_backend = request.args.get('backend')
+        try:
+            max_results = parse_limit(request.args.get('limit'), 50)
+            fields = parse_fields(request.args.get('fields'))
+            time_format = parse_time_format(request.args.get('time_format'))
+            offset = parse_offset(request.args.get('offset'))
+            sort = parse_sort(request.args.get('sort'))
+            cursor = request.args.get('cursor')
+            if cursor:
+                page = decode_cursor(cursor)
+                query, offset, max_results = page['query'], page['offset'], page['limit']
+                fields = page['fields']
+                sort = parse_sort(page['sort'])
+                preferred_backend = preferred_backend or page['backend']
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        max_results = min(max_results, MAX_PAGE_SIZE)
+
+        backend = get_search_backend(preferred_backend)
+        if parse_flag(request.args.get('count_only')):
+            total_count, _ = run_count(backend, query)
+            return jsonify({
+                'query': query,
+                'results': [],
+                'total': total_count,
+                'count_only': True,
+                'search_engine': backend.display_name,
+                'demo_mode': backend.name == 'demo'
+            })
+        if sort == SORT_RELEVANCE:
+            results, total_count, _, ranked_count = run_ranked_search(
+                backend, query, max_results, fields, offset)
         else:
-            results, total_count = everything_sdk_instance.search(
-                query, max_results)
+            results, total_count, _ = run_search(backend, query, max_results, fields, offset)
+            ranked_count = total_count
 
         return jsonify({
             'query': query,
-            'results': [result.to_dict() for result in results],
+            'results': results_to_dicts(results, fields, time_format),
             'total': total_count,
             'limit': max_results,
-            'demo_mode': DEMO_MODE
+            'offset': offset,
+            'sort': sort,
+            'next_cursor': next_cursor(query, offset, max_results, len(results),
+                                       min(total_count, ranked_count), backend.name, fields, sort),
+            'search_engine': backend.display_name,
+            'demo_mode': backend.name == 'demo'
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -444,8 +953,12 @@ def api_search(query):
 
 @app.route('/shutdown')
 def shutdown():
-    """關閉伺服器"""
+    """關閉伺服器 (等待進行中的請求完成)"""
     try:
+        if HTTP_SERVER is not None:
+            APP_LOGGER.info("收到關閉請求，等待進行中的請求完成...")
+            HTTP_SERVER.request_shutdown()
+            return jsonify({'message': '伺服器正在關閉'})
         func = request.environ.get('werkzeug.server.shutdown')
         if func is None:
             return jsonify({'error': '無法關閉伺服器'}), 500
@@ -465,15 +978,28 @@ def internal_error(error):
     return jsonify({'error': '內部伺服器錯誤'}), 500
 
 
+@app.after_request
+def record_first_request(response):
+    """在啟動時間軸記錄第一個請求完成的時間"""
+    if STARTUP.event('first_request'):
+        APP_LOGGER.info(f"第一個請求完成: {request.path}")
+        report_startup_profile()
+    return response
+
+
+STARTUP.mark('flask_app')
+
+
 def open_browser():
-    """延遲開啟瀏覽器"""
+    """伺服器開始監聽後開啟瀏覽器 (最多等待 browser_delay 秒)"""
+    import webbrowser
     delay = CONFIG['app']['browser_delay']
     host = CONFIG['server']['host']
     port = CONFIG['server']['port']
     url = f'http://{host}:{port}'
 
-    APP_LOGGER.info(f"等待 {delay} 秒後開啟瀏覽器...")
-    time.sleep(delay)  # 等待伺服器啟動
+    APP_LOGGER.info(f"等待伺服器啟動後開啟瀏覽器 (最多 {delay} 秒)...")
+    SERVER_READY.wait(delay)
 
     try:
         APP_LOGGER.info(f"開啟瀏覽器: {url}")
@@ -486,6 +1012,31 @@ def open_browser():
 # 全局变量保存锁对象
 app_lock = None
 
+# 目前運行的 HTTP 伺服器 (使用開發伺服器時為 None)
+HTTP_SERVER = None
+
+# 伺服器已開始監聽 (開發伺服器無法得知，開啟瀏覽器時等待 browser_delay 秒)
+SERVER_READY = threading.Event()
+
+# 是否以 --startup-profile 啟動 (輸出啟動時間軸)
+STARTUP_PROFILE = False
+_startup_report_lock = threading.Lock()
+_startup_reported = False
+
+
+def report_startup_profile():
+    """--startup-profile：探測完成且第一個請求完成後，輸出一次啟動時間軸"""
+    global _startup_reported
+    if not STARTUP_PROFILE:
+        return
+    with _startup_report_lock:
+        if _startup_reported or not (STARTUP.has_phase('probing') and STARTUP.has_event('first_request')):
+            return
+        _startup_reported = True
+    timeline = STARTUP.format()
+    APP_LOGGER.debug("\n" + timeline)
+    print(timeline)
+
 
 def check_single_instance():
     """
@@ -494,6 +1045,8 @@ def check_single_instance():
     """
     global app_lock
     try:
+        from filelock import FileLock
+
         # 使用文件锁，确保真正的单实例
         lock_file = os.path.join(os.path.dirname(
             __file__), "linkeveryword.lock")
@@ -510,6 +1063,11 @@ def check_single_instance():
         return False
 
 
+def cleanup_backends():
+    """關閉搜尋後端 (保存本機索引等)"""
+    SEARCH_REGISTRY.close()
+
+
 def cleanup_lock():
     """清理锁"""
     global app_lock
@@ -524,6 +1082,11 @@ def cleanup_lock():
 
 def signal_handler(signum, frame):
     """信号处理函数"""
+    if HTTP_SERVER is not None and not HTTP_SERVER.stopping:
+        # 第一次收到信號時正常關閉伺服器，等待進行中的請求完成
+        print(f"\n📡 接收到信號 {signum}，正在關閉伺服器...")
+        HTTP_SERVER.request_shutdown(delay=0)
+        return
     print(f"\n📡 接收到信號 {signum}，正在清理...")
     cleanup_lock()
     sys.exit(0)
@@ -533,6 +1096,7 @@ def setup_cleanup():
     """设置清理机制"""
     # 注册程序退出时的清理函数
     atexit.register(cleanup_lock)
+    atexit.register(cleanup_backends)
 
     # 注册信号处理器（仅在支持的平台上）
     try:
@@ -557,8 +1121,42 @@ def check_flask_port_available():
         return False
 
 
+def report_search_backend(probe_start):
+    """等待啟動時的探測完成後，記錄各搜尋引擎的探測結果與目前使用的引擎"""
+    start_time = time.time()
+    results = SEARCH_REGISTRY.wait_for_probes()
+    STARTUP.record('probing', probe_start, **{
+        f"{entry['name']}_ms": entry['probe_ms'] for entry in SEARCH_REGISTRY.describe()})
+    report_startup_profile()
+    for entry in SEARCH_REGISTRY.describe():
+        APP_LOGGER.info(
+            f"搜尋引擎探測: {entry['name']} - "
+            f"{'可用' if results.get(entry['name']) else entry['error'] or '不可用'}"
+            f" ({entry['probe_ms']} ms)")
+    backend = SEARCH_REGISTRY.get_active_backend()
+    APP_LOGGER.info(
+        f"目前使用的搜尋引擎: {backend.display_name} (探測共 {time.time() - start_time:.3f} 秒)")
+
+    if backend.name == 'demo':
+        APP_LOGGER.warning("以示範模式運行 - Everything SDK 不可用")
+        print("⚠ 以示範模式運行 - Everything SDK 不可用")
+        print("要使用完整功能，請:")
+        print("1. 安裝 Everything 搜尋引擎")
+        print("2. 啟動 Everything")
+        print("3. 重新啟動此應用程式")
+    elif backend.name == 'everything':
+        APP_LOGGER.info("Everything SDK 已載入，準備提供搜尋服務")
+        print("✓ Everything SDK 已載入")
+        print("請確保 Everything 搜尋引擎正在運行")
+    else:
+        print(f"✓ 使用 {backend.display_name} 作為備用搜索引擎")
+        print("搜尋引擎會在每次請求時重新選擇，啟動 Everything 後即可自動切換")
+
+
 def main():
     """主函數"""
+    global HTTP_SERVER, STARTUP_PROFILE
+    STARTUP_PROFILE = '--startup-profile' in sys.argv[1:]
     APP_LOGGER.info("=" * 60)
     APP_LOGGER.info("🚀 LinkEveryWord Desktop App 啟動")
     APP_LOGGER.info("=" * 60)
@@ -602,17 +1200,16 @@ def main():
     print("🔍 Everything Flask 搜尋應用程式")
     print("=" * 60)
 
-    if DEMO_MODE:
-        APP_LOGGER.warning("以示範模式運行 - Everything SDK 不可用")
-        print("⚠ 以示範模式運行 - Everything SDK 不可用")
-        print("要使用完整功能，請:")
-        print("1. 安裝 Everything 搜尋引擎")
-        print("2. 啟動 Everything")
-        print("3. 重新啟動此應用程式")
-    else:
-        APP_LOGGER.info("Everything SDK 已載入，準備提供搜尋服務")
-        print("✓ Everything SDK 已載入")
-        print("請確保 Everything 搜尋引擎正在運行")
+    STARTUP.mark('instance_check')
+
+    # 所有搜尋引擎在背景並行探測，伺服器不必等待即可開始監聽
+    APP_LOGGER.info("開始並行探測搜尋引擎...")
+    probe_start = STARTUP.now()
+    SEARCH_REGISTRY.start_probes()
+    report_thread = threading.Thread(target=report_search_backend, args=(probe_start,),
+                                     name='backend-report')
+    report_thread.daemon = True
+    report_thread.start()
 
     host = CONFIG['server']['host']
     port = CONFIG['server']['port']
@@ -636,14 +1233,28 @@ def main():
 
     try:
         # 啟動 Flask 應用程式
+        from utils.wsgi_server import create_server
         server_config = CONFIG['server']
-        APP_LOGGER.info("啟動 Flask Web 服務器...")
-        app.run(
-            debug=server_config['debug'],
-            host=server_config['host'],
-            port=server_config['port'],
-            use_reloader=server_config['use_reloader']
-        )
+        HTTP_SERVER = create_server(app, server_config)
+        if HTTP_SERVER is None:
+            STARTUP.mark('server_start', engine='development')
+            APP_LOGGER.info("啟動 Flask 開發伺服器...")
+            app.run(
+                debug=server_config['debug'],
+                host=server_config['host'],
+                port=server_config['port'],
+                use_reloader=server_config['use_reloader']
+            )
+        else:
+            settings = HTTP_SERVER.describe()
+            # 建立伺服器時已綁定端口，之後的連線會在 backlog 中等待
+            STARTUP.mark('server_start', engine=settings['engine'])
+            SERVER_READY.set()
+            APP_LOGGER.info(
+                f"啟動 {settings['engine']} 伺服器 (執行緒 {settings['threads']}，"
+                f"backlog {settings['backlog']}，keep-alive {settings['keep_alive']} 秒)")
+            HTTP_SERVER.serve_forever()
+            APP_LOGGER.info("伺服器已停止")
     except KeyboardInterrupt:
         APP_LOGGER.info("用戶中斷應用程式 (Ctrl+C)")
         print("\n👋 感謝使用 Everything Flask 搜尋應用程式！")
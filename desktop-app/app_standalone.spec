@@ -25,6 +25,28 @@ a = Analysis(
         'flask_cors',
         'everything_sdk',
         'mock_everything',
+        'utils.search_backend',
+        'utils.everything_sdk',
+        'utils.windows_search_api',
+        'utils.simple_windows_search',
+        'utils.mock_everything',
+        'utils.local_index',
+        'utils.index_store',
+        'utils.index_watcher',
+        'utils.parallel_crawler',
+        'utils.result_cache',
+        'utils.query_refiner',
+        'utils.trigram_index',
+        'utils.result_batch',
+        'utils.pagination',
+        'utils.result_stream',
+        'utils.query_executor',
+        'utils.wsgi_server',
+        'utils.startup_profile',
+        'utils.ado_pool',
+        'utils.shell_pool',
+        'utils.ranking',
+        'waitress',
         'ctypes',
         'datetime',
         'struct',
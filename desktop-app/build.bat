@@ -26,10 +26,10 @@ if errorlevel 1 (
 )
 
 echo 檢查必要套件...
-python -c "import flask, flask_cors" >nul 2>&1
+python -c "import flask, flask_cors, waitress" >nul 2>&1
 if errorlevel 1 (
     echo 安裝必要套件...
-    pip install flask flask-cors
+    pip install flask flask-cors waitress
     if errorlevel 1 (
         echo 錯誤: 套件安裝失敗
         pause
@@ -26,10 +26,10 @@ if errorlevel 1 (
 )
 
 echo Checking required packages...
-python -c "import flask, flask_cors" >nul 2>&1
+python -c "import flask, flask_cors, waitress" >nul 2>&1
 if errorlevel 1 (
     echo Installing required packages...
-    pip install flask flask-cors
+    pip install flask flask-cors waitress
     if errorlevel 1 (
         echo Error: Package installation failed
         pause
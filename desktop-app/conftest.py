@@ -0,0 +1,29 @@
+"""
+pytest 設定
+app_standalone_test.py 是測試版本的應用程式 (匯入時即讀取設定並輸出訊息)，不是測試模組
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+collect_ignore = ['app_standalone_test.py']
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """匯入 app_standalone (匯入時產生的 config.yml 與 app.log 放在暫存目錄)"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    try:
+        import app_standalone
+    finally:
+        os.chdir(cwd)
+    return app_standalone
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,53 @@
+"""
+搜尋 API 端點測試 (使用示範後端)
+"""
+import pytest
+
+
+@pytest.mark.parametrize('url', [
+    '/search?q=txt&backend=demo&max=-1',
+    '/search?q=txt&backend=demo&max=abc',
+    '/api/search/txt?backend=demo&limit=-3',
+    '/api/search/txt?backend=demo&limit=x',
+    '/search/stream?q=txt&backend=demo&limit=-1',
+    '/search/stream?q=txt&backend=demo&batch_size=z',
+])
+def test_invalid_limit_is_rejected(client, url):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_invalid_post_max_results_is_rejected(client):
+    response = client.post('/search', json={'query': 'txt', 'backend': 'demo', 'max_results': -2})
+    assert response.status_code == 400
+
+
+def test_stream_limit_zero_is_unlimited(client):
+    response = client.get('/search/stream?q=txt&backend=demo&limit=0')
+    assert response.status_code == 200
+    assert len(response.get_data(as_text=True).splitlines()) == 3
+
+
+@pytest.mark.parametrize('sort', ['backend', 'relevance'])
+def test_cursor_round_trip_covers_every_result(client, sort):
+    full = client.get(f'/search?q=work&backend=demo&max=50&sort={sort}').get_json()
+    assert full['next_cursor'] is None
+    expected = [row['full_path'] for row in full['results']]
+    assert len(expected) > 4
+
+    page = client.get(f'/search?q=work&backend=demo&max=2&sort={sort}').get_json()
+    paged = []
+    while True:
+        paged.extend(row['full_path'] for row in page['results'])
+        if page['next_cursor'] is None:
+            break
+        # cursor 帶有查詢、每頁筆數、後端與排序方式，不必再傳其他參數
+        page = client.get('/search', query_string={'cursor': page['next_cursor']}).get_json()
+        assert page['success'] and len(page['results']) <= 2
+    assert paged == expected
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get('/search?cursor=not-a-cursor')
+    assert response.status_code == 400
@@ -0,0 +1,75 @@
+"""
+IndexWatcher 增量更新測試 (建立、刪除、改名)
+"""
+import os
+import sys
+import time
+
+import pytest
+
+from utils.local_index import LocalIndexBackend
+
+
+def wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def full_paths(backend: LocalIndexBackend, query: str):
+    results, _ = backend.search(query, 100)
+    return {results.full_path_at(i) for i in range(len(results))}
+
+
+@pytest.fixture(params=['inotify', 'polling'])
+def watched(request, tmp_path):
+    if request.param == 'inotify' and not sys.platform.startswith('linux'):
+        pytest.skip("inotify 只在 Linux 上可用")
+    root = tmp_path / 'root'
+    (root / 'a' / 'sub').mkdir(parents=True)
+    (root / 'a' / 'old.txt').write_text('x')
+    (root / 'a' / 'sub' / 'deep.txt').write_text('x')
+    backend = LocalIndexBackend(roots=[str(root)], exclude=[], watch=True, watch_mode=request.param,
+                                poll_interval=0.05, batch_delay=0.05, trigram_index=False)
+    backend.start_build().join()
+    # 等待監看完成啟動時的 mtime 比對，之後的變更才會被偵測
+    assert wait_for(lambda: backend._watcher is not None and backend._watcher.last_scan_at is not None)
+    assert backend._watcher.active_mode == request.param
+    yield backend, root
+    backend.close()
+
+
+def test_create_and_delete(watched):
+    backend, root = watched
+    created = root / 'a' / 'created.txt'
+    created.write_text('x')
+    assert wait_for(lambda: full_paths(backend, 'created') == {str(created)})
+
+    created.unlink()
+    assert wait_for(lambda: not full_paths(backend, 'created'))
+    assert full_paths(backend, 'old') == {str(root / 'a' / 'old.txt')}
+
+
+def test_rename_directory_keeps_watching(watched):
+    backend, root = watched
+    os.rename(root / 'a', root / 'b')
+    assert wait_for(lambda: full_paths(backend, 'deep') == {str(root / 'b' / 'sub' / 'deep.txt')})
+    assert not full_paths(backend, 'old.txt') - {str(root / 'b' / 'old.txt')}
+
+    # 改名後在新目錄 (與子目錄) 中建立的檔案也要被索引
+    (root / 'b' / 'new.txt').write_text('x')
+    (root / 'b' / 'sub' / 'newer.txt').write_text('x')
+    assert wait_for(lambda: full_paths(backend, 'new') == {
+        str(root / 'b' / 'new.txt'), str(root / 'b' / 'sub' / 'newer.txt')})
+    assert len(backend._watcher._wd_to_dir) == len(backend._watcher._dir_to_wd)
+
+
+def test_delete_directory_removes_subtree(watched):
+    backend, root = watched
+    (root / 'a' / 'sub' / 'deep.txt').unlink()
+    (root / 'a' / 'sub').rmdir()
+    assert wait_for(lambda: not full_paths(backend, 'sub') and not full_paths(backend, 'deep'))
+    assert full_paths(backend, 'old') == {str(root / 'a' / 'old.txt')}
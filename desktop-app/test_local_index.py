@@ -0,0 +1,77 @@
+"""
+LocalFileIndex 搜尋、分頁與計數測試
+"""
+import os
+
+import pytest
+
+from utils.local_index import ENTRY_FLAG_FOLDER, IndexEntry, LocalFileIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    for d in range(4):
+        folder = tmp_path / f'project_{d}'
+        (folder / 'docs').mkdir(parents=True)
+        for i in range(6):
+            (folder / f'report_{d}_{i}.txt').write_text('x' * i)
+        (folder / 'docs' / f'notes_{d}.md').write_text('x')
+        (folder / 'docs' / f'Report_Final_{d}.pdf').write_text('x')
+    (tmp_path / '.git').mkdir()
+    (tmp_path / '.git' / 'report_hidden.txt').write_text('x')
+    return LocalFileIndex.crawl([str(tmp_path)], exclude=['.git'])
+
+
+def names(index, entry_ids):
+    return sorted(index.get_name(entry_id) for entry_id in entry_ids)
+
+
+def test_substring_search_is_case_insensitive(index):
+    results, total_count = index.search('REPORT', 100)
+    assert total_count == len(results) == 28
+    assert 'report_hidden.txt' not in results.filenames
+    assert names(index, index.find('final')) == [f'Report_Final_{d}.pdf' for d in range(4)]
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('*.md', 4),
+    ('report_1*', 6),
+    ('report_?_5.txt', 4),
+    ('report txt', 24),
+    ('docs' + os.sep + 'report', 4),
+    ('missing', 0),
+])
+def test_query_syntax_and_count(index, query, expected):
+    assert index.count(query) == expected
+    assert len(index.find(query)) == expected
+
+
+def test_offset_pages_cover_all_matches_once(index):
+    expected = [index.get_full_path(entry_id) for entry_id in index.find('report')]
+    paged = []
+    for offset in range(0, 30, 8):
+        results, total_count = index.search('report', 8, offset=offset)
+        assert total_count == 28
+        paged.extend(results.full_path_at(i) for i in range(len(results)))
+    assert paged == expected
+
+
+def test_search_projects_requested_fields(index):
+    results, _ = index.search('notes_0', 5, fields=('filename',))
+    assert results.filenames == ['notes_0.md']
+    assert results.paths == ['']
+
+
+def test_apply_changes_updates_search_and_count(index):
+    deleted = index.find('report_0_0')[0]
+    folder = index.get_parent(deleted)
+    added = IndexEntry('report_new.txt', folder, 0, 1, 0, 0)
+    updated = index.apply_changes({len(index): added}, [deleted])
+
+    assert updated.generation == index.generation + 1
+    assert updated.count('report') == 28
+    assert names(updated, updated.find('report_new')) == ['report_new.txt']
+    assert not updated.find('report_0_0')
+    # 原快照不受影響
+    assert index.count('report') == 28 and not index.find('report_new')
+    assert updated.get_flags(folder) & ENTRY_FLAG_FOLDER
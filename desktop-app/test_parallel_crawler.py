@@ -0,0 +1,76 @@
+"""
+ParallelCrawler 並行走訪測試
+"""
+import threading
+
+import pytest
+
+from utils.parallel_crawler import CrawlerBusy, CrawlInterrupted, ParallelCrawler
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for d in range(5):
+        sub = tmp_path / f'd{d}'
+        sub.mkdir()
+        for i in range(5):
+            (sub / f'file_{d}_{i}.txt').write_text('x')
+    return tmp_path
+
+
+def test_crawl_finds_all_matches(tree):
+    crawler = ParallelCrawler(max_workers=4)
+    entries = crawler.crawl([str(tree), str(tree / 'd0')], lambda entry: entry.name.endswith('.txt'))
+    assert len(entries) == 25
+    crawler.shutdown()
+
+
+def test_slow_crawl_does_not_starve_the_next(tree):
+    crawler = ParallelCrawler(max_workers=4, max_crawls=2)
+    assert crawler.workers_per_crawl == 2
+    release = threading.Event()
+    blocked = threading.Event()
+
+    def slow_match(entry):
+        blocked.set()
+        release.wait(5)
+        return False
+
+    slow = threading.Thread(target=crawler.crawl, args=([str(tree)], slow_match))
+    slow.start()
+    try:
+        assert blocked.wait(5)
+        # 另一個走訪使用自己的工作執行緒，不必等待慢的走訪
+        entries = crawler.crawl([str(tree)], lambda entry: entry.name == 'file_1_1.txt', timeout=2)
+        assert [entry.name for entry in entries] == ['file_1_1.txt']
+
+        third = threading.Event()
+        started = threading.Event()
+
+        def waiting_match(entry):
+            started.set()
+            return third.wait(5)
+
+        finished = threading.Thread(target=crawler.crawl, args=([str(tree)], waiting_match))
+        finished.start()
+        assert started.wait(5)
+        # 同時進行的走訪已達上限時立即失敗
+        with pytest.raises(CrawlerBusy):
+            crawler.crawl([str(tree)], lambda entry: True)
+        third.set()
+        finished.join(5)
+    finally:
+        release.set()
+        slow.join(5)
+
+    assert len(crawler.crawl([str(tree)], lambda entry: entry.is_file())) == 25
+    crawler.shutdown()
+
+
+def test_timeout_raises(tree):
+    crawler = ParallelCrawler(max_workers=2)
+    with pytest.raises(CrawlInterrupted):
+        crawler.crawl([str(tree)], lambda entry: True, timeout=1e-9)
+    # 走訪結束後釋放名額
+    assert len(crawler.crawl([str(tree)], lambda entry: entry.is_file())) == 25
+    crawler.shutdown()
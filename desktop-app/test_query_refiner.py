@@ -0,0 +1,80 @@
+"""
+QueryRefiner 增量縮小測試 (使用示範後端)
+"""
+import pytest
+
+from utils.mock_everything import MockEverythingSDK, MockEverythingSearchResult
+from utils.query_refiner import QueryRefiner
+
+
+@pytest.fixture
+def backend():
+    files = [MockEverythingSearchResult(f'{name}_{i}.txt', 'D:\\Work', 100)
+             for name in ('report', 'repository', 'readme') for i in range(4)]
+    return MockEverythingSDK(files)
+
+
+def search_with(backend, refiner, query, max_results=50, client='client', offset=0, calls=None):
+    def search_func():
+        if calls is not None:
+            calls.append(query)
+        results, total_count = backend.search(query, offset + max_results)
+        return results[offset:], total_count
+    return refiner.search(backend, query, max_results, client, search_func, offset=offset)
+
+
+def test_extension_of_complete_result_is_refined(backend):
+    refiner = QueryRefiner()
+    calls = []
+    results, total_count, refined = search_with(backend, refiner, 'rep', calls=calls)
+    assert not refined and total_count == len(results) == 8
+
+    results, total_count, refined = search_with(backend, refiner, 'repo', calls=calls)
+    assert refined and total_count == 8
+    results, total_count, refined = search_with(backend, refiner, 'report', calls=calls)
+    assert refined and total_count == 4
+    assert sorted(results.filenames) == [f'report_{i}.txt' for i in range(4)]
+    # 只有第一個查詢呼叫了後端
+    assert calls == ['rep']
+    assert refiner.stats()['refinements'] == 2
+
+
+def test_truncated_result_is_not_a_base(backend):
+    refiner = QueryRefiner()
+    calls = []
+    # 被 max_results 截斷：總數大於返回筆數
+    search_with(backend, refiner, 'rep', max_results=5, calls=calls)
+    # 剛好填滿一頁：無法確定是否還有更多
+    search_with(backend, refiner, 'readme', max_results=4, calls=calls)
+    assert not search_with(backend, refiner, 'repo', calls=calls)[2]
+    assert not search_with(backend, refiner, 'readme_1', calls=calls)[2]
+    assert calls == ['rep', 'readme', 'repo', 'readme_1']
+
+
+def test_later_pages_are_not_recorded(backend):
+    refiner = QueryRefiner()
+    calls = []
+    search_with(backend, refiner, 'rep', max_results=50, offset=2, calls=calls)
+    assert not search_with(backend, refiner, 'repo', calls=calls)[2]
+
+
+def test_refined_results_are_paged(backend):
+    refiner = QueryRefiner()
+    search_with(backend, refiner, 're')
+    page, total_count, refined = search_with(backend, refiner, 'rep', max_results=3, offset=3)
+    assert refined and total_count == 8 and len(page) == 3
+
+
+def test_bases_are_per_client_and_generation(backend):
+    refiner = QueryRefiner()
+    search_with(backend, refiner, 'rep', client='a')
+    assert not search_with(backend, refiner, 'repo', client='b')[2]
+
+    backend.index_generation = 1
+    assert not search_with(backend, refiner, 'repo', client='a')[2]
+
+
+def test_disabled_refiner_calls_backend(backend):
+    refiner = QueryRefiner(enabled=False)
+    search_with(backend, refiner, 'rep')
+    assert not search_with(backend, refiner, 'repo')[2]
@@ -0,0 +1,83 @@
+"""
+SearchResultCache 的 TTL、索引世代失效與 LRU 淘汰測試
+"""
+from utils.result_batch import ResultBatch
+from utils.result_cache import SearchResultCache
+
+
+class CountingBackend:
+    """記錄呼叫次數的後端 (index_generation 可由測試修改)"""
+    name = 'counting'
+
+    def __init__(self):
+        self.index_generation = 0
+        self.calls = 0
+
+    def search(self, query, max_results=100, fields=None, offset=0):
+        self.calls += 1
+        batch = ResultBatch()
+        batch.append(f'{query}.txt', '/tmp')
+        return batch, 1
+
+    def count(self, query):
+        self.calls += 1
+        return 42
+
+
+def test_hit_until_ttl_expires():
+    cache = SearchResultCache(ttl=30)
+    backend = CountingBackend()
+    assert cache.search(backend, 'Report', 10)[2] is False
+    # 正規化後相同的查詢共用快取項目
+    results, total_count, cached = cache.search(backend, '  report ', 10)
+    assert cached and total_count == 1 and results.filenames == ['Report.txt']
+
+    # 讓項目超過 TTL
+    cache._entries[cache.make_key(backend, 'report', 10)].expires_at -= 31
+    assert cache.search(backend, 'report', 10)[2] is False
+    assert backend.calls == 2
+    assert cache.stats()['expirations'] == 1
+
+
+def test_generation_change_invalidates():
+    cache = SearchResultCache(ttl=30)
+    backend = CountingBackend()
+    cache.search(backend, 'report', 10)
+    assert cache.count(backend, 'report') == (42, False)
+    assert cache.count(backend, 'report') == (42, True)
+
+    backend.index_generation += 1
+    assert cache.search(backend, 'report', 10)[2] is False
+    assert cache.count(backend, 'report') == (42, False)
+    assert cache.stats()['invalidations'] == 2
+    assert backend.calls == 4
+
+
+def test_key_includes_page_shape():
+    cache = SearchResultCache()
+    backend = CountingBackend()
+    cache.search(backend, 'report', 10)
+    assert cache.search(backend, 'report', 20)[2] is False
+    assert cache.search(backend, 'report', 10, offset=10)[2] is False
+    assert cache.search(backend, 'report', 10, fields=('filename',))[2] is False
+    assert cache.search(backend, 'report', 10)[2] is True
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = SearchResultCache(max_entries=2)
+    backend = CountingBackend()
+    cache.search(backend, 'a', 10)
+    cache.search(backend, 'b', 10)
+    cache.search(backend, 'a', 10)
+    cache.search(backend, 'c', 10)
+    assert cache.search(backend, 'a', 10)[2] is True
+    assert cache.search(backend, 'b', 10)[2] is False
+    assert cache.stats()['evictions'] >= 1
+
+
+def test_disabled_cache_always_calls_backend():
+    cache = SearchResultCache(enabled=False)
+    backend = CountingBackend()
+    cache.search(backend, 'report', 10)
+    assert cache.search(backend, 'report', 10)[2] is False
+    assert backend.calls == 2
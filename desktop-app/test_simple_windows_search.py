@@ -0,0 +1,48 @@
+"""
+Simple Search (並行爬蟲) 分頁與逾時測試
+"""
+import pytest
+
+from utils.parallel_crawler import CrawlInterrupted
+from utils.simple_windows_search import SimpleWindowsSearch
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for d in range(10):
+        sub = tmp_path / f'd{d}' / 'sub'
+        sub.mkdir(parents=True)
+        for i in range(10):
+            (sub.parent if i % 2 else sub).joinpath(f'match_{d}_{i}.txt').write_text('x')
+    return tmp_path
+
+
+def full_paths(results):
+    return [results.full_path_at(i) for i in range(len(results))]
+
+
+def test_first_page_stops_early(tree):
+    search = SimpleWindowsSearch(search_paths=[str(tree)])
+    results, total_count = search.search('match', 10)
+    assert len(results) == 10
+    # 多找的一個只用來判斷是否還有下一頁
+    assert total_count == 11
+
+
+def test_pages_share_a_stable_prefix(tree):
+    search = SimpleWindowsSearch(search_paths=[str(tree)])
+    seen = []
+    for limit in range(15, 120, 15):
+        results, total_count = search.search('match', limit)
+        paths = full_paths(results)
+        assert paths[:len(seen)] == seen
+        seen = paths
+    assert len(seen) == len(set(seen)) == total_count == 100
+
+
+def test_interrupted_crawl_raises(tree):
+    search = SimpleWindowsSearch(search_paths=[str(tree)], timeout=1e-9)
+    with pytest.raises(CrawlInterrupted):
+        search.search('match', 10)
+    with pytest.raises(CrawlInterrupted):
+        list(search.iter_search_batches('match'))
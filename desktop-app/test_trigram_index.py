@@ -0,0 +1,50 @@
+"""
+trigram 索引測試：壓縮清單、候選交集與掃描結果一致
+"""
+import random
+from array import array
+
+import pytest
+
+from utils.local_index import ENTRY_FLAG_FOLDER, ENTRY_FLAG_ROOT, LocalFileIndex
+from utils.trigram_index import SubstringIndex, decode_postings, encode_postings, posting_count
+
+WORDS = ['report', 'repo', 'readme', 'photo', 'invoice', 'budget', 'draft', 'final', 'notes', 'data']
+
+
+def random_names(count, seed=7):
+    rng = random.Random(seed)
+    return [f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{rng.randrange(10000)}.{rng.choice(['txt', 'pdf', 'md'])}"
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize('ids', [[5], [0, 1, 2, 300], [7, 70000, 70001], [1, 2 ** 31, 2 ** 32 - 1]])
+def test_postings_round_trip(ids):
+    data = encode_postings(array('I', ids))
+    assert decode_postings(data) == ids
+    assert posting_count(data) == len(ids)
+
+
+@pytest.mark.parametrize('needle', [b'', b'r', b'_1', b'rep', b'report_final', b'_4242', b'1234.', b'zzz', b'notes_notes'])
+def test_substring_index_matches_scan(needle):
+    docs = [name.encode() for name in random_names(3000)]
+    index = SubstringIndex(docs)
+    if needle in (b'_4242', b'1234.'):
+        # 有選擇性的查詢走 trigram 候選
+        assert index.trigrams.candidates(needle) is not None
+    assert index.find(needle) == [i for i, doc in enumerate(docs) if needle in doc]
+
+
+@pytest.mark.parametrize('query', ['_4242', '1234.', 'report_final', 'draft_data_1', 'ice_b', 'photo *.md', 'zzz'])
+def test_local_index_search_and_count_with_trigrams(query):
+    names = random_names(3000)
+    # 項目 0 是根目錄 (不會出現在結果中)，其餘都是它的子項目
+    index = LocalFileIndex.from_entries(['root'] + names, [-1] + [0] * len(names),
+                                        [ENTRY_FLAG_FOLDER | ENTRY_FLAG_ROOT] + [0] * len(names), [0] * (len(names) + 1),
+                                        [0] * (len(names) + 1), [0] * (len(names) + 1))
+    expected = index.find(query)
+    expected_count = index.count(query)
+
+    index.trigrams = index.build_trigrams()
+    assert index.find(query) == expected
+    assert index.count(query) == expected_count == len(expected)
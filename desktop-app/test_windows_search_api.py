@@ -0,0 +1,31 @@
+"""
+Windows Search 结果转换测试 (使用 fake_ado，不需要 Windows Search)
+"""
+import datetime
+
+from utils.fake_ado import FakeADOProvider
+from utils.result_batch import ResultBatch, TIME_BASE_FILETIME
+from utils.windows_search_api import PATH_PROPERTY, WindowsSearchAPI
+
+PROPERTIES = [PATH_PROPERTY, 'System.Size', 'System.DateModified', 'System.DateCreated',
+              'System.Kind', 'System.FileAttributes']
+
+
+def test_bad_row_only_drops_that_row():
+    api = WindowsSearchAPI(provider=FakeADOProvider())
+    results = ResultBatch(TIME_BASE_FILETIME, path_separator='\\')
+    when = datetime.datetime(2024, 1, 1)
+    data = [
+        ('C:\\a\\x.txt', 12345, 'C:\\a\\y.txt'),
+        (1, 2 ** 70, 3),
+        (when, when, 'not a date'),
+        (when, when, when),
+        (None, ('folder',), None),
+        (0, 16, 0),
+    ]
+    api._append_rows(results, PROPERTIES, data)
+
+    assert [results.full_path_at(i) for i in range(len(results))] == ['C:\\a\\x.txt', 'C:\\a\\y.txt']
+    assert list(results.sizes) == [1, 3]
+    # 无法转换的日期只让该字段为空
+    assert results.modified[0] != 0 and results.modified[1] == 0
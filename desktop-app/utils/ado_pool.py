@@ -0,0 +1,155 @@
+"""
+ADO 连接池
+Windows Search 通过 OLE DB 提供者 Search.CollatorDSO 执行 SQL 查询。每次查询都 Dispatch 并 Open
+新的 ADODB.Connection 成本很高，这里为每个线程保留一个已打开的连接，COM 在每个线程中只初始化一次
+(COM 对象属于创建它的线程，不跨线程共享)。
+
+ADO 对象由可替换的提供者 (provider) 建立：默认使用 pywin32 的 COM 对象，
+测试与基准测试可改用 fake_ado 的内存实现，在 Linux 上执行相同的代码路径。
+"""
+import threading
+import weakref
+from typing import Dict, Optional
+
+WINDOWS_SEARCH_CONNECTION_STRING = "Provider=Search.CollatorDSO;Extended Properties='Application=Windows';"
+
+
+class ComADOProvider:
+    """以 pywin32 建立 ADODB.Connection / ADODB.Recordset"""
+
+    def initialize_thread(self):
+        """在当前线程初始化 COM (每个线程只调用一次)"""
+        import pythoncom
+        pythoncom.CoInitialize()
+
+    def open_connection(self, connection_string: str):
+        import win32com.client
+        connection = win32com.client.Dispatch("ADODB.Connection")
+        connection.Open(connection_string)
+        return connection
+
+    def open_recordset(self, connection, sql_query: str):
+        import win32com.client
+        recordset = win32com.client.Dispatch("ADODB.Recordset")
+        recordset.Open(sql_query, connection)
+        return recordset
+
+
+class _ThreadConnection:
+    """线程局部存储中的连接；线程结束时随局部存储释放，连接池随之移除记录"""
+    __slots__ = ('connection', '__weakref__')
+
+    def __init__(self, connection):
+        self.connection = connection
+
+
+class ADOConnectionPool:
+    """
+    每个线程一个已打开的 ADO 连接
+
+    Args:
+        connection_string: OLE DB 连接字符串
+        provider: 建立 ADO 对象的提供者，None 时使用 ComADOProvider
+    """
+
+    def __init__(self, connection_string: str = WINDOWS_SEARCH_CONNECTION_STRING, provider=None):
+        self.connection_string = connection_string
+        self.provider = provider if provider is not None else ComADOProvider()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: Dict[int, object] = {}
+        self.opened = 0
+        self.reused = 0
+        self.queries = 0
+
+    def connection(self):
+        """取得当前线程的连接 (第一次使用时初始化 COM 并打开连接)"""
+        local = self._local
+        if not getattr(local, 'initialized', False):
+            self.provider.initialize_thread()
+            local.initialized = True
+
+        holder = getattr(local, 'holder', None)
+        if holder is not None:
+            with self._lock:
+                self.reused += 1
+            return holder.connection
+
+        holder = _ThreadConnection(self.provider.open_connection(self.connection_string))
+        local.holder = holder
+        key = id(holder)
+        with self._lock:
+            self.opened += 1
+            self._connections[key] = holder.connection
+        # COM 对象只能由所属线程关闭，线程结束后只释放引用
+        weakref.finalize(holder, self._forget, key)
+        return holder.connection
+
+    def _forget(self, key: int):
+        with self._lock:
+            self._connections.pop(key, None)
+
+    def open_recordset(self, sql_query: str):
+        """在当前线程的连接上执行查询；连接失效 (例如服务重启) 时重新打开后重试一次"""
+        with self._lock:
+            self.queries += 1
+        try:
+            return self.provider.open_recordset(self.connection(), sql_query)
+        except Exception:
+            if getattr(self._local, 'holder', None) is None:
+                raise
+            self.discard()
+            return self.provider.open_recordset(self.connection(), sql_query)
+
+    def discard(self):
+        """关闭并丢弃当前线程的连接"""
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            return
+        self._local.holder = None
+        self._forget(id(holder))
+        try:
+            holder.connection.Close()
+        except Exception:
+            pass
+
+    def close(self):
+        """关闭当前线程的连接 (应用程序结束时调用；其他线程的连接随线程结束释放)"""
+        self.discard()
+        with self._lock:
+            self._connections.clear()
+
+    def stats(self) -> Dict:
+        """连接统计 (显示于 /status)"""
+        with self._lock:
+            return {
+                'connections': len(self._connections),
+                'opened': self.opened,
+                'reused': self.reused,
+                'queries': self.queries,
+            }
+
+
+# GetRows 的参数：读取剩下的所有行 / 从当前行开始
+AD_GET_ROWS_REST = -1
+AD_BOOKMARK_CURRENT = 0
+
+
+def fetch_rows(recordset, rows: Optional[int] = None, fields=None):
+    """
+    以 GetRows 一次读取多行，返回按列排列的序列 (每列一个 tuple)
+
+    Args:
+        recordset: 已打开的记录集
+        rows: 最多读取的行数，None 时读取剩下的所有行
+        fields: 只读取的字段名称 (字符串或列表)，None 时读取 SELECT 的全部列 (顺序与 SELECT 相同)
+
+    Returns:
+        列的 tuple；记录集已到结尾时返回 None
+    """
+    if recordset.EOF:
+        return None
+    rows = AD_GET_ROWS_REST if rows is None else rows
+    if fields is None:
+        return recordset.GetRows(rows)
+    return recordset.GetRows(rows, AD_BOOKMARK_CURRENT, fields)
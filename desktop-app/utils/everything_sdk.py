@@ -3,9 +3,17 @@ Everything SDK Python wrapper
 基於 voidtools Everything 搜尋引擎的 Python 介面
 """
 import ctypes
-import datetime
 import os
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Sequence, Tuple
+
+try:
+    from .query_executor import QueryExecutor
+    from .result_batch import ResultBatch, TIME_BASE_FILETIME, required_columns
+    from .search_backend import SearchBackend
+except ImportError:
+    from query_executor import QueryExecutor
+    from result_batch import ResultBatch, TIME_BASE_FILETIME, required_columns
+    from search_backend import SearchBackend
 
 # 定義常數
 EVERYTHING_REQUEST_FILE_NAME = 0x00000001
@@ -24,72 +32,36 @@ EVERYTHING_REQUEST_DATE_RECENTLY_CHANGED = 0x00001000
 EVERYTHING_REQUEST_HIGHLIGHTED_FILE_NAME = 0x00002000
 EVERYTHING_REQUEST_HIGHLIGHTED_PATH = 0x00004000
 
-# Windows FILETIME 轉換常數
-WINDOWS_TICKS = int(1/10**-7)  # 10,000,000 (100 nanoseconds)
-WINDOWS_EPOCH = datetime.datetime.strptime(
-    '1601-01-01 00:00:00', '%Y-%m-%d %H:%M:%S')
-POSIX_EPOCH = datetime.datetime.strptime(
-    '1970-01-01 00:00:00', '%Y-%m-%d %H:%M:%S')
-EPOCH_DIFF = (POSIX_EPOCH - WINDOWS_EPOCH).total_seconds()
-WINDOWS_TICKS_TO_POSIX_EPOCH = EPOCH_DIFF * WINDOWS_TICKS
-
-
-class EverythingSearchResult:
-    """表示一個搜尋結果的類別"""
-
-    def __init__(self):
-        self.filename: str = ""
-        self.path: str = ""
-        self.full_path: str = ""
-        self.extension: str = ""
-        self.size: int = 0
-        self.date_created: Optional[datetime.datetime] = None
-        self.date_modified: Optional[datetime.datetime] = None
-        self.date_accessed: Optional[datetime.datetime] = None
-        self.is_file: bool = True
-        self.is_folder: bool = False
-
-    def to_dict(self) -> Dict:
-        """轉換為字典格式"""
-        return {
-            'filename': self.filename,
-            'path': self.path,
-            'full_path': self.full_path,
-            'extension': self.extension,
-            'size': self.size,
-            'size_formatted': self._format_size(self.size, is_folder=self.is_folder),
-            'date_created': self.date_created.isoformat() if self.date_created else None,
-            'date_modified': self.date_modified.isoformat() if self.date_modified else None,
-            'date_accessed': self.date_accessed.isoformat() if self.date_accessed else None,
-            'is_file': self.is_file,
-            'is_folder': self.is_folder
-        }
-
-    def _format_size(self, size_bytes: int, is_folder: bool = False) -> str:
-        """格式化檔案大小（整數單位，不顯示小數），資料夾顯示 '-'"""
-        if is_folder:
-            return "-"
-        try:
-            if size_bytes is None or size_bytes == 0:
-                return "0 B"
-            size = int(size_bytes)
-        except (TypeError, ValueError):
-            return "-"
-
-        size_names = ["B", "KB", "MB", "GB", "TB"]
-        i = 0
-        while size >= 1024 and i < len(size_names) - 1:
-            size = size // 1024
-            i += 1
-        return f"{size} {size_names[i]}"
-
-
-class EverythingSDK:
+# 結果欄位對應的 request flag
+COLUMN_REQUEST_FLAGS = {
+    'filename': EVERYTHING_REQUEST_FILE_NAME,
+    'path': EVERYTHING_REQUEST_PATH,
+    'extension': EVERYTHING_REQUEST_EXTENSION,
+    'size': EVERYTHING_REQUEST_SIZE,
+    'date_created': EVERYTHING_REQUEST_DATE_CREATED,
+    'date_modified': EVERYTHING_REQUEST_DATE_MODIFIED,
+    'date_accessed': EVERYTHING_REQUEST_DATE_ACCESSED,
+}
+
+class EverythingSDK(SearchBackend):
     """Everything SDK 的 Python 包裝類別"""
 
-    def __init__(self):
-        self.everything_dll = None
+    name = "everything"
+    display_name = "Everything"
+    # Everything 的查詢狀態保存在 DLL 全域變數中，所有 DLL 呼叫都交由專屬執行緒依序執行
+    is_thread_safe = True
+    supports_offset = True
+    supports_count_only = True
+
+    def __init__(self, dll=None):
+        """
+        Args:
+            dll: 已載入的 Everything 函式庫物件 (例如 fake_everything.FakeEverythingDLL)；
+                 None 時在第一次使用時依序嘗試載入 Everything64.dll / Everything32.dll
+        """
+        self.everything_dll = dll
         self._dll_loaded = False
+        self._executor = QueryExecutor("everything-query")
 
     def _load_dll(self):
         """載入 Everything DLL"""
@@ -132,8 +104,12 @@ class EverythingSDK:
         self.everything_dll.Everything_QueryW.argtypes = [ctypes.c_bool]
         self.everything_dll.Everything_QueryW.restype = ctypes.c_bool
 
+        self.everything_dll.Everything_SetMax.argtypes = [ctypes.c_uint]
+        self.everything_dll.Everything_SetOffset.argtypes = [ctypes.c_uint]
+
         # 設定結果函數
         self.everything_dll.Everything_GetNumResults.restype = ctypes.c_uint
+        self.everything_dll.Everything_GetTotResults.restype = ctypes.c_uint
         self.everything_dll.Everything_GetResultFullPathNameW.argtypes = [
             ctypes.c_uint, ctypes.c_wchar_p, ctypes.c_uint]
         self.everything_dll.Everything_GetResultFullPathNameW.restype = ctypes.c_uint
@@ -164,134 +140,184 @@ class EverythingSDK:
             ctypes.c_uint]
         self.everything_dll.Everything_IsFolderResult.restype = ctypes.c_bool
 
-    def _convert_filetime_to_datetime(self, filetime: ctypes.c_ulonglong) -> Optional[datetime.datetime]:
-        """將 Windows FILETIME 轉換為 Python datetime"""
-        try:
-            if filetime.value == 0:
-                return None
-            winticks = filetime.value
-            microsecs = (winticks - WINDOWS_TICKS_TO_POSIX_EPOCH) / \
-                WINDOWS_TICKS
-            return datetime.datetime.fromtimestamp(microsecs)
-        except (ValueError, OSError):
-            return None
-
     def _ensure_dll_loaded(self):
         """確保 DLL 已載入"""
         if not self._dll_loaded:
-            self._load_dll()
+            if self.everything_dll is None:
+                self._load_dll()
             self._setup_function_signatures()
             self._dll_loaded = True
 
-    def search(self, query: str, max_results: int = 100) -> Tuple[List[EverythingSearchResult], int]:
+    def search(self, query: str, max_results: int = 100,
+               fields: Optional[Tuple[str, ...]] = None,
+               offset: int = 0) -> Tuple[ResultBatch, int]:
+        """
+        執行搜尋 (在查詢執行緒中序列化執行，同時進行的相同查詢共用一次執行結果)
+
+        參數與返回值同 _search()
+        """
+        key = ('search', query, max_results, fields and tuple(sorted(fields)), offset)
+        return self._executor.run(key, lambda: self._search(query, max_results, fields, offset))
+
+    def count(self, query: str) -> int:
+        """只取得符合的總數：不要求任何結果 (SetMax 0)，也不逐列讀取"""
+        return self._executor.run(('count', query), lambda: self._count(query))
+
+    def count_many(self, queries: Sequence[str]) -> List:
+        """在查詢執行緒中一次計數所有查詢"""
+        def run_all():
+            outcomes = []
+            for query in queries:
+                try:
+                    outcomes.append(self._count(query))
+                except Exception as e:
+                    outcomes.append(e)
+            return outcomes
+        return self._executor.run(None, run_all)
+
+    def _count(self, query: str) -> int:
+        self._ensure_dll_loaded()
+
+        if not self.everything_dll:
+            raise RuntimeError("Everything DLL 未載入")
+
+        dll = self.everything_dll
+        dll.Everything_SetSearchW(query)
+        dll.Everything_SetRequestFlags(EVERYTHING_REQUEST_FILE_NAME)
+        dll.Everything_SetMax(0)
+        dll.Everything_SetOffset(0)
+        if not dll.Everything_QueryW(True):
+            raise RuntimeError("查詢失敗")
+        # 沒有可見結果，GetNumResults 為 0；總數由 GetTotResults 取得
+        return dll.Everything_GetTotResults()
+
+    def search_many(self, queries: Sequence[str], max_results: int = 1,
+                    fields: Optional[Tuple[str, ...]] = None) -> List:
+        """在查詢執行緒中一次執行所有查詢，只排隊一次"""
+        def run_all():
+            outcomes = []
+            for query in queries:
+                try:
+                    outcomes.append(self._search(query, max_results, fields))
+                except Exception as e:
+                    outcomes.append(e)
+            return outcomes
+        return self._executor.run(None, run_all)
+
+    def _search(self, query: str, max_results: int = 100,
+                fields: Optional[Tuple[str, ...]] = None,
+                offset: int = 0) -> Tuple[ResultBatch, int]:
         """
-        執行搜尋
+        執行搜尋 (只能在查詢執行緒中呼叫)
 
         Args:
             query: 搜尋查詢字串
             max_results: 最大結果數量
+            fields: 需要的結果欄位，None 代表全部；未要求的欄位不會向 Everything 要求，也不會逐列取得
+            offset: 略過的結果數，由 Everything 直接從該位置開始傳回 (後面的分頁與第一頁成本相同)
 
         Returns:
-            (results, total_count): 搜尋結果列表和總結果數
+            (results, total_count): 欄式搜尋結果 (時間為原始 FILETIME) 和總結果數
         """
         self._ensure_dll_loaded()
 
         if not self.everything_dll:
             raise RuntimeError("Everything DLL 未載入")
 
+        dll = self.everything_dll
+        columns = required_columns(fields)
+        if columns is None:
+            columns = frozenset(COLUMN_REQUEST_FLAGS) | {'is_folder'}
+
         # 設定搜尋查詢
-        self.everything_dll.Everything_SetSearchW(query)
-
-        # 設定要取得的資訊
-        request_flags = (
-            EVERYTHING_REQUEST_FILE_NAME |
-            EVERYTHING_REQUEST_PATH |
-            EVERYTHING_REQUEST_EXTENSION |
-            EVERYTHING_REQUEST_SIZE |
-            EVERYTHING_REQUEST_DATE_MODIFIED |
-            EVERYTHING_REQUEST_DATE_CREATED |
-            EVERYTHING_REQUEST_DATE_ACCESSED
-        )
-        self.everything_dll.Everything_SetRequestFlags(request_flags)
+        dll.Everything_SetSearchW(query)
+
+        # 只要求需要的資訊 (至少要求檔名)
+        request_flags = 0
+        for column in columns:
+            request_flags |= COLUMN_REQUEST_FLAGS.get(column, 0)
+        dll.Everything_SetRequestFlags(request_flags or EVERYTHING_REQUEST_FILE_NAME)
 
-        # 設定最大結果數
-        self.everything_dll.Everything_SetMax(max_results)
+        # 設定最大結果數與起始位置 (查詢狀態是全域的，每次都要重設位移)
+        dll.Everything_SetMax(max_results)
+        dll.Everything_SetOffset(offset)
 
         # 執行查詢
-        if not self.everything_dll.Everything_QueryW(True):
+        if not dll.Everything_QueryW(True):
             raise RuntimeError("查詢失敗")
 
-        # 取得結果數量
-        total_results = self.everything_dll.Everything_GetNumResults()
-        actual_results = min(total_results, max_results)
+        # 取得結果數量：GetNumResults 為本頁的筆數，GetTotResults 為全部符合的筆數
+        total_results = dll.Everything_GetTotResults()
+        actual_results = min(dll.Everything_GetNumResults(), max_results)
 
-        results = []
+        batch = ResultBatch(TIME_BASE_FILETIME, path_separator=os.sep)
+
+        get_filename = 'filename' in columns
+        get_path = 'path' in columns
+        get_extension = 'extension' in columns
+        get_size = 'size' in columns
+        get_modified = 'date_modified' in columns
+        get_created = 'date_created' in columns
+        get_accessed = 'date_accessed' in columns
+        get_is_folder = 'is_folder' in columns
+
+        # 所有數值欄位共用同一個輸出緩衝區，時間保留原始 FILETIME，序列化時才轉換
+        value = ctypes.c_ulonglong()
 
         # 處理每個結果
         for i in range(actual_results):
-            result = EverythingSearchResult()
-
-            # 取得檔案名稱
-            filename = self.everything_dll.Everything_GetResultFileNameW(i)
-            if filename:
-                result.filename = filename
-
-            # 取得路徑
-            path = self.everything_dll.Everything_GetResultPathW(i)
-            if path:
-                result.path = path
-                result.full_path = os.path.join(path, result.filename)
-
-            # 取得副檔名
-            extension = self.everything_dll.Everything_GetResultExtensionW(i)
-            if extension:
-                result.extension = extension
-
-            # 取得檔案大小
-            file_size = ctypes.c_ulonglong()
-            self.everything_dll.Everything_GetResultSize(i, file_size)
-            result.size = file_size.value
-
-            # 取得修改日期
-            date_modified = ctypes.c_ulonglong()
-            self.everything_dll.Everything_GetResultDateModified(
-                i, date_modified)
-            result.date_modified = self._convert_filetime_to_datetime(
-                date_modified)
-
-            # 取得建立日期
-            date_created = ctypes.c_ulonglong()
-            self.everything_dll.Everything_GetResultDateCreated(
-                i, date_created)
-            result.date_created = self._convert_filetime_to_datetime(
-                date_created)
-
-            # 取得存取日期
-            date_accessed = ctypes.c_ulonglong()
-            self.everything_dll.Everything_GetResultDateAccessed(
-                i, date_accessed)
-            result.date_accessed = self._convert_filetime_to_datetime(
-                date_accessed)
+            filename = (dll.Everything_GetResultFileNameW(i) or "") if get_filename else ""
+            path = (dll.Everything_GetResultPathW(i) or "") if get_path else ""
+            extension = (dll.Everything_GetResultExtensionW(i) or "") if get_extension else ""
+
+            # 取得失敗 (例如資料夾沒有大小) 時緩衝區仍是上一列的值，必須檢查返回值
+            size = date_modified = date_created = date_accessed = 0
+            if get_size and dll.Everything_GetResultSize(i, value):
+                size = value.value
+            if get_modified and dll.Everything_GetResultDateModified(i, value):
+                date_modified = value.value
+            if get_created and dll.Everything_GetResultDateCreated(i, value):
+                date_created = value.value
+            if get_accessed and dll.Everything_GetResultDateAccessed(i, value):
+                date_accessed = value.value
 
             # 檢查是檔案還是資料夾
-            result.is_file = self.everything_dll.Everything_IsFileResult(i)
-            result.is_folder = self.everything_dll.Everything_IsFolderResult(i)
+            is_folder = bool(dll.Everything_IsFolderResult(i)) if get_is_folder else False
 
-            results.append(result)
+            batch.append(filename, path, size, date_created, date_modified, date_accessed,
+                         is_folder, extension)
 
-        return results, total_results
+        return batch, total_results
 
     def is_everything_running(self) -> bool:
         """檢查 Everything 是否正在運行"""
         try:
-            self._ensure_dll_loaded()
-            # 執行一個簡單的查詢來測試連接
-            self.everything_dll.Everything_SetSearchW("")
-            self.everything_dll.Everything_SetMax(1)
-            return self.everything_dll.Everything_QueryW(True)
+            return self._executor.run(('probe',), self._probe)
         except (OSError, RuntimeError):
             return False
 
+    def _probe(self) -> bool:
+        self._ensure_dll_loaded()
+        # 執行一個簡單的查詢來測試連接
+        self.everything_dll.Everything_SetSearchW("")
+        self.everything_dll.Everything_SetMax(1)
+        self.everything_dll.Everything_SetOffset(0)
+        return self.everything_dll.Everything_QueryW(True)
+
+    def is_available(self) -> bool:
+        """Everything DLL 可載入且服務正在運行時才視為可用"""
+        try:
+            return self.is_everything_running()
+        except Exception:
+            # 非 Windows 平台沒有 ctypes.WinDLL
+            return False
+
+    def status(self) -> Dict:
+        return {'query_executor': self._executor.stats()}
+
+    def close(self):
+        self._executor.shutdown()
+
 
 # 創建全域實例，但延遲載入
 def get_everything_sdk():
@@ -0,0 +1,280 @@
+"""
+假的 ADO 提供者 - 以纯 Python 模拟 Search.CollatorDSO 的 ADODB.Connection / ADODB.Recordset
+搭配 WindowsSearchAPI(provider=...) 使用，可在 Linux 上以合成数据测试与量测 Windows Search 后端
+(连接池、GetRows 批量读取、分页与计数)。
+
+只支持 WindowsSearchAPI 生成的 SQL：SELECT [TOP n] 列 FROM SystemIndex WHERE ... LIKE '%查询%'
+[ORDER BY System.DateModified DESC]；文件名包含查询字符串 (不区分大小写) 即为匹配。
+每次 COM 调用 (Fields、MoveNext、GetRows 等) 都会计数，便于比较逐行读取与批量读取的调用次数。
+
+执行 python -m utils.fake_ado 可直接跑基准测试。
+"""
+import datetime
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+try:
+    from .fake_everything import FakeEntry, synthetic_corpus
+    from .trigram_index import SubstringIndex
+except ImportError:
+    from fake_everything import FakeEntry, synthetic_corpus
+    from trigram_index import SubstringIndex
+
+# FILETIME 与 POSIX epoch 的差距 (100 纳秒刻度)
+_FILETIME_EPOCH_OFFSET = 116444736000000000
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+FILE_ATTRIBUTE_DIRECTORY = 0x10
+FILE_ATTRIBUTE_ARCHIVE = 0x20
+
+# 扩展名对应的 System.Kind；不在表中的类型没有 Kind (读取时需以 FileAttributes 判断)
+_KINDS = {
+    'txt': ('document',), 'pdf': ('document',), 'docx': ('document',), 'xlsx': ('document',),
+    'jpg': ('picture',), 'png': ('picture',), 'mp4': ('video',),
+}
+
+# 支持的 Windows Search 属性
+_PROPERTIES = frozenset((
+    'System.ItemPathDisplay', 'System.Size', 'System.DateModified', 'System.DateCreated',
+    'System.Kind', 'System.FileAttributes', 'System.FileName',
+))
+
+_SQL_PATTERN = re.compile(
+    r"SELECT\s+(?:TOP\s+(?P<top>\d+)\s+)?(?P<columns>.+?)\s+FROM\s+SystemIndex"
+    r".*?LIKE\s+'%(?P<query>(?:[^']|'')*)%'"
+    r"(?P<order>.*ORDER\s+BY\s+System\.DateModified\s+DESC)?",
+    re.IGNORECASE | re.DOTALL)
+
+
+def _filetime_to_datetime(filetime: int) -> datetime.datetime:
+    return _EPOCH + datetime.timedelta(microseconds=(filetime - _FILETIME_EPOCH_OFFSET) // 10)
+
+
+class _Field:
+    __slots__ = ('Value',)
+
+    def __init__(self, value):
+        self.Value = value
+
+
+class FakeRecordset:
+    """只进 (forward-only) 记录集"""
+
+    def __init__(self, provider: 'FakeADOProvider', columns: List[str], rows: List[FakeEntry]):
+        self._provider = provider
+        self._columns = columns
+        self._rows = rows
+        self._position = 0
+        self._open = True
+
+    def _call(self):
+        self._provider.count_call()
+        if not self._open:
+            raise RuntimeError("记录集已关闭")
+
+    @property
+    def EOF(self) -> bool:
+        self._call()
+        return self._position >= len(self._rows)
+
+    def MoveNext(self):
+        self._call()
+        if self._position >= len(self._rows):
+            raise RuntimeError("BOF 或 EOF 中有一个是“真”")
+        self._position += 1
+
+    def Move(self, count: int, start=0):
+        self._call()
+        self._position = min(self._position + count, len(self._rows))
+
+    def Fields(self, name: str) -> _Field:
+        self._call()
+        if name not in self._columns:
+            raise KeyError(f"项目不在集合中: {name}")
+        if self._position >= len(self._rows):
+            raise RuntimeError("BOF 或 EOF 中有一个是“真”")
+        return _Field(self._provider.value(self._rows[self._position], name))
+
+    def GetRows(self, Rows: int = -1, Start=0, Fields=None):
+        """与 pywin32 相同，返回按列排列的 tuple (第一维为字段，第二维为行)"""
+        self._call()
+        if self._position >= len(self._rows):
+            raise RuntimeError("BOF 或 EOF 中有一个是“真”")
+        if Fields is None:
+            names = self._columns
+        elif isinstance(Fields, str):
+            names = [Fields]
+        else:
+            names = list(Fields)
+        for name in names:
+            if name not in self._columns:
+                raise KeyError(f"项目不在集合中: {name}")
+
+        end = len(self._rows) if Rows is None or Rows < 0 else min(self._position + Rows, len(self._rows))
+        rows = self._rows[self._position:end]
+        self._position = end
+        value = self._provider.value
+        return tuple(tuple(value(entry, name) for entry in rows) for name in names)
+
+    def Close(self):
+        self._call()
+        self._open = False
+
+
+class FakeConnection:
+    def __init__(self, provider: 'FakeADOProvider', connection_string: str):
+        self.provider = provider
+        self.connection_string = connection_string
+        self.thread = threading.get_ident()
+        self.closed = False
+
+    def Close(self):
+        self.provider.count_call()
+        self.closed = True
+
+
+class FakeADOProvider:
+    """
+    以合成数据回应 Windows Search SQL 的 ADO 提供者 (接口与 ado_pool.ComADOProvider 相同)
+
+    Args:
+        entries: 数据项目，None 时生成 count 条合成数据
+        count: 合成数据条数
+        seed: 合成数据的随机种子
+        call_latency: 每次 COM 调用额外等待的秒数 (模拟跨进程调用的成本)
+    """
+
+    def __init__(self, entries: Optional[Sequence[FakeEntry]] = None, count: int = 100000,
+                 seed: int = 0, call_latency: float = 0.0):
+        if entries is None:
+            entries = synthetic_corpus(count, seed)
+        self.entries = list(entries)
+        self._names = SubstringIndex([entry.filename.lower().encode('utf-8')
+                                      for entry in self.entries])
+        self.call_latency = call_latency
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.com_initializations = 0
+        self.initialized_threads = set()
+        self.connections_opened = 0
+        self.recordsets_opened = 0
+
+    def count_call(self):
+        with self._lock:
+            self.calls += 1
+        if self.call_latency:
+            time.sleep(self.call_latency)
+
+    def value(self, entry: FakeEntry, name: str):
+        """项目的 Windows Search 属性值 (与 pywin32 返回的类型相同)"""
+        if name == 'System.ItemPathDisplay':
+            return f"{entry.path}\\{entry.filename}"
+        if name == 'System.Size':
+            return None if entry.is_folder else entry.size
+        if name == 'System.DateModified':
+            return _filetime_to_datetime(entry.date_modified)
+        if name == 'System.DateCreated':
+            return _filetime_to_datetime(entry.date_created)
+        if name == 'System.Kind':
+            if entry.is_folder:
+                return ('folder',)
+            return _KINDS.get(entry.filename.rsplit('.', 1)[-1])
+        if name == 'System.FileAttributes':
+            return FILE_ATTRIBUTE_DIRECTORY if entry.is_folder else FILE_ATTRIBUTE_ARCHIVE
+        if name == 'System.FileName':
+            return entry.filename
+        raise KeyError(f"项目不在集合中: {name}")
+
+    # ComADOProvider 接口
+
+    def initialize_thread(self):
+        with self._lock:
+            self.com_initializations += 1
+            self.initialized_threads.add(threading.get_ident())
+
+    def open_connection(self, connection_string: str) -> FakeConnection:
+        self.count_call()
+        with self._lock:
+            self.connections_opened += 1
+        return FakeConnection(self, connection_string)
+
+    def open_recordset(self, connection: FakeConnection, sql_query: str) -> FakeRecordset:
+        self.count_call()
+        if connection.closed:
+            raise RuntimeError("连接已关闭")
+        if connection.thread != threading.get_ident():
+            raise RuntimeError("连接不能跨线程使用")
+        match = _SQL_PATTERN.search(sql_query)
+        if match is None:
+            raise ValueError(f"不支持的 SQL: {sql_query}")
+
+        columns = [column.strip() for column in match.group('columns').split(',')]
+        unknown = [column for column in columns if column not in _PROPERTIES]
+        if unknown:
+            raise ValueError(f"未知的属性: {', '.join(unknown)}")
+        query = match.group('query').replace("''", "'").strip().lower()
+        rows = [self.entries[i] for i in self._names.find(query.encode('utf-8'))]
+        if match.group('order'):
+            rows.sort(key=lambda entry: entry.date_modified, reverse=True)
+        if match.group('top'):
+            rows = rows[:int(match.group('top'))]
+
+        with self._lock:
+            self.recordsets_opened += 1
+        return FakeRecordset(self, columns, rows)
+
+    def stats(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'com_initializations': self.com_initializations,
+            'connections_opened': self.connections_opened,
+            'recordsets_opened': self.recordsets_opened,
+        }
+
+
+def benchmark(count: int = 100000, max_results: int = 100, repeat: int = 20,
+              queries: Sequence[str] = ("report", "backup_final", "txt", "zzz_not_found")):
+    """量测 WindowsSearchAPI 在假 ADO 提供者上的吞吐量与 COM 调用次数"""
+    try:
+        from .windows_search_api import WindowsSearchAPI
+    except ImportError:
+        from windows_search_api import WindowsSearchAPI
+
+    print(f"生成 {count} 条合成数据...")
+    provider = FakeADOProvider(count=count)
+    api = WindowsSearchAPI(provider=provider)
+
+    for query in queries:
+        calls = provider.calls
+        rows = 0
+        started = time.perf_counter()
+        for _ in range(repeat):
+            batch, _total = api.search(query, max_results)
+            rows += len(batch)
+        elapsed = time.perf_counter() - started
+        per_query = (provider.calls - calls) / repeat
+        print(f"{query!r}: {rows // repeat} 条/次, {elapsed / repeat * 1000:.2f} ms/次, "
+              f"COM 调用 {per_query:.0f} 次/查询")
+
+    for query in queries:
+        calls = provider.calls
+        started = time.perf_counter()
+        total = api.count(query)
+        elapsed = time.perf_counter() - started
+        print(f"count({query!r}) = {total}, {elapsed * 1000:.2f} ms, "
+              f"COM 调用 {provider.calls - calls} 次")
+
+    print(f"连接池: {api.status()['connection_pool']}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="WindowsSearchAPI 假 ADO 提供者基准测试")
+    parser.add_argument("--count", type=int, default=100000, help="合成数据条数")
+    parser.add_argument("--max", type=int, default=100, help="每次查询的最大结果数")
+    parser.add_argument("--repeat", type=int, default=20, help="每个查询重复次数")
+    args = parser.parse_args()
+    benchmark(args.count, args.max, args.repeat)
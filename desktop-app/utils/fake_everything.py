@@ -0,0 +1,345 @@
+"""
+假的 Everything DLL - 以純 Python 提供與 Everything64.dll 相同的 Everything_* 函數
+搭配 EverythingSDK(dll=...) 使用，可在 Linux 上以合成資料量測包裝層的吞吐量與記憶體配置。
+
+函數物件與 ctypes 函數一樣可設定 argtypes / restype，呼叫時以 argtypes 檢查參數型別、
+以 restype 轉換返回值，並透過 byref 參數 (c_ulonglong) 寫回數值，
+因此 EverythingSDK 的熱路徑 (包含緩衝區共用與欄位投影) 與在 Windows 上完全相同。
+
+執行 python -m utils.fake_everything 可直接跑基準測試。
+"""
+import ctypes
+import random
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Sequence, Tuple
+
+try:
+    from .trigram_index import SubstringIndex
+except ImportError:
+    from trigram_index import SubstringIndex
+
+# 與 everything_sdk 相同的要求旗標
+EVERYTHING_REQUEST_FILE_NAME = 0x00000001
+EVERYTHING_REQUEST_PATH = 0x00000002
+EVERYTHING_REQUEST_FULL_PATH_AND_FILE_NAME = 0x00000004
+EVERYTHING_REQUEST_EXTENSION = 0x00000008
+EVERYTHING_REQUEST_SIZE = 0x00000010
+EVERYTHING_REQUEST_DATE_CREATED = 0x00000020
+EVERYTHING_REQUEST_DATE_MODIFIED = 0x00000040
+EVERYTHING_REQUEST_DATE_ACCESSED = 0x00000080
+
+EVERYTHING_OK = 0
+EVERYTHING_ERROR_INVALIDINDEX = 6
+EVERYTHING_ERROR_INVALIDREQUEST = 8
+
+# 2024-01-01 的 FILETIME (100 奈秒為單位，自 1601-01-01 起算)
+_BASE_FILETIME = 133485408000000000
+_FILETIME_PER_DAY = 864000000000
+
+# 合成檔名的字彙
+_WORDS = (
+    "report", "invoice", "backup", "photo", "project", "readme", "config", "setup",
+    "notes", "draft", "final", "budget", "meeting", "design", "export", "import",
+    "client", "server", "build", "release", "test", "data", "summary", "archive",
+    "報告", "會議", "專案", "備份",
+)
+_EXTENSIONS = ("txt", "pdf", "docx", "xlsx", "jpg", "png", "py", "js", "json", "zip", "mp4", "log")
+_DIRECTORIES = (
+    "Users\\demo\\Documents", "Users\\demo\\Desktop", "Users\\demo\\Downloads",
+    "Users\\demo\\Pictures", "Work\\projects", "Work\\archive", "Program Files\\App",
+    "Windows\\System32", "Data\\backup",
+)
+
+
+class FakeEntry:
+    """合成資料中的一個項目"""
+    __slots__ = ('filename', 'path', 'size', 'date_created', 'date_modified',
+                 'date_accessed', 'is_folder')
+
+    def __init__(self, filename: str, path: str, size: int, date_created: int,
+                 date_modified: int, date_accessed: int, is_folder: bool):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.date_created = date_created
+        self.date_modified = date_modified
+        self.date_accessed = date_accessed
+        self.is_folder = is_folder
+
+
+def synthetic_corpus(count: int = 100000, seed: int = 0) -> List[FakeEntry]:
+    """產生固定亂數種子的合成檔案清單 (約 5% 為資料夾)"""
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        drive = "CDE"[i % 3]
+        path = f"{drive}:\\{rng.choice(_DIRECTORIES)}\\{rng.choice(_WORDS)}{i % 97}"
+        name = f"{rng.choice(_WORDS)}_{rng.choice(_WORDS)}_{i}"
+        created = _BASE_FILETIME - rng.randrange(3650) * _FILETIME_PER_DAY
+        modified = created + rng.randrange(365) * _FILETIME_PER_DAY
+        if rng.random() < 0.05:
+            entries.append(FakeEntry(name, path, 0, created, modified, modified, True))
+        else:
+            entries.append(FakeEntry(f"{name}.{rng.choice(_EXTENSIONS)}", path,
+                                     rng.randrange(1 << 30), created, modified, modified, False))
+    return entries
+
+
+class _FakeFunction:
+    """模擬 ctypes 的外部函數：依 argtypes 檢查參數、依 restype 轉換返回值"""
+    __slots__ = ('name', '_impl', 'argtypes', 'restype', 'calls')
+
+    def __init__(self, name: str, impl: Callable):
+        self.name = name
+        self._impl = impl
+        self.argtypes = None
+        # ctypes 預設的返回型別
+        self.restype = ctypes.c_int
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        argtypes = self.argtypes
+        if argtypes is not None:
+            if len(args) != len(argtypes):
+                raise TypeError(f"{self.name} takes {len(argtypes)} arguments ({len(args)} given)")
+            for position, (argtype, arg) in enumerate(zip(argtypes, args), 1):
+                try:
+                    argtype.from_param(arg)
+                except TypeError as e:
+                    raise ctypes.ArgumentError(f"argument {position}: {e}") from None
+        result = self._impl(*args)
+        restype = self.restype
+        if restype is ctypes.c_bool:
+            return bool(result)
+        if restype is ctypes.c_wchar_p or restype is None:
+            return result
+        if result is None:
+            # void 函數：ctypes 會返回暫存器中的任意值，這裡固定為 0
+            return 0
+        # 整數型別依寬度截斷，與 C 的返回值相同
+        return restype(result).value
+
+
+class FakeEverythingDLL:
+    """以合成資料回應查詢的 Everything DLL 替身
+
+    查詢語法只支援 Everything 的預設行為：以空白分隔的字詞須全部出現在檔名中 (不分大小寫)，
+    含有反斜線的字詞則比對完整路徑；結果依檔名排序。
+
+    Args:
+        entries: 資料項目，None 時產生 count 筆合成資料
+        count: 合成資料筆數
+        seed: 合成資料的亂數種子
+    """
+
+    def __init__(self, entries: Optional[Sequence[FakeEntry]] = None, count: int = 100000,
+                 seed: int = 0):
+        if entries is None:
+            entries = synthetic_corpus(count, seed)
+        # Everything 預設依檔名排序
+        self.entries = sorted(entries, key=lambda entry: entry.filename.lower())
+        self._names = SubstringIndex([entry.filename.lower().encode('utf-8')
+                                      for entry in self.entries])
+
+        self._search = ""
+        self._request_flags = EVERYTHING_REQUEST_FILE_NAME | EVERYTHING_REQUEST_PATH
+        self._max = 0xFFFFFFFF
+        self._offset = 0
+        self._matches: List[int] = []
+        self._visible: List[FakeEntry] = []
+        self._last_error = EVERYTHING_OK
+        self.query_seconds = 0.0
+
+        for name, impl in (
+                ('Everything_SetSearchW', self._set_search),
+                ('Everything_SetRequestFlags', self._set_request_flags),
+                ('Everything_GetRequestFlags', lambda: self._request_flags),
+                ('Everything_SetMax', self._set_max),
+                ('Everything_SetOffset', self._set_offset),
+                ('Everything_QueryW', self._query),
+                ('Everything_GetNumResults', lambda: len(self._visible)),
+                ('Everything_GetTotResults', lambda: len(self._matches)),
+                ('Everything_GetLastError', lambda: self._last_error),
+                ('Everything_GetResultFileNameW', self._get_filename),
+                ('Everything_GetResultPathW', self._get_path),
+                ('Everything_GetResultExtensionW', self._get_extension),
+                ('Everything_GetResultFullPathNameW', self._get_full_path),
+                ('Everything_GetResultSize', self._get_size),
+                ('Everything_GetResultDateCreated', self._date_getter('date_created', EVERYTHING_REQUEST_DATE_CREATED)),
+                ('Everything_GetResultDateModified', self._date_getter('date_modified', EVERYTHING_REQUEST_DATE_MODIFIED)),
+                ('Everything_GetResultDateAccessed', self._date_getter('date_accessed', EVERYTHING_REQUEST_DATE_ACCESSED)),
+                ('Everything_IsFileResult', lambda i: self._entry(i) is not None and not self._visible[i].is_folder),
+                ('Everything_IsFolderResult', lambda i: self._entry(i) is not None and self._visible[i].is_folder),
+                ('Everything_Reset', self._reset),
+        ):
+            setattr(self, name, _FakeFunction(name, impl))
+
+    # 查詢狀態
+
+    def _set_search(self, search: str):
+        self._search = search or ""
+
+    def _set_request_flags(self, flags: int):
+        self._request_flags = flags
+
+    def _set_max(self, max_results: int):
+        self._max = max_results
+
+    def _set_offset(self, offset: int):
+        self._offset = offset
+
+    def _reset(self):
+        self._search = ""
+        self._request_flags = EVERYTHING_REQUEST_FILE_NAME | EVERYTHING_REQUEST_PATH
+        self._max = 0xFFFFFFFF
+        self._offset = 0
+        self._matches = []
+        self._visible = []
+
+    def _query(self, wait: bool) -> bool:
+        started = time.perf_counter()
+        terms = self._search.lower().split()
+        path_terms = [term for term in terms if '\\' in term]
+        name_terms = sorted((term for term in terms if '\\' not in term), key=len, reverse=True)
+
+        if name_terms:
+            encoded = [term.encode('utf-8') for term in name_terms]
+            # 以最長的字詞取得候選，其餘字詞逐一驗證
+            ids = self._names.find(encoded[0])
+            docs = self._names.docs
+            for term in encoded[1:]:
+                ids = [i for i in ids if term in docs[i]]
+        else:
+            ids = list(range(len(self.entries)))
+
+        entries = self.entries
+        if path_terms:
+            ids = [i for i in ids
+                   if all(term in f"{entries[i].path}\\{entries[i].filename}".lower()
+                          for term in path_terms)]
+
+        self._matches = ids
+        visible = ids[self._offset:self._offset + self._max]
+        self._visible = [entries[i] for i in visible]
+        self._last_error = EVERYTHING_OK
+        self.query_seconds += time.perf_counter() - started
+        return True
+
+    # 結果
+
+    def _entry(self, index: int) -> Optional[FakeEntry]:
+        if 0 <= index < len(self._visible):
+            return self._visible[index]
+        self._last_error = EVERYTHING_ERROR_INVALIDINDEX
+        return None
+
+    def _requested(self, flag: int) -> bool:
+        if self._request_flags & flag:
+            return True
+        self._last_error = EVERYTHING_ERROR_INVALIDREQUEST
+        return False
+
+    def _get_filename(self, index: int) -> Optional[str]:
+        entry = self._entry(index)
+        if entry is None or not self._requested(EVERYTHING_REQUEST_FILE_NAME):
+            return None
+        return entry.filename
+
+    def _get_path(self, index: int) -> Optional[str]:
+        entry = self._entry(index)
+        if entry is None or not self._requested(EVERYTHING_REQUEST_PATH):
+            return None
+        return entry.path
+
+    def _get_extension(self, index: int) -> Optional[str]:
+        entry = self._entry(index)
+        if entry is None or not self._requested(EVERYTHING_REQUEST_EXTENSION):
+            return None
+        if entry.is_folder or '.' not in entry.filename:
+            return ""
+        return entry.filename.rsplit('.', 1)[1]
+
+    def _get_full_path(self, index: int, buffer, buffer_size: int) -> int:
+        entry = self._entry(index)
+        if entry is None:
+            return 0
+        full_path = f"{entry.path}\\{entry.filename}"
+        if buffer is None:
+            # 與 SDK 相同：未提供緩衝區時返回所需長度
+            return len(full_path)
+        full_path = full_path[:max(buffer_size - 1, 0)]
+        buffer.value = full_path
+        return len(full_path)
+
+    def _write_value(self, target, value: int) -> bool:
+        target.value = value
+        return True
+
+    def _get_size(self, index: int, target) -> bool:
+        entry = self._entry(index)
+        if entry is None or not self._requested(EVERYTHING_REQUEST_SIZE):
+            return False
+        if entry.is_folder:
+            # 未啟用資料夾大小索引時 Everything 不提供資料夾大小
+            return False
+        return self._write_value(target, entry.size)
+
+    def _date_getter(self, attribute: str, flag: int) -> Callable:
+        def get_date(index: int, target) -> bool:
+            entry = self._entry(index)
+            if entry is None or not self._requested(flag):
+                return False
+            return self._write_value(target, getattr(entry, attribute))
+        return get_date
+
+
+def benchmark(count: int = 200000, max_results: int = 1000, repeat: int = 20,
+              queries: Sequence[str] = ("report", "backup_final", "txt", "zzz_not_found")):
+    """量測 EverythingSDK 在假 DLL 上的吞吐量與記憶體配置"""
+    try:
+        from .everything_sdk import EverythingSDK
+    except ImportError:
+        from everything_sdk import EverythingSDK
+
+    print(f"建立 {count} 筆合成資料...")
+    fake_dll = FakeEverythingDLL(count=count)
+    sdk = EverythingSDK(dll=fake_dll)
+
+    projections: Tuple[Tuple[str, Optional[Tuple[str, ...]]], ...] = (
+        ("全部欄位", None),
+        ("filename,path", ('filename', 'path')),
+    )
+    for label, fields in projections:
+        for query in queries:
+            fake_dll.query_seconds = 0.0
+            rows = 0
+            started = time.perf_counter()
+            for _ in range(repeat):
+                batch, _total = sdk.search(query, max_results, fields=fields)
+                rows += len(batch)
+            elapsed = time.perf_counter() - started
+            # 扣除假 DLL 本身的查詢時間，只留下包裝層的逐列取得成本
+            wrapper = max(elapsed - fake_dll.query_seconds, 1e-9)
+
+            tracemalloc.start()
+            batch, _total = sdk.search(query, max_results, fields=fields)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            per_row = wrapper / rows * 1e6 if rows else 0.0
+            print(f"[{label}] {query!r}: {len(batch)} 筆/次, "
+                  f"{elapsed / repeat * 1000:.2f} ms/次 (包裝層 {per_row:.2f} µs/筆), "
+                  f"保留 {current / 1024:.1f} KB, 峰值 {peak / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="EverythingSDK 假 DLL 基準測試")
+    parser.add_argument("--count", type=int, default=200000, help="合成資料筆數")
+    parser.add_argument("--max", type=int, default=1000, help="每次查詢的最大結果數")
+    parser.add_argument("--repeat", type=int, default=20, help="每個查詢重複次數")
+    args = parser.parse_args()
+    benchmark(args.count, args.max, args.repeat)
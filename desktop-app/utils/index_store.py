@@ -0,0 +1,197 @@
+"""
+本機索引的持久化格式
+以版本化的二進位檔保存 LocalFileIndex：檔頭 + 區段表 + 固定寬度的紀錄陣列 + 名稱池。
+寫入時先寫暫存檔再以 os.replace 原子替換；讀取時以 mmap 開啟，
+陣列直接以 memoryview 對應到檔案內容，不需要解析或複製，因此啟動後第一次查詢即可使用。
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from typing import Dict, Optional, Tuple
+
+try:
+    from .local_index import LocalFileIndex
+except ImportError:
+    from local_index import LocalFileIndex
+
+# 檔案格式
+INDEX_MAGIC = b'LEWIDX\0\0'
+INDEX_VERSION = 1
+BYTE_ORDER_MARK = 0x01020304
+
+# 檔頭: magic, version, byte order mark, entry count, section count
+_HEADER = struct.Struct('<8sIIQI4x')
+# 區段表: name (16 bytes), offset, length
+_SECTION = struct.Struct('<16sQQ')
+_ALIGNMENT = 8
+
+# 區段名稱與陣列型別 (依寫入順序)
+_ARRAY_SECTIONS = [
+    ('name_offsets', 'Q'),
+    ('lower_offsets', 'Q'),
+    ('sizes', 'q'),
+    ('mtimes', 'q'),
+    ('ctimes', 'q'),
+    ('parents', 'i'),
+    ('flags', 'B'),
+]
+_POOL_SECTIONS = ['name_pool', 'lower_pool']
+
+
+class MappedPool:
+    """mmap 中的名稱池視圖，提供 LocalFileIndex 需要的 bytes 操作而不複製資料"""
+
+    def __init__(self, mapping: mmap.mmap, offset: int, length: int):
+        self._mapping = mapping
+        self._start = offset
+        self._end = offset + length
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            return self._mapping[self._start + start:self._start + stop:step]
+        if key < 0:
+            key += len(self)
+        return self._mapping[self._start + key]
+
+    def find(self, sub: bytes, start: int = 0) -> int:
+        position = self._mapping.find(sub, self._start + start, self._end)
+        return position - self._start if position >= 0 else -1
+
+    def count(self, sub: bytes) -> int:
+        total = 0
+        position = self.find(sub)
+        while position >= 0:
+            total += 1
+            position = self.find(sub, position + len(sub))
+        return total
+
+    def finditer(self, pattern):
+        """以正規表示式掃描名稱池，返回的 match 位置為檔案內位移"""
+        return _OffsetMatches(pattern.finditer(self._mapping, self._start, self._end), self._start)
+
+
+class _OffsetMatches:
+    """將 mmap 上的 match 位置換算為名稱池內位移"""
+
+    def __init__(self, matches, base: int):
+        self._matches = matches
+        self._base = base
+
+    def __iter__(self):
+        for match in self._matches:
+            yield _PoolMatch(match.start() - self._base)
+
+
+class _PoolMatch:
+    __slots__ = ('_start',)
+
+    def __init__(self, start: int):
+        self._start = start
+
+    def start(self) -> int:
+        return self._start
+
+
+def _padding(position: int) -> int:
+    return (-position) % _ALIGNMENT
+
+
+def save_index(index: LocalFileIndex, path: str, metadata: Optional[Dict] = None):
+    """
+    以原子替換的方式將索引寫入檔案
+
+    Args:
+        index: 要保存的索引
+        path: 目標檔案路徑
+        metadata: 額外資訊 (例如爬取的根目錄)，以 JSON 保存
+    """
+    # 檔案格式不包含增量變更，先合併回名稱池
+    index = index.compact()
+    sections = [(name, memoryview(getattr(index, name)).cast('B')) for name, _ in _ARRAY_SECTIONS]
+    sections += [(name, memoryview(bytes(getattr(index, name)[:]))) for name in _POOL_SECTIONS]
+    sections.append(('root_ids', memoryview(struct.pack(f'<{len(index.root_ids)}i', *index.root_ids))))
+    sections.append(('metadata', memoryview(json.dumps(metadata or {}).encode('utf-8'))))
+
+    # 計算每個區段的位移 (8 位元組對齊，讓 memoryview.cast 可直接使用)
+    position = _HEADER.size + _SECTION.size * len(sections)
+    table = []
+    for name, data in sections:
+        position += _padding(position)
+        table.append((name, position, data.nbytes))
+        position += data.nbytes
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix='.index-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, BYTE_ORDER_MARK, len(index), len(sections)))
+            for name, offset, length in table:
+                f.write(_SECTION.pack(name.encode('ascii'), offset, length))
+            for (name, data), (_, offset, _) in zip(sections, table):
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load_index(path: str) -> Optional[Tuple[LocalFileIndex, Dict]]:
+    """
+    以 mmap 開啟索引檔
+
+    Returns:
+        (index, metadata)；檔案不存在、版本不符或格式損壞時返回 None
+    """
+    try:
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        magic, version, byte_order, count, section_count = _HEADER.unpack_from(mapping, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            return None
+        if byte_order != BYTE_ORDER_MARK or sys.byteorder != 'little':
+            return None
+
+        table = {}
+        for i in range(section_count):
+            raw_name, offset, length = _SECTION.unpack_from(mapping, _HEADER.size + i * _SECTION.size)
+            if offset + length > len(mapping):
+                return None
+            table[raw_name.rstrip(b'\0').decode('ascii')] = (offset, length)
+
+        view = memoryview(mapping)
+        index = LocalFileIndex()
+        for name, typecode in _ARRAY_SECTIONS:
+            offset, length = table[name]
+            setattr(index, name, view[offset:offset + length].cast(typecode))
+        for name in _POOL_SECTIONS:
+            offset, length = table[name]
+            setattr(index, name, MappedPool(mapping, offset, length))
+        offset, length = table['root_ids']
+        index._root_ids = list(struct.unpack_from(f'<{length // 4}i', mapping, offset))
+        offset, length = table['metadata']
+        metadata = json.loads(mapping[offset:offset + length].decode('utf-8'))
+
+        if len(index.parents) != count or len(index.name_offsets) != count + 1:
+            return None
+        index.next_id = count
+        return index, metadata
+    except (KeyError, struct.error, ValueError, TypeError):
+        return None
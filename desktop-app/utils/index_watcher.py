@@ -0,0 +1,409 @@
+"""
+本機索引的增量維護
+Linux 上以 inotify 監看所有已索引的目錄；其他平台 (或 inotify watch 數量不足時)
+改為定期比對目錄的 mtime。兩種模式都只找出「有變動的目錄」，再重新掃描該目錄並與索引比對，
+產生新增 / 刪除 / 改名 / 修改的差異，以小批次套用到索引 (LocalFileIndex.apply_changes)。
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from .local_index import ENTRY_FLAG_DELETED, ENTRY_FLAG_FOLDER, IndexEntry, LocalFileIndex
+except ImportError:
+    from local_index import ENTRY_FLAG_DELETED, ENTRY_FLAG_FOLDER, IndexEntry, LocalFileIndex
+
+# inotify 常數 (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONTFOLLOW = 0x02000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_ONLYDIR | IN_DONTFOLLOW)
+
+# struct inotify_event: wd, mask, cookie, len
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    """透過 ctypes 呼叫 libc 的最小 inotify 介面"""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        # 非 Linux 平台沒有這些函數，會拋出 AttributeError
+        self._libc.inotify_init1.argtypes = [ctypes.c_int]
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout: float) -> List[Tuple[int, int, str]]:
+        """讀取事件，最多等待 timeout 秒；返回 (wd, mask, name) 列表"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class IndexWatcher:
+    """監看已索引的目錄並把變更以批次套用到 LocalIndexBackend
+
+    Args:
+        backend: 擁有索引的後端 (需提供 index、apply_changes()、exclude、follow_symlinks)
+        mode: 'auto' (可用時使用 inotify)、'inotify' 或 'polling'
+        poll_interval: 輪詢模式下比對目錄 mtime 的間隔 (秒)
+        batch_delay: 收到第一個事件後再等待多久一起套用 (秒)
+    """
+
+    def __init__(self, backend, mode: str = 'auto', poll_interval: float = 60.0,
+                 batch_delay: float = 0.5):
+        self.backend = backend
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.batch_delay = batch_delay
+        self.active_mode: Optional[str] = None
+        self._inotify: Optional[Inotify] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        # 由監看執行緒獨佔維護的對照表
+        self._children: Dict[int, array] = {}
+        self._dir_mtimes: Dict[int, Optional[int]] = {}
+        self._wd_to_dir: Dict[int, int] = {}
+        self._dir_to_wd: Dict[int, int] = {}
+        self._next_id = 0
+
+        self.batches_applied = 0
+        self.changes_applied = 0
+        self.last_event_at: Optional[float] = None
+        self.last_scan_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="local-index-watch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def status(self) -> Dict:
+        return {
+            'mode': self.active_mode,
+            'watched_directories': len(self._wd_to_dir),
+            'batches_applied': self.batches_applied,
+            'changes_applied': self.changes_applied,
+            'last_event_at': self.last_event_at,
+            'last_scan_at': self.last_scan_at,
+            'error': self.error,
+        }
+
+    # ------------------------------------------------------------------
+    # 主迴圈
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        try:
+            self._build_maps(self.backend.index)
+            if self.mode in ('auto', 'inotify'):
+                self._setup_inotify()
+            self.active_mode = 'inotify' if self._inotify is not None else 'polling'
+
+            # 啟動時比對一次目錄 mtime，補上程式未執行期間的變更
+            self._apply_dirty(self._poll_changed_dirs())
+
+            if self._inotify is not None:
+                self._inotify_loop()
+            else:
+                while not self._stop_event.wait(self.poll_interval):
+                    self._apply_dirty(self._poll_changed_dirs())
+        except Exception as e:
+            self.error = str(e)
+            print(f"⚠ 本機索引監看停止: {e}")
+
+    def _build_maps(self, index: LocalFileIndex):
+        """由索引快照建立父目錄 → 子項目與目錄 mtime 對照表"""
+        children: Dict[int, array] = {}
+        dir_mtimes: Dict[int, Optional[int]] = {}
+        for entry_id in range(len(index)):
+            flags = index.get_flags(entry_id)
+            if flags & ENTRY_FLAG_DELETED:
+                continue
+            parent = index.get_parent(entry_id)
+            if parent >= 0:
+                child_ids = children.get(parent)
+                if child_ids is None:
+                    child_ids = children[parent] = array('i')
+                child_ids.append(entry_id)
+            if flags & ENTRY_FLAG_FOLDER:
+                # None 表示尚未記錄奈秒精度的 mtime，第一次比對時使用索引中的秒數
+                dir_mtimes[entry_id] = None
+        self._children = children
+        self._dir_mtimes = dir_mtimes
+        self._next_id = len(index)
+
+    def _setup_inotify(self):
+        try:
+            self._inotify = Inotify()
+        except (OSError, AttributeError) as e:
+            if self.mode == 'inotify':
+                self.error = f"inotify 無法使用: {e}"
+            return
+
+        index = self.backend.index
+        for dir_id in list(self._dir_mtimes):
+            if not self._add_watch(index.get_dir_path(dir_id), dir_id):
+                # watch 數量達到上限 (ENOSPC)，改用輪詢
+                print("⚠ inotify watch 數量不足，本機索引改以輪詢方式更新")
+                self._inotify.close()
+                self._inotify = None
+                self._wd_to_dir.clear()
+                self._dir_to_wd.clear()
+                return
+
+    def _add_watch(self, path: str, dir_id: int) -> bool:
+        if self._inotify is None:
+            return True
+        try:
+            wd = self._inotify.add_watch(path)
+        except OSError as e:
+            return e.errno != errno.ENOSPC
+        self._wd_to_dir[wd] = dir_id
+        self._dir_to_wd[dir_id] = wd
+        return True
+
+    def _inotify_loop(self):
+        dirty: Set[int] = set()
+        batch_started: Optional[float] = None
+        last_poll = time.monotonic()
+
+        while not self._stop_event.is_set():
+            timeout = 1.0 if batch_started is None else max(
+                0.0, self.batch_delay - (time.monotonic() - batch_started))
+            for wd, mask, _ in self._inotify.read_events(timeout):
+                if mask & IN_Q_OVERFLOW:
+                    # 事件佇列溢位，改以 mtime 比對找出所有變動的目錄
+                    dirty.update(self._poll_changed_dirs())
+                elif mask & IN_IGNORED:
+                    dir_id = self._wd_to_dir.pop(wd, None)
+                    if dir_id is not None:
+                        self._dir_to_wd.pop(dir_id, None)
+                elif wd in self._wd_to_dir:
+                    dirty.add(self._wd_to_dir[wd])
+                if batch_started is None:
+                    batch_started = time.monotonic()
+                self.last_event_at = time.time()
+
+            if batch_started is not None and time.monotonic() - batch_started >= self.batch_delay:
+                self._apply_dirty(dirty)
+                dirty = set()
+                batch_started = None
+
+            # 定期補做 mtime 比對，涵蓋 inotify 看不到的變更 (例如網路磁碟)
+            if self.poll_interval and time.monotonic() - last_poll >= self.poll_interval:
+                self._apply_dirty(self._poll_changed_dirs())
+                last_poll = time.monotonic()
+
+    def _poll_changed_dirs(self) -> Set[int]:
+        """比對所有目錄的 mtime，返回有變動的目錄編號"""
+        index = self.backend.index
+        changed = set()
+        for dir_id, recorded in list(self._dir_mtimes.items()):
+            try:
+                st = os.stat(index.get_dir_path(dir_id))
+            except OSError:
+                # 目錄已不存在，由父目錄的比對處理刪除
+                parent = index.get_parent(dir_id)
+                if parent >= 0:
+                    changed.add(parent)
+                continue
+            if recorded is None:
+                if int(st.st_mtime) != index.get_record(dir_id).mtime:
+                    changed.add(dir_id)
+            elif st.st_mtime_ns != recorded:
+                changed.add(dir_id)
+            self._dir_mtimes[dir_id] = st.st_mtime_ns
+        self.last_scan_at = time.time()
+        return changed
+
+    # ------------------------------------------------------------------
+    # 目錄比對
+    # ------------------------------------------------------------------
+
+    def _apply_dirty(self, dirty: Set[int]):
+        if not dirty:
+            return
+        index = self.backend.index
+        upserts: Dict[int, IndexEntry] = {}
+        deletes: List[int] = []
+        for dir_id in dirty:
+            if dir_id in self._dir_mtimes:
+                self._diff_dir(index, dir_id, upserts, deletes)
+        if upserts or deletes:
+            self.backend.apply_changes(upserts, deletes)
+            self.batches_applied += 1
+            self.changes_applied += len(upserts) + len(deletes)
+
+    def _diff_dir(self, index: LocalFileIndex, dir_id: int, upserts: Dict[int, IndexEntry],
+                  deletes: List[int]):
+        """重新掃描單一目錄並與索引中的子項目比對"""
+        path = index.get_dir_path(dir_id)
+        try:
+            with os.scandir(path) as it:
+                current = list(it)
+        except OSError:
+            return
+
+        known = {}
+        for child_id in self._children.get(dir_id, ()):
+            record = upserts.get(child_id) or index.get_record(child_id)
+            known[record.name] = (child_id, record)
+
+        added = []
+        removed = []
+        for entry in current:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=self.backend.follow_symlinks)
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir and entry.name in self.backend.exclude:
+                continue
+
+            flag = ENTRY_FLAG_FOLDER if is_dir else 0
+            existing = known.pop(entry.name, None)
+            if existing is None:
+                added.append((entry, flag, st))
+                continue
+
+            child_id, record = existing
+            if (record.flags & ENTRY_FLAG_FOLDER) != flag:
+                # 檔案與資料夾互換 (例如刪除後以相同名稱重建)
+                removed.append(child_id)
+                added.append((entry, flag, st))
+            elif not is_dir and (record.size != st.st_size or record.mtime != int(st.st_mtime)):
+                upserts[child_id] = record._replace(size=st.st_size, mtime=int(st.st_mtime))
+
+        # 掃描不到的項目視為已刪除 (改名會表現為刪除舊名稱 + 新增新名稱)
+        removed.extend(child_id for child_id, _ in known.values())
+        # 先刪除再新增：改名後的資料夾與舊名稱是同一個 inode，先移除舊名稱的監看，
+        # 新名稱才會重新加入監看並對應到新的項目
+        if removed:
+            for child_id in removed:
+                self._delete(child_id, deletes)
+            gone = set(removed)
+            self._children[dir_id] = array(
+                'i', [child_id for child_id in self._children.get(dir_id, ()) if child_id not in gone])
+        for entry, flag, st in added:
+            self._add(entry.name, entry.path, dir_id, flag, st, upserts)
+
+        try:
+            dir_stat = os.stat(path)
+        except OSError:
+            return
+        self._dir_mtimes[dir_id] = dir_stat.st_mtime_ns
+        record = upserts.get(dir_id) or index.get_record(dir_id)
+        if record.mtime != int(dir_stat.st_mtime):
+            upserts[dir_id] = record._replace(mtime=int(dir_stat.st_mtime))
+
+    def _add(self, name: str, path: str, parent: int, flag: int, st: os.stat_result,
+             upserts: Dict[int, IndexEntry]):
+        """新增項目；資料夾會一併爬取整個子樹並加入監看"""
+        entry_id = self._next_id
+        self._next_id += 1
+        upserts[entry_id] = IndexEntry(
+            name, parent, flag, 0 if flag & ENTRY_FLAG_FOLDER else st.st_size,
+            int(st.st_mtime), int(getattr(st, 'st_birthtime', st.st_ctime)))
+        self._children.setdefault(parent, array('i')).append(entry_id)
+        if not flag & ENTRY_FLAG_FOLDER:
+            return
+
+        self._children[entry_id] = array('i')
+        self._dir_mtimes[entry_id] = st.st_mtime_ns
+        self._add_watch(path, entry_id)
+        try:
+            with os.scandir(path) as it:
+                children = list(it)
+        except OSError:
+            return
+        for child in children:
+            try:
+                is_dir = child.is_dir(follow_symlinks=self.backend.follow_symlinks)
+                child_stat = child.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir and child.name in self.backend.exclude:
+                continue
+            self._add(child.name, child.path, entry_id,
+                      ENTRY_FLAG_FOLDER if is_dir else 0, child_stat, upserts)
+
+    def _delete(self, entry_id: int, deletes: List[int]):
+        """刪除項目；資料夾會一併刪除整個子樹並移除監看 (由呼叫端從父目錄的子項目中移除)"""
+        stack = [entry_id]
+        while stack:
+            current = stack.pop()
+            deletes.append(current)
+            self._dir_mtimes.pop(current, None)
+            wd = self._dir_to_wd.pop(current, None)
+            # 跨目錄改名時新名稱可能先被加入，inotify 對同一個 inode 返回相同的 wd；
+            # 只移除仍屬於這個項目的監看
+            if wd is not None and self._wd_to_dir.get(wd) == current:
+                del self._wd_to_dir[wd]
+                if self._inotify is not None:
+                    self._inotify.rm_watch(wd)
+            stack.extend(self._children.pop(current, ()))
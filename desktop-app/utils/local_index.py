@@ -0,0 +1,838 @@
+"""
+本機檔名索引 - 純 Python 實作的搜尋後端
+當 Everything、Windows Search 與簡化搜尋都無法使用時 (例如 Linux 伺服器或 CI)，
+以 os.scandir 爬取設定的根目錄，並用緊湊陣列保存索引：
+每個項目只記錄父目錄編號與自身名稱，完整路徑在輸出結果時才組合，與 Everything 的做法相同。
+"""
+import copy
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .parallel_crawler import normalize_roots
+    from .result_batch import ResultBatch, TIME_BASE_EPOCH, required_columns
+    from .search_backend import SearchBackend
+    from .trigram_index import TRIGRAM_SIZE, TrigramIndex, posting_count
+except ImportError:
+    from parallel_crawler import normalize_roots
+    from result_batch import ResultBatch, TIME_BASE_EPOCH, required_columns
+    from search_backend import SearchBackend
+    from trigram_index import TRIGRAM_SIZE, TrigramIndex, posting_count
+
+# 項目旗標
+ENTRY_FLAG_FOLDER = 0x01
+ENTRY_FLAG_ROOT = 0x02
+ENTRY_FLAG_DELETED = 0x04
+
+# 單一項目的紀錄 (增量變更使用)
+IndexEntry = namedtuple('IndexEntry', ['name', 'parent', 'flags', 'size', 'mtime', 'ctime'])
+
+# 名稱池分隔字元 (檔名不可能包含 NUL)
+POOL_SEPARATOR = b'\0'
+
+DEFAULT_EXCLUDE = ['.git', 'node_modules', '__pycache__', '$Recycle.Bin']
+
+
+class LocalFileIndex:
+    """以平行陣列保存的檔名索引
+
+    名稱以 NUL 分隔串接成一個 bytes 名稱池 (前後各有一個 NUL)，
+    另外保存一份小寫名稱池供搜尋使用；子字串、前綴與副檔名查詢
+    都直接在小寫名稱池上以 bytes.find 掃描，再用 bisect 換算回項目編號。
+
+    名稱池建立後不再修改；增量變更保存在 overlay 中，以 apply_changes()
+    產生新的快照，累積過多時再以 compact() 合併回名稱池。項目編號在整個生命週期中不變。
+
+    設定 trigrams (以 build_trigrams() 建立) 後，有選擇性的查詢改為交集 trigram 清單並只驗證候選項目，
+    不必掃描整個名稱池。
+    """
+
+    def __init__(self):
+        self.parents = array('i')
+        self.flags = array('B')
+        self.sizes = array('q')
+        self.mtimes = array('q')
+        self.ctimes = array('q')
+        self.name_pool = POOL_SEPARATOR
+        self.name_offsets = array('Q', [1])
+        self.lower_pool = POOL_SEPARATOR
+        self.lower_offsets = array('Q', [1])
+        # 增量變更: 新增或修改的紀錄、新增或改名項目的小寫名稱、名稱池中已失效的項目
+        self.overlay: Dict[int, IndexEntry] = {}
+        self.overlay_lower: Dict[int, bytes] = {}
+        self.hidden: frozenset = frozenset()
+        self.next_id = 0
+        self.generation = 0
+        # 名稱池的 trigram 索引 (與名稱池共用，compact() 後需重新建立)
+        self.trigrams: Optional[TrigramIndex] = None
+        self._root_ids: Optional[List[int]] = None
+        self._dir_paths: Dict[int, str] = {}
+        self._dir_paths_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.next_id
+
+    # ------------------------------------------------------------------
+    # 建立索引
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_entries(cls, names: List[str], parents: Iterable[int], flags: Iterable[int],
+                     sizes: Iterable[int], mtimes: Iterable[int], ctimes: Iterable[int]) -> 'LocalFileIndex':
+        """由平行列表建立索引"""
+        index = cls()
+        index.parents = array('i', parents)
+        index.flags = array('B', flags)
+        index.sizes = array('q', sizes)
+        index.mtimes = array('q', mtimes)
+        index.ctimes = array('q', ctimes)
+        index.name_pool, index.name_offsets = cls._build_pool(
+            [name.encode('utf-8', 'surrogateescape') for name in names])
+        index.lower_pool, index.lower_offsets = cls._build_pool(
+            [name.lower().encode('utf-8', 'surrogateescape') for name in names])
+        index.next_id = len(index.parents)
+        index._root_ids = [entry_id for entry_id, parent in enumerate(index.parents) if parent < 0]
+        return index
+
+    @staticmethod
+    def _build_pool(encoded: List[bytes]) -> Tuple[bytes, array]:
+        offsets = array('Q')
+        position = 1
+        for name in encoded:
+            offsets.append(position)
+            position += len(name) + 1
+        offsets.append(position)
+        pool = POOL_SEPARATOR + POOL_SEPARATOR.join(encoded) + POOL_SEPARATOR
+        return pool, offsets
+
+    @classmethod
+    def crawl(cls, roots: Iterable[str], exclude: Optional[Iterable[str]] = None,
+              follow_symlinks: bool = False) -> 'LocalFileIndex':
+        """
+        爬取根目錄並建立索引
+
+        Args:
+            roots: 要索引的根目錄
+            exclude: 要略過的目錄名稱
+            follow_symlinks: 是否跟隨符號連結目錄
+        """
+        excluded = set(exclude or ())
+        names: List[str] = []
+        parents = array('i')
+        flags = array('B')
+        sizes = array('q')
+        mtimes = array('q')
+        ctimes = array('q')
+
+        def add(name, parent, flag, st):
+            names.append(name)
+            parents.append(parent)
+            flags.append(flag)
+            if st is None:
+                sizes.append(0)
+                mtimes.append(0)
+                ctimes.append(0)
+            else:
+                sizes.append(0 if flag & ENTRY_FLAG_FOLDER else st.st_size)
+                mtimes.append(int(st.st_mtime))
+                ctimes.append(int(getattr(st, 'st_birthtime', st.st_ctime)))
+            return len(names) - 1
+
+        for root in normalize_roots(roots):
+            try:
+                root_stat = os.stat(root)
+            except OSError:
+                continue
+            stack = [(root, add(root, -1, ENTRY_FLAG_FOLDER | ENTRY_FLAG_ROOT, root_stat))]
+
+            while stack:
+                dir_path, dir_id = stack.pop()
+                try:
+                    with os.scandir(dir_path) as it:
+                        for entry in it:
+                            try:
+                                is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+                                st = entry.stat(follow_symlinks=False)
+                            except OSError:
+                                continue
+                            if is_dir:
+                                if entry.name in excluded:
+                                    continue
+                                child_id = add(entry.name, dir_id, ENTRY_FLAG_FOLDER, st)
+                                stack.append((entry.path, child_id))
+                            else:
+                                add(entry.name, dir_id, 0, st)
+                except OSError:
+                    continue
+
+        return cls.from_entries(names, parents, flags, sizes, mtimes, ctimes)
+
+    def build_trigrams(self) -> TrigramIndex:
+        """為小寫名稱池建立 trigram 索引 (不修改本快照)"""
+        if not self.base_count:
+            return TrigramIndex({}, 0)
+        return TrigramIndex.build(self.lower_pool[1:-1].split(POOL_SEPARATOR))
+
+    # ------------------------------------------------------------------
+    # 增量更新
+    # ------------------------------------------------------------------
+
+    @property
+    def base_count(self) -> int:
+        """名稱池中的項目數量 (不含增量新增的項目)"""
+        return len(self.parents)
+
+    def get_record(self, entry_id: int) -> IndexEntry:
+        """取得項目的完整紀錄 (已套用增量變更)"""
+        entry = self.overlay.get(entry_id)
+        if entry is not None:
+            return entry
+        return IndexEntry(self._base_name(entry_id), self.parents[entry_id], self.flags[entry_id],
+                          self.sizes[entry_id], self.mtimes[entry_id], self.ctimes[entry_id])
+
+    def get_parent(self, entry_id: int) -> int:
+        entry = self.overlay.get(entry_id)
+        return entry.parent if entry is not None else self.parents[entry_id]
+
+    def get_flags(self, entry_id: int) -> int:
+        entry = self.overlay.get(entry_id)
+        return entry.flags if entry is not None else self.flags[entry_id]
+
+    def apply_changes(self, upserts: Dict[int, IndexEntry], deletes: Iterable[int]) -> 'LocalFileIndex':
+        """
+        套用一批增量變更並返回新的索引快照 (寫入時複製，原快照不受影響)
+
+        Args:
+            upserts: 新增或修改的項目 (編號 → 紀錄)，新項目的編號從 len(self) 開始
+            deletes: 刪除的項目編號
+
+        Returns:
+            generation 加一的新快照；名稱池與固定陣列與原快照共用
+        """
+        snapshot = copy.copy(self)
+        overlay = dict(self.overlay)
+        overlay_lower = dict(self.overlay_lower)
+        hidden = set(self.hidden)
+        base_count = self.base_count
+        folders_changed = False
+
+        for entry_id, entry in upserts.items():
+            if entry_id < len(self):
+                previous = self.get_record(entry_id)
+                if previous.flags & ENTRY_FLAG_FOLDER and (
+                        previous.name != entry.name or previous.parent != entry.parent):
+                    folders_changed = True
+            overlay[entry_id] = entry
+            if entry_id < base_count and entry.name == self._base_name(entry_id):
+                # 只有屬性變更，名稱池中的名稱仍然有效
+                overlay_lower.pop(entry_id, None)
+                hidden.discard(entry_id)
+            else:
+                overlay_lower[entry_id] = _encode(entry.name.lower())
+                if entry_id < base_count:
+                    hidden.add(entry_id)
+            snapshot.next_id = max(snapshot.next_id, entry_id + 1)
+
+        for entry_id in deletes:
+            entry = overlay.get(entry_id) or self.get_record(entry_id)
+            overlay[entry_id] = entry._replace(flags=entry.flags | ENTRY_FLAG_DELETED)
+            overlay_lower.pop(entry_id, None)
+            if entry_id < base_count:
+                hidden.add(entry_id)
+            if entry.flags & ENTRY_FLAG_FOLDER:
+                folders_changed = True
+
+        snapshot.overlay = overlay
+        snapshot.overlay_lower = overlay_lower
+        snapshot.hidden = frozenset(hidden)
+        snapshot.generation = self.generation + 1
+        if folders_changed:
+            # 資料夾改名或刪除後，快取的路徑可能失效
+            snapshot._dir_paths = {}
+            snapshot._dir_paths_lock = threading.Lock()
+        return snapshot
+
+    def compact(self) -> 'LocalFileIndex':
+        """將增量變更合併回名稱池與固定陣列，項目編號保持不變 (已刪除的項目保留為空名稱)"""
+        if not self.overlay:
+            return self
+        records = [self.get_record(entry_id) for entry_id in range(len(self))]
+        compacted = LocalFileIndex.from_entries(
+            ['' if record.flags & ENTRY_FLAG_DELETED else record.name for record in records],
+            [record.parent for record in records],
+            [record.flags for record in records],
+            [record.size for record in records],
+            [record.mtime for record in records],
+            [record.ctime for record in records])
+        compacted.generation = self.generation
+        return compacted
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+
+    def _base_name(self, entry_id: int) -> str:
+        start = self.name_offsets[entry_id]
+        end = self.name_offsets[entry_id + 1] - 1
+        return self.name_pool[start:end].decode('utf-8', 'surrogateescape')
+
+    def get_name(self, entry_id: int) -> str:
+        """取得項目名稱"""
+        entry = self.overlay.get(entry_id)
+        if entry is not None:
+            return entry.name
+        return self._base_name(entry_id)
+
+    def get_dir_path(self, entry_id: int) -> str:
+        """取得資料夾項目的完整路徑 (結果會快取)"""
+        path = self._dir_paths.get(entry_id)
+        if path is not None:
+            return path
+
+        # 沿父目錄鏈往上找到第一個已快取的祖先
+        chain = []
+        current = entry_id
+        while current >= 0 and current not in self._dir_paths:
+            chain.append(current)
+            current = self.get_parent(current)
+        path = self._dir_paths.get(current, '')
+
+        with self._dir_paths_lock:
+            for node in reversed(chain):
+                name = self.get_name(node)
+                path = os.path.join(path, name) if path else name
+                self._dir_paths[node] = path
+        return path
+
+    def get_full_path(self, entry_id: int) -> str:
+        """取得項目的完整路徑"""
+        if self.get_flags(entry_id) & ENTRY_FLAG_FOLDER:
+            return self.get_dir_path(entry_id)
+        parent = self.get_parent(entry_id)
+        name = self.get_name(entry_id)
+        return os.path.join(self.get_dir_path(parent), name) if parent >= 0 else name
+
+    def find(self, query: str) -> List[int]:
+        """找出所有符合查詢的項目編號"""
+        return list(self.iter_matches(query))
+
+    def iter_matches(self, query: str) -> Iterable[int]:
+        """
+        依索引順序產生符合查詢的項目編號
+
+        查詢以空白分隔為多個條件 (AND)；每個條件支援子字串、`abc*` 前綴、
+        `*.ext` 後綴以及其他 `*` / `?` 萬用字元，含路徑分隔符號的條件比對完整路徑。
+        """
+        name_terms = []
+        path_terms = []
+        for term in query.lower().split():
+            if '/' in term or '\\' in term:
+                path_terms.append(term.replace('\\', os.sep).replace('/', os.sep))
+            else:
+                name_terms.append(term)
+
+        if name_terms:
+            # 以最長的條件驅動掃描，其餘條件只驗證候選項目
+            name_terms.sort(key=lambda t: len(t.replace('*', '').replace('?', '')), reverse=True)
+            candidates = self._scan(name_terms[0])
+            if self.overlay_lower:
+                candidates = chain(candidates, self._scan_overlay(name_terms[0]))
+            verifiers = [_compile_term(term) for term in name_terms[1:]]
+        else:
+            candidates = range(len(self))
+            verifiers = []
+
+        flags = self.flags
+        overlay = self.overlay
+        skip_flags = ENTRY_FLAG_ROOT | ENTRY_FLAG_DELETED
+        for entry_id in candidates:
+            entry = overlay.get(entry_id) if overlay else None
+            if (entry.flags if entry is not None else flags[entry_id]) & skip_flags:
+                continue
+            if verifiers:
+                name = self._lower_name(entry_id)
+                if not all(verify(name) for verify in verifiers):
+                    continue
+            if path_terms:
+                full_path = self.get_full_path(entry_id).lower()
+                if not all(term in full_path for term in path_terms):
+                    continue
+            yield entry_id
+
+    def _fast_count(self, query: str) -> Optional[int]:
+        """單一前綴或後綴條件時，每個名稱最多命中一次，可直接以 bytes.count 計數"""
+        if self.overlay:
+            return None
+        terms = query.lower().split()
+        if len(terms) != 1 or '/' in terms[0] or '\\' in terms[0]:
+            return None
+        needle, pattern = _term_to_needle(terms[0])
+        if pattern is not None or POOL_SEPARATOR not in needle or not needle.strip(POOL_SEPARATOR):
+            return None
+        excluded = sum(1 for entry_id in self.root_ids
+                       if needle in POOL_SEPARATOR + self._lower_name(entry_id) + POOL_SEPARATOR)
+        return self.lower_pool.count(needle) - excluded
+
+    @property
+    def root_ids(self) -> List[int]:
+        """根目錄項目編號"""
+        if self._root_ids is None:
+            self._root_ids = [entry_id for entry_id, parent in enumerate(self.parents) if parent < 0]
+        return self._root_ids
+
+    def _lower_name(self, entry_id: int) -> bytes:
+        name = self.overlay_lower.get(entry_id)
+        if name is not None:
+            return name
+        start = self.lower_offsets[entry_id]
+        return self.lower_pool[start:self.lower_offsets[entry_id + 1] - 1]
+
+    def _scan(self, term: str) -> Iterable[int]:
+        """在小寫名稱池上掃描單一條件，依序產生符合的項目編號 (略過名稱已失效的項目)"""
+        hidden = self.hidden
+        for entry_id in self._scan_pool(term):
+            if not hidden or entry_id not in hidden:
+                yield entry_id
+
+    def _scan_pool(self, term: str) -> Iterable[int]:
+        pool = self.lower_pool
+        offsets = self.lower_offsets
+        needle, pattern = _term_to_needle(term)
+
+        trigrams = self.trigrams
+        if trigrams is not None and trigrams.doc_count == self.base_count:
+            literal = needle.strip(POOL_SEPARATOR) if pattern is None else _longest_literal(term)
+            candidates = trigrams.candidates(literal)
+            if candidates is not None:
+                verify = _compile_term(term)
+                for entry_id in candidates:
+                    start = offsets[entry_id]
+                    if verify(pool[start:offsets[entry_id + 1] - 1]):
+                        yield entry_id
+                return
+
+        if pattern is not None:
+            # mmap 載入的名稱池 (index_store.MappedPool) 自行提供 finditer
+            matches = pool.finditer(pattern) if hasattr(pool, 'finditer') else pattern.finditer(pool)
+            for match in matches:
+                yield bisect_right(offsets, match.start()) - 1
+            return
+
+        if not needle.strip(POOL_SEPARATOR):
+            yield from range(self.base_count)
+            return
+
+        # 以 NUL 開頭的 needle (前綴查詢) 命中位置在分隔字元上，名稱從下一個位元組開始
+        shift = 1 if needle.startswith(POOL_SEPARATOR) else 0
+        position = pool.find(needle)
+        while position >= 0:
+            entry_id = bisect_right(offsets, position + shift) - 1
+            yield entry_id
+            # 同一個名稱只回報一次，從下一個名稱繼續搜尋
+            position = pool.find(needle, offsets[entry_id + 1] - shift)
+
+    def _scan_overlay(self, term: str) -> Iterable[int]:
+        """掃描增量新增或改名的項目"""
+        verify = _compile_term(term)
+        for entry_id, name in list(self.overlay_lower.items()):
+            if verify(name):
+                yield entry_id
+
+    def to_batch(self, entry_ids: Iterable[int], fields: Optional[Tuple[str, ...]] = None) -> ResultBatch:
+        """將項目轉換為欄式結果 (時間保留原始 epoch 秒數)；未要求路徑時不組合目錄路徑"""
+        columns = required_columns(fields)
+        want_path = columns is None or 'path' in columns
+        batch = ResultBatch(TIME_BASE_EPOCH, path_separator=os.sep)
+        for entry_id in entry_ids:
+            record = self.get_record(entry_id)
+            path = self.get_dir_path(record.parent) if want_path and record.parent >= 0 else ""
+            batch.append(record.name, path, record.size, record.ctime, record.mtime, 0,
+                         bool(record.flags & ENTRY_FLAG_FOLDER))
+        return batch
+
+    def search(self, query: str, max_results: int = 100,
+               fields: Optional[Tuple[str, ...]] = None,
+               offset: int = 0) -> Tuple[ResultBatch, int]:
+        """執行搜尋並返回 (results, total_count)；略過的前 offset 筆只計數，不讀取紀錄"""
+        matches = self.iter_matches(query)
+        skipped = sum(1 for _ in islice(matches, offset)) if offset else 0
+        entry_ids = list(islice(matches, max_results))
+        results = self.to_batch(entry_ids, fields)
+        if len(entry_ids) < max_results:
+            return results, skipped + len(entry_ids)
+
+        total_count = self._fast_count(query)
+        if total_count is None:
+            total_count = skipped + len(entry_ids) + sum(1 for _ in matches)
+        return results, total_count
+
+    def count(self, query: str) -> int:
+        """符合查詢的項目數，不讀取紀錄也不建立結果"""
+        total_count = self._fast_count(query)
+        if total_count is None:
+            total_count = self._posting_count(query)
+        if total_count is None:
+            total_count = sum(1 for _ in self.iter_matches(query))
+        return total_count
+
+    def _posting_count(self, query: str) -> Optional[int]:
+        """單一 3 位元組的子字串條件時，trigram 清單的長度就是包含它的名稱數 (不需解壓縮)"""
+        trigrams = self.trigrams
+        if self.overlay or trigrams is None or trigrams.doc_count != self.base_count:
+            return None
+        terms = query.lower().split()
+        if len(terms) != 1 or any(char in terms[0] for char in '*?/\\'):
+            return None
+        literal = _encode(terms[0])
+        if len(literal) != TRIGRAM_SIZE:
+            return None
+        data = trigrams.postings.get(literal)
+        matched = posting_count(data) if data is not None else 0
+        excluded = sum(1 for entry_id in self.root_ids if literal in self._lower_name(entry_id))
+        return matched - excluded
+
+    def iter_batches(self, query: str, batch_size: int = 1000,
+                     fields: Optional[Tuple[str, ...]] = None,
+                     max_results: Optional[int] = None) -> Iterator[ResultBatch]:
+        """單次走訪所有符合的項目，每 batch_size 筆產生一個 ResultBatch"""
+        matches = self.iter_matches(query)
+        if max_results is not None:
+            matches = islice(matches, max_results)
+        while True:
+            entry_ids = list(islice(matches, batch_size))
+            if not entry_ids:
+                return
+            yield self.to_batch(entry_ids, fields)
+
+
+def _encode(text: str) -> bytes:
+    return text.encode('utf-8', 'surrogateescape')
+
+
+def _term_to_needle(term: str) -> Tuple[bytes, Optional['re.Pattern']]:
+    """將查詢條件轉換為名稱池上的 bytes needle，或無法以 find 處理時的正規表示式"""
+    wildcard_count = term.count('*')
+    if '?' not in term:
+        if wildcard_count == 0:
+            return _encode(term), None
+        body = term.strip('*')
+        if '*' not in body:
+            if term.startswith('*') and not term.endswith('*'):
+                return _encode(body) + POOL_SEPARATOR, None
+            if term.endswith('*') and not term.startswith('*'):
+                return POOL_SEPARATOR + _encode(body), None
+            return _encode(body), None
+    return b'', _wildcard_to_pool_regex(term)
+
+
+def _wildcard_to_pool_regex(term: str) -> 're.Pattern':
+    parts = []
+    for char in term:
+        if char == '*':
+            parts.append(b'[^\\x00]*')
+        elif char == '?':
+            parts.append(b'[^\\x00]')
+        else:
+            parts.append(re.escape(_encode(char)))
+    # 萬用字元條件必須比對整個名稱
+    return re.compile(b'(?<=\\x00)' + b''.join(parts) + b'(?=\\x00)')
+
+
+def _longest_literal(term: str) -> bytes:
+    """萬用字元條件中最長的固定片段 (用於 trigram 候選)"""
+    return max((_encode(part) for part in re.split(r'[*?]', term)), key=len, default=b'')
+
+
+def _compile_term(term: str):
+    """將條件編譯為驗證函式 (輸入為小寫名稱 bytes)"""
+    needle, pattern = _term_to_needle(term)
+    if pattern is not None:
+        return lambda name: pattern.search(POOL_SEPARATOR + name + POOL_SEPARATOR) is not None
+    return lambda name: needle in POOL_SEPARATOR + name + POOL_SEPARATOR
+
+
+class LocalIndexBackend(SearchBackend):
+    """以本機檔名索引提供搜尋的後端
+
+    若 index_path 有先前保存的索引，第一次探測時以 mmap 載入並立即可用；
+    沒有保存的索引時則在背景建立，建立完成前回報不可用，讓註冊表暫時退回下一個後端。
+    索引可用後啟動 IndexWatcher 以增量方式維護 (watch=False 時改為啟動時在背景重新爬取)，
+    每套用一批變更 index_generation 就加一，快取可以此作為失效依據。
+    索引在建立完成後、每 save_interval 秒 (有變更時) 以及關閉時寫回檔案。
+    """
+
+    name = "local_index"
+    display_name = "Local Index"
+    # 查詢只讀取不可變的索引快照
+    is_thread_safe = True
+    supports_offset = True
+    supports_count_only = True
+
+    def __init__(self, roots: Optional[Iterable[str]] = None, exclude: Optional[Iterable[str]] = None,
+                 follow_symlinks: bool = False, index_path: Optional[str] = None,
+                 save_interval: float = 600, refresh_on_start: bool = True,
+                 watch: bool = True, watch_mode: str = 'auto', poll_interval: float = 60.0,
+                 batch_delay: float = 0.5, compact_threshold: int = 50000,
+                 trigram_index: bool = True):
+        self.roots = list(roots or ['~'])
+        self.exclude = list(DEFAULT_EXCLUDE if exclude is None else exclude)
+        self.follow_symlinks = follow_symlinks
+        self.index_path = index_path
+        self.save_interval = save_interval
+        self.refresh_on_start = refresh_on_start
+        self.watch = watch
+        self.watch_mode = watch_mode
+        self.poll_interval = poll_interval
+        self.batch_delay = batch_delay
+        self.compact_threshold = compact_threshold
+        self.trigram_index = trigram_index
+        self._index: Optional[LocalFileIndex] = None
+        self._loaded = False
+        self._dirty = False
+        self._build_thread: Optional[threading.Thread] = None
+        self._trigram_thread: Optional[threading.Thread] = None
+        self._build_lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._save_thread: Optional[threading.Thread] = None
+        self._watcher = None
+        self.build_seconds: Optional[float] = None
+        self.build_error: Optional[str] = None
+        self.built_at: Optional[float] = None
+        self.updated_at: Optional[float] = None
+        self.loaded_from_disk = False
+
+    @property
+    def index(self) -> Optional[LocalFileIndex]:
+        """目前的索引快照，尚未建立完成時為 None"""
+        return self._index
+
+    @property
+    def index_generation(self) -> int:
+        """索引世代，每次套用變更或重新建立後遞增"""
+        index = self._index
+        return index.generation if index is not None else 0
+
+    def _metadata(self) -> Dict:
+        return {
+            'roots': normalize_roots(self.roots),
+            'exclude': sorted(self.exclude),
+            'follow_symlinks': self.follow_symlinks,
+        }
+
+    def _load_saved_index(self):
+        """載入先前保存的索引 (只嘗試一次)"""
+        if self._loaded or not self.index_path:
+            return
+        self._loaded = True
+
+        try:
+            from .index_store import load_index
+        except ImportError:
+            from index_store import load_index
+
+        start_time = time.time()
+        loaded = load_index(self.index_path)
+        if loaded is None:
+            return
+        index, metadata = loaded
+        if metadata != self._metadata():
+            print("⚠ 已保存的本機索引與目前設定不符，將重新建立")
+            return
+        self._index = index
+        self.loaded_from_disk = True
+        self.built_at = self.updated_at = os.path.getmtime(self.index_path)
+        print(f"✓ 已載入本機索引: {len(index)} 個項目，耗時 {time.time() - start_time:.3f} 秒")
+        self._start_trigram_build()
+
+        if self.watch:
+            # 監看啟動時會比對目錄 mtime，補上程式未執行期間的變更
+            self._start_watcher()
+        elif self.refresh_on_start:
+            self.start_build()
+
+    def start_build(self) -> threading.Thread:
+        """在背景執行緒建立索引 (重複呼叫不會重複建立)"""
+        with self._build_lock:
+            if self._build_thread is None or not self._build_thread.is_alive():
+                self._build_thread = threading.Thread(
+                    target=self._build, name="local-index-build", daemon=True)
+                self._build_thread.start()
+            return self._build_thread
+
+    def _build(self):
+        start_time = time.time()
+        try:
+            index = LocalFileIndex.crawl(
+                self.roots, self.exclude, self.follow_symlinks)
+            with self._update_lock:
+                if self._index is not None:
+                    index.generation = self._index.generation + 1
+                self._index = index
+            self._dirty = True
+            self.build_error = None
+        except Exception as e:
+            self.build_error = str(e)
+            print(f"⚠ 本機索引建立失敗: {e}")
+        self.build_seconds = time.time() - start_time
+        if self.build_error is None:
+            self.built_at = self.updated_at = time.time()
+            print(f"✓ 本機索引建立完成: {len(self._index)} 個項目，耗時 {self.build_seconds:.1f} 秒")
+            self.save_index()
+            self._start_trigram_build()
+            self._start_save_schedule()
+            if self.watch:
+                self._start_watcher()
+
+    def _start_trigram_build(self):
+        """在背景為目前的名稱池建立 trigram 索引 (建立完成前查詢以掃描名稱池進行)"""
+        index = self._index
+        if not self.trigram_index or index is None or index.trigrams is not None:
+            return
+        with self._build_lock:
+            if self._trigram_thread is None or not self._trigram_thread.is_alive():
+                self._trigram_thread = threading.Thread(
+                    target=self._build_trigrams, name="local-index-trigrams", daemon=True)
+                self._trigram_thread.start()
+
+    def _build_trigrams(self):
+        while not self._stop_event.is_set():
+            index = self._index
+            if index is None or index.trigrams is not None:
+                return
+            trigrams = index.build_trigrams()
+            with self._update_lock:
+                current = self._index
+                # 建立期間名稱池若被 compact() 取代則重新建立
+                if current.lower_pool is index.lower_pool:
+                    current.trigrams = trigrams
+                    return
+
+    def _start_watcher(self):
+        if self._watcher is not None:
+            return
+        try:
+            from .index_watcher import IndexWatcher
+        except ImportError:
+            from index_watcher import IndexWatcher
+        self._watcher = IndexWatcher(self, mode=self.watch_mode, poll_interval=self.poll_interval,
+                                     batch_delay=self.batch_delay)
+        self._watcher.start()
+        self._start_save_schedule()
+
+    def apply_changes(self, upserts: Dict[int, IndexEntry], deletes: Iterable[int]):
+        """套用一批增量變更 (由 IndexWatcher 呼叫)"""
+        with self._update_lock:
+            index = self._index.apply_changes(upserts, deletes)
+            if len(index.overlay) > self.compact_threshold:
+                index = index.compact()
+            self._index = index
+        self._dirty = True
+        self.updated_at = time.time()
+
+    def _start_save_schedule(self):
+        if not self.index_path or not self.save_interval or self._save_thread is not None:
+            return
+        self._save_thread = threading.Thread(
+            target=self._save_loop, name="local-index-save", daemon=True)
+        self._save_thread.start()
+
+    def _save_loop(self):
+        while not self._stop_event.wait(self.save_interval):
+            if self._dirty:
+                self.save_index()
+
+    def save_index(self) -> bool:
+        """將目前的索引寫回 index_path"""
+        if self._index is None or not self.index_path:
+            return False
+
+        try:
+            from .index_store import save_index
+        except ImportError:
+            from index_store import save_index
+
+        with self._save_lock:
+            with self._update_lock:
+                # 先合併增量變更，保存的內容與之後的查詢共用同一份名稱池
+                index = self._index = self._index.compact()
+                self._dirty = False
+            try:
+                save_index(index, self.index_path, self._metadata())
+                return True
+            except (OSError, ValueError) as e:
+                # Windows 上目標檔案仍被 mmap 開啟時無法替換，留待下次保存
+                self._dirty = True
+                print(f"⚠ 本機索引保存失敗: {e}")
+                return False
+
+    def is_available(self) -> bool:
+        self._load_saved_index()
+        if self._index is None and self.build_error is None:
+            self.start_build()
+        return self._index is not None
+
+    def search(self, query: str, max_results: int = 100,
+               fields: Optional[Tuple[str, ...]] = None,
+               offset: int = 0) -> Tuple[ResultBatch, int]:
+        index = self._index
+        if index is None:
+            raise RuntimeError("本機索引尚未建立完成")
+        if index.trigrams is None:
+            self._start_trigram_build()
+        return index.search(query, max_results, fields, offset)
+
+    def count(self, query: str) -> int:
+        index = self._index
+        if index is None:
+            raise RuntimeError("本機索引尚未建立完成")
+        return index.count(query)
+
+    def iter_search_batches(self, query: str, batch_size: int = 1000,
+                            fields: Optional[Tuple[str, ...]] = None,
+                            max_results: Optional[int] = None) -> Iterator[ResultBatch]:
+        index = self._index
+        if index is None:
+            raise RuntimeError("本機索引尚未建立完成")
+        # 串流期間索引若被替換，仍以開始時的索引走完
+        return index.iter_batches(query, batch_size, fields, max_results)
+
+    def status(self) -> Dict:
+        index = self._index
+        if index is not None:
+            state = 'ready'
+        elif self.build_error is not None:
+            state = 'error'
+        else:
+            state = 'building'
+        return {
+            'state': state,
+            'entries': len(index) if index is not None else 0,
+            'pending_overlay': len(index.overlay) if index is not None else 0,
+            'generation': self.index_generation,
+            'loaded_from_disk': self.loaded_from_disk,
+            'build_seconds': self.build_seconds,
+            'built_at': self.built_at,
+            'updated_at': self.updated_at,
+            'seconds_since_update': time.time() - self.updated_at if self.updated_at else None,
+            'rebuilding': self._build_thread is not None and self._build_thread.is_alive(),
+            'trigram_bytes': index.trigrams.nbytes if index is not None and index.trigrams else None,
+            'watcher': self._watcher.status() if self._watcher is not None else None,
+            'error': self.build_error,
+        }
+
+    def close(self):
+        """停止監看與定期保存，並在有變更時寫回索引"""
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.stop()
+        if self._dirty:
+            self.save_index()
@@ -2,7 +2,16 @@
 示範模式 - 模擬 Everything SDK 功能
 """
 import datetime
-from typing import List, Dict, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
+
+try:
+    from .result_batch import ResultBatch
+    from .search_backend import SearchBackend, is_substring_refinement
+    from .trigram_index import SubstringIndex
+except ImportError:
+    from result_batch import ResultBatch
+    from search_backend import SearchBackend, is_substring_refinement
+    from trigram_index import SubstringIndex
 
 
 class MockEverythingSearchResult:
@@ -39,7 +48,7 @@ class MockEverythingSearchResult:
 
     def _format_size(self, size_bytes: int) -> str:
         """格式化檔案大小"""
-        # 保持與 EverythingSearchResult 的格式一致：整數單位，資料夾顯示 '-'
+        # 與 result_batch.format_size 的格式一致：整數單位，資料夾顯示 '-'
         if self.is_folder:
             return "-"
         if size_bytes == 0:
@@ -53,12 +62,18 @@ class MockEverythingSearchResult:
         return f"{size} {size_names[i]}"
 
 
-class MockEverythingSDK:
+class MockEverythingSDK(SearchBackend):
     """模擬 Everything SDK 的類別"""
 
-    def __init__(self):
-        # 建立一些示範資料
-        self.mock_files = [
+    name = "demo"
+    display_name = "Demo"
+    is_thread_safe = True
+    supports_offset = True
+    supports_count_only = True
+
+    def __init__(self, files: Optional[List[MockEverythingSearchResult]] = None):
+        # 建立一些示範資料 (也可傳入合成的大量資料做效能測試)
+        self.mock_files = files if files is not None else [
             # Python 檔案
             MockEverythingSearchResult(
                 "app.py", "D:\\Work\\pyeverything", 5120),
@@ -99,40 +114,76 @@ class MockEverythingSDK:
             MockEverythingSearchResult(
                 "data.xlsx", "D:\\Work\\analysis", 1048576),
         ]
-
-    def search(self, query: str, max_results: int = 100) -> Tuple[List[MockEverythingSearchResult], int]:
+        # 子字串索引與欄式結果在第一次搜尋時建立
+        self._index: Optional[SubstringIndex] = None
+        self._batch: Optional[ResultBatch] = None
+        self._by_extension: Dict[str, List[int]] = {}
+
+    def _build_index(self):
+        """建立檔名與路徑的小寫子字串索引、副檔名對照表，以及所有檔案的欄式結果"""
+        docs = []
+        by_extension: Dict[str, List[int]] = {}
+        for file_id, file in enumerate(self.mock_files):
+            docs.append(f"{file.filename.lower()}\0{file.path.lower()}".encode('utf-8', 'surrogateescape'))
+            by_extension.setdefault(file.extension.lower(), []).append(file_id)
+        self._by_extension = by_extension
+        self._batch = ResultBatch.from_results(self.mock_files, path_separator="\\")
+        self._index = SubstringIndex(docs)
+
+    def search(self, query: str, max_results: int = 100,
+               fields: Optional[Tuple[str, ...]] = None,
+               offset: int = 0) -> Tuple[ResultBatch, int]:
         """
-        模擬搜尋功能
+        模擬搜尋功能：查詢字串出現在檔名或路徑中，或符合 *.ext 副檔名
+        (示範資料已預先建立，fields 只在序列化時套用)
         """
-        query = query.lower()
-        results = []
-
-        # 簡單的搜尋邏輯
-        for file in self.mock_files:
-            match = False
-
-            # 檢查檔名
-            if query in file.filename.lower():
-                match = True
+        matched = self._match(query)
 
-            # 檢查副檔名模式 (如 *.txt)
-            if query.startswith("*."):
-                ext = query[2:]
-                if file.extension.lower() == ext.lower():
-                    match = True
+        # 限制結果數量
+        total_count = len(matched)
+        results = self._batch.take(matched[offset:offset + max_results])
 
-            # 檢查路徑
-            if query in file.path.lower():
-                match = True
+        return results, total_count
 
-            if match:
-                results.append(file)
+    def count(self, query: str) -> int:
+        """只比對，不建立結果"""
+        return len(self._match(query))
 
-        # 限制結果數量
-        total_count = len(results)
-        results = results[:max_results]
+    def _match(self, query: str) -> List[int]:
+        """符合查詢的項目編號 (依示範資料順序)"""
+        if self._index is None or len(self._index) != len(self.mock_files):
+            self._build_index()
+        query = query.lower()
 
-        return results, total_count
+        matched = self._index.find(query.encode('utf-8', 'surrogateescape'))
+
+        # 檢查副檔名模式 (如 *.txt)
+        if query.startswith("*."):
+            by_extension = self._by_extension.get(query[2:])
+            if by_extension:
+                matched = sorted(set(matched).union(by_extension))
+        return matched
+
+    def iter_search_batches(self, query: str, batch_size: int = 1000,
+                            fields: Optional[Tuple[str, ...]] = None,
+                            max_results: Optional[int] = None) -> Iterator[ResultBatch]:
+        """只比對一次，再依序切出批次"""
+        matched = self._match(query)
+        if max_results is not None:
+            matched = matched[:max_results]
+        for start in range(0, len(matched), batch_size):
+            yield self._batch.take(matched[start:start + batch_size])
+
+    def is_refinement(self, previous: str, query: str) -> bool:
+        """示範模式以整個查詢字串比對"""
+        return is_substring_refinement(previous, query)
+
+    def matches_result(self, result, query: str) -> bool:
+        """與 search() 相同：查詢字串出現在檔名或路徑中"""
+        query = query.lower()
+        if query in result.filename.lower() or query in result.path.lower():
+            return True
+        return query.startswith("*.") and result.extension.lower() == query[2:]
 
     def is_everything_running(self) -> bool:
         """模擬檢查 Everything 狀態 - 在示範模式下總是返回 True"""
@@ -147,5 +198,8 @@ def get_mock_everything_sdk():
     return get_mock_everything_sdk.instance
 
 
-# 保持向後相容性 - 全域變數指向單例實例
-mock_sdk = get_mock_everything_sdk()
+def __getattr__(name):
+    """保持向後相容性 - mock_sdk 第一次存取時才建立單例實例 (匯入模組時不建立模擬資料)"""
+    if name == 'mock_sdk':
+        return get_mock_everything_sdk()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,103 @@
+"""
+搜尋結果分頁
+offset 直接交給後端 (Everything_SetOffset / Windows Search TOP / 索引切片)，
+每一頁都只取得本頁的結果；cursor 是把 (查詢, 位移, 每頁筆數, 後端, 欄位, 排序方式) 編碼成的不透明字串，
+用戶端只要帶回上一頁的 next_cursor 即可取得下一頁。
+"""
+import base64
+import binascii
+import json
+from typing import Dict, Optional, Sequence
+
+try:
+    from .result_batch import parse_fields
+except ImportError:
+    from result_batch import parse_fields
+
+# 每頁最多筆數 (更深的結果以 offset / cursor 分頁取得)
+MAX_PAGE_SIZE = 500
+
+_CURSOR_VERSION = 1
+
+
+def _parse_non_negative(value, name: str, default: Optional[int]) -> Optional[int]:
+    if value is None or value == '':
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"無效的 {name}: {value}") from None
+    if number < 0:
+        raise ValueError(f"無效的 {name}: {value}")
+    return number
+
+
+def parse_offset(value) -> int:
+    """解析 offset 參數，None 或空字串為 0；不是非負整數時拋出 ValueError"""
+    return _parse_non_negative(value, 'offset', 0)
+
+
+def parse_limit(value, default: Optional[int] = None, name: str = 'limit') -> Optional[int]:
+    """解析筆數參數 (max / limit 等)，None 或空字串為 default；不是非負整數時拋出 ValueError"""
+    return _parse_non_negative(value, name, default)
+
+
+def encode_cursor(query: str, offset: int, limit: int, backend: Optional[str] = None,
+                  fields: Optional[Sequence[str]] = None, sort: Optional[str] = None) -> str:
+    """將分頁狀態編碼為 URL 安全的 cursor 字串"""
+    state = {'v': _CURSOR_VERSION, 'q': query, 'o': offset, 'n': limit}
+    if backend:
+        state['b'] = backend
+    if fields is not None:
+        state['f'] = list(fields)
+    if sort:
+        state['s'] = sort
+    data = json.dumps(state, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Dict:
+    """
+    解碼 cursor
+
+    Returns:
+        {'query', 'offset', 'limit', 'backend', 'fields', 'sort'}；格式不正確時拋出 ValueError
+    """
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        state = json.loads(data.decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError("無效的 cursor") from None
+    if not isinstance(state, dict) or state.get('v') != _CURSOR_VERSION:
+        raise ValueError("無效的 cursor")
+
+    query = state.get('q')
+    limit = state.get('n')
+    if not isinstance(query, str) or not isinstance(limit, int) or limit <= 0:
+        raise ValueError("無效的 cursor")
+    backend = state.get('b')
+    fields = state.get('f')
+    sort = state.get('s')
+    if (backend is not None and not isinstance(backend, str)) or \
+            (fields is not None and not isinstance(fields, list)) or \
+            (sort is not None and not isinstance(sort, str)):
+        raise ValueError("無效的 cursor")
+    return {
+        'query': query,
+        'offset': parse_offset(state.get('o')),
+        'limit': min(limit, MAX_PAGE_SIZE),
+        'backend': backend,
+        'fields': parse_fields(fields),
+        'sort': sort,
+    }
+
+
+def next_cursor(query: str, offset: int, limit: int, returned: int, total_count: int,
+                backend: Optional[str] = None,
+                fields: Optional[Sequence[str]] = None,
+                sort: Optional[str] = None) -> Optional[str]:
+    """還有下一頁時返回其 cursor，否則返回 None"""
+    next_offset = offset + returned
+    if returned == 0 or next_offset >= total_count:
+        return None
+    return encode_cursor(query, next_offset, limit, backend, fields, sort)
@@ -0,0 +1,317 @@
+"""
+平行檔案系統爬蟲
+以執行緒池搭配 os.scandir 平行走訪目錄：每個工作執行緒有自己的目錄佇列，
+自己的佇列空了就從其他執行緒的佇列前端「偷」工作 (work stealing)。
+重疊的根目錄會先正規化去除，找到足夠的結果後提早停止，也可由外部取消或設定期限；
+因逾時或取消而未走訪完成時引發 CrawlInterrupted，不會把不完整的結果當作完整結果返回。
+iter_crawl() 以產生器逐目錄交出結果，供串流輸出使用。
+每次走訪只使用執行緒池中固定的一份工作執行緒，同時進行的走訪有上限，
+超過上限時立即引發 CrawlerBusy，而不是排在其他走訪後面等待。
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional
+
+# iter_crawl() 暫存的目錄批次上限 (呼叫端處理較慢時爬蟲會等待)
+_STREAM_QUEUE_SIZE = 64
+_CRAWL_DONE = object()
+
+
+class CrawlInterrupted(RuntimeError):
+    """走訪在完成前逾時或被取消，已找到的結果不完整"""
+
+
+class CrawlerBusy(RuntimeError):
+    """同時進行的走訪已達上限"""
+
+
+def _interrupted_message(cancel_event: Optional[threading.Event], timeout: Optional[float]) -> str:
+    if cancel_event is not None and cancel_event.is_set():
+        return "走訪已取消"
+    return f"走訪超過 {timeout} 秒仍未完成"
+
+
+def normalize_roots(roots: Iterable[str]) -> List[str]:
+    """展開並正規化根目錄，移除重複及被其他根目錄包含的路徑"""
+    normalized = sorted({os.path.normcase(os.path.abspath(os.path.expanduser(root)))
+                         for root in roots if root})
+    result = []
+    for root in normalized:
+        if not any(root == kept or root.startswith(kept.rstrip(os.sep) + os.sep) for kept in result):
+            result.append(root)
+    return result
+
+
+class _WorkQueues:
+    """每個工作執行緒一個 deque 的目錄佇列，支援從其他佇列竊取工作"""
+
+    def __init__(self, worker_count: int, stop_event: threading.Event):
+        self._deques = [deque() for _ in range(worker_count)]
+        self._condition = threading.Condition()
+        self._stop_event = stop_event
+        # 已排入佇列或正在處理中的目錄數量，歸零代表走訪完成
+        self._outstanding = 0
+
+    def push(self, worker: int, path: str):
+        with self._condition:
+            self._deques[worker].append(path)
+            self._outstanding += 1
+            self._condition.notify()
+
+    def pop(self, worker: int) -> Optional[str]:
+        """取得下一個目錄；走訪完成或已停止時返回 None"""
+        own = self._deques[worker]
+        with self._condition:
+            while not self._stop_event.is_set():
+                if own:
+                    # 自己的佇列從尾端取 (深度優先，目錄快取較友善)
+                    return own.pop()
+                for other in self._deques:
+                    if other:
+                        # 從其他佇列的前端竊取，通常是較大的子樹
+                        return other.popleft()
+                if self._outstanding == 0:
+                    return None
+                self._condition.wait(0.1)
+            return None
+
+    def task_done(self):
+        with self._condition:
+            self._outstanding -= 1
+            if self._outstanding == 0:
+                self._condition.notify_all()
+
+    def wake_all(self):
+        with self._condition:
+            self._condition.notify_all()
+
+
+class ParallelCrawler:
+    """平行走訪多個根目錄並收集符合條件的項目
+
+    Args:
+        max_workers: 工作執行緒總數 (預設依 CPU 數量)
+        exclude: 不進入的目錄名稱
+        follow_symlinks: 是否跟隨符號連結目錄
+        max_crawls: 同時進行的走訪上限；每次走訪使用 max_workers // max_crawls 個工作執行緒
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, exclude: Optional[Iterable[str]] = None,
+                 follow_symlinks: bool = False, max_crawls: int = 4):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self.max_crawls = max(1, min(max_crawls, self.max_workers))
+        self.workers_per_crawl = self.max_workers // self.max_crawls
+        self.exclude = set(exclude or ())
+        self.follow_symlinks = follow_symlinks
+        self._crawl_slots = threading.BoundedSemaphore(self.max_crawls)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # 每個進行中的走訪都有自己的一份執行緒，不會排在其他走訪後面
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers_per_crawl * self.max_crawls,
+                    thread_name_prefix="crawler")
+            return self._executor
+
+    def _start(self, roots: Iterable[str], match: Callable[[os.DirEntry], bool],
+               emit: Callable[[List[os.DirEntry]], bool], stop_event: threading.Event,
+               interrupted: threading.Event,
+               cancel_event: Optional[threading.Event], timeout: Optional[float],
+               on_done: Optional[Callable[[], None]] = None) -> List[Future]:
+        """
+        啟動工作執行緒走訪根目錄
+
+        每個目錄的符合項目以 emit(entries) 交給呼叫端，emit 返回 False 時停止走訪；
+        因 cancel_event 或逾時而停止時設定 interrupted。所有工作執行緒結束後呼叫 on_done()。
+
+        Returns:
+            工作執行緒的 Future (沒有可走訪的根目錄時為空列表)
+
+        Raises:
+            CrawlerBusy: 同時進行的走訪已達 max_crawls
+        """
+        roots = [root for root in normalize_roots(roots) if os.path.isdir(root)]
+        if not roots:
+            return []
+        if not self._crawl_slots.acquire(blocking=False):
+            raise CrawlerBusy(f"同時進行的走訪已達上限 ({self.max_crawls})，請稍後再試")
+
+        worker_count = self.workers_per_crawl
+        remaining = [worker_count]
+        remaining_lock = threading.Lock()
+        queues = _WorkQueues(worker_count, stop_event)
+        for i, root in enumerate(roots):
+            queues.push(i % worker_count, root)
+
+        deadline = time.monotonic() + timeout if timeout else None
+
+        def should_stop() -> bool:
+            if stop_event.is_set():
+                return True
+            if (cancel_event is not None and cancel_event.is_set()) or (
+                    deadline is not None and time.monotonic() >= deadline):
+                interrupted.set()
+                stop_event.set()
+                queues.wake_all()
+                return True
+            return False
+
+        def worker(worker_id: int):
+            try:
+                while True:
+                    path = queues.pop(worker_id)
+                    if path is None:
+                        return
+                    try:
+                        if should_stop():
+                            continue
+                        matched = self._scan_dir(path, worker_id, queues, match)
+                        if matched and not emit(matched):
+                            stop_event.set()
+                            queues.wake_all()
+                    finally:
+                        queues.task_done()
+            finally:
+                with remaining_lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    self._crawl_slots.release()
+                    if on_done is not None:
+                        on_done()
+
+        try:
+            executor = self._get_executor()
+            return [executor.submit(worker, i) for i in range(worker_count)]
+        except RuntimeError:
+            # 執行緒池已關閉 (shutdown)；已送出的工作執行緒不會被執行
+            self._crawl_slots.release()
+            raise
+
+    def crawl(self, roots: Iterable[str], match: Callable[[os.DirEntry], bool],
+              max_results: Optional[int] = None, cancel_event: Optional[threading.Event] = None,
+              timeout: Optional[float] = None) -> List[os.DirEntry]:
+        """
+        走訪根目錄並返回符合條件的項目
+
+        Args:
+            roots: 根目錄 (重疊的路徑只會走訪一次)
+            match: 判斷 DirEntry 是否符合的函式
+            max_results: 收集到此數量後提早停止
+            cancel_event: 外部設定後立即停止
+            timeout: 最長走訪時間 (秒)
+
+        Returns:
+            符合條件的 DirEntry 列表 (順序不固定)
+
+        Raises:
+            CrawlInterrupted: 走訪完成 (或找到 max_results 個項目) 前逾時或被取消
+        """
+        results: List[os.DirEntry] = []
+        results_lock = threading.Lock()
+
+        def emit(entries: List[os.DirEntry]) -> bool:
+            with results_lock:
+                results.extend(entries)
+                return max_results is None or len(results) < max_results
+
+        interrupted = threading.Event()
+        futures = self._start(roots, match, emit, threading.Event(), interrupted, cancel_event, timeout)
+        for future in futures:
+            future.result()
+        if interrupted.is_set():
+            raise CrawlInterrupted(_interrupted_message(cancel_event, timeout))
+
+        if max_results is not None:
+            return results[:max_results]
+        return results
+
+    def iter_crawl(self, roots: Iterable[str], match: Callable[[os.DirEntry], bool],
+                   max_results: Optional[int] = None,
+                   cancel_event: Optional[threading.Event] = None,
+                   timeout: Optional[float] = None,
+                   poll_interval: Optional[float] = None) -> Iterator[List[os.DirEntry]]:
+        """
+        與 crawl() 相同，但每走訪完一個目錄就產生其符合項目
+
+        工作執行緒與呼叫端之間以有界佇列傳遞，呼叫端處理較慢時爬蟲會等待，
+        因此記憶體用量與結果總數無關；關閉產生器 (例如用戶端中斷下載) 會停止走訪。
+        設定 poll_interval 時，超過這段時間沒有新結果就產生空列表，讓呼叫端有機會送出已累積的結果。
+        逾時或被取消時，已產生的結果之後引發 CrawlInterrupted。
+        """
+        stop_event = threading.Event()
+        interrupted = threading.Event()
+        # 產生器已關閉，不再有人讀取佇列 (與 stop_event 分開：逾時停止後仍要送出結束標記)
+        closed = threading.Event()
+        batches: "queue.Queue" = queue.Queue(maxsize=_STREAM_QUEUE_SIZE)
+
+        def put(item) -> bool:
+            while not closed.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def on_done():
+            put(_CRAWL_DONE)
+
+        futures = self._start(roots, match, put, stop_event, interrupted, cancel_event, timeout,
+                              on_done)
+        if not futures:
+            return
+
+        produced = 0
+        try:
+            while True:
+                try:
+                    entries = batches.get(timeout=poll_interval)
+                except queue.Empty:
+                    yield []
+                    continue
+                if entries is _CRAWL_DONE:
+                    if interrupted.is_set():
+                        raise CrawlInterrupted(_interrupted_message(cancel_event, timeout))
+                    return
+                if max_results is not None:
+                    entries = entries[:max_results - produced]
+                produced += len(entries)
+                yield entries
+                if max_results is not None and produced >= max_results:
+                    return
+        finally:
+            closed.set()
+            stop_event.set()
+
+    def _scan_dir(self, path, worker_id, queues, match) -> List[os.DirEntry]:
+        """掃描單一目錄，子目錄排入佇列，返回符合的項目"""
+        matched = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=self.follow_symlinks)
+                    except OSError:
+                        continue
+                    if is_dir and entry.name not in self.exclude:
+                        queues.push(worker_id, entry.path)
+                    if match(entry):
+                        matched.append(entry)
+        except OSError:
+            pass
+        return matched
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
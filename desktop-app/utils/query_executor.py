@@ -0,0 +1,83 @@
+"""
+序列化查詢執行器
+Everything SDK 的查詢狀態 (SetSearchW / SetMax / QueryW / GetResult*) 保存在 DLL 的全域變數中，
+多個請求執行緒同時呼叫會互相覆蓋。執行器以單一專屬執行緒依序執行所有查詢；
+相同的查詢正在執行或排隊時，後來的請求直接等待同一個結果 (in-flight coalescing)，
+擴充功能短時間內送出的大量重複查詢因此只需執行一次。
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class QueryExecutor:
+    """以單一執行緒依序執行查詢，並合併同時進行中的相同查詢
+
+    Args:
+        name: 執行緒名稱 (顯示於除錯工具)
+    """
+
+    def __init__(self, name: str = "query"):
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._thread_ident: Optional[int] = None
+        self.executed = 0
+        self.coalesced = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name)
+        return self._executor
+
+    def submit(self, key: Hashable, func: Callable[[], T]) -> "Future[T]":
+        """
+        排入查詢；key 相同的查詢尚未完成時返回同一個 Future
+
+        key 為 None 時不合併 (例如有副作用的呼叫)
+        """
+        with self._lock:
+            if key is not None:
+                future = self._inflight.get(key)
+                if future is not None:
+                    self.coalesced += 1
+                    return future
+            future = self._get_executor().submit(self._run, key, func)
+            if key is not None:
+                self._inflight[key] = future
+            return future
+
+    def _run(self, key: Hashable, func: Callable[[], T]) -> T:
+        self._thread_ident = threading.get_ident()
+        try:
+            return func()
+        finally:
+            with self._lock:
+                self.executed += 1
+                if key is not None:
+                    self._inflight.pop(key, None)
+
+    def run(self, key: Hashable, func: Callable[[], T], timeout: Optional[float] = None) -> T:
+        """排入查詢並等待結果 (查詢的例外會在呼叫端重新拋出)"""
+        if threading.get_ident() == self._thread_ident:
+            # 已在執行器的執行緒中 (例如查詢內部再呼叫其他查詢)，直接執行以免自己等待自己
+            return func()
+        return self.submit(key, func).result(timeout)
+
+    def stats(self) -> Dict:
+        """執行統計 (顯示於 /status)"""
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'inflight': len(self._inflight),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
@@ -0,0 +1,159 @@
+"""
+增量查詢縮小
+使用者逐字輸入時 (rep → repo → repor → report)，新查詢常是同一用戶端前一次查詢的延伸。
+若前一次的結果是完整的 (未被 max_results 截斷)，新查詢的結果必定是它的子集合，
+因此直接以後端的 matches_result() 在記憶體中過濾，不必再呼叫後端。
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+try:
+    from .result_batch import ResultBatch, required_columns
+except ImportError:
+    from result_batch import ResultBatch, required_columns
+
+# matches_result() 判斷時需要的欄位
+_MATCH_COLUMNS = frozenset({'filename', 'path'})
+
+
+class _BaseResult:
+    """可作為縮小基礎的完整結果集"""
+    __slots__ = ('backend_name', 'generation', 'query', 'results', 'expires_at', 'columns')
+
+    def __init__(self, backend_name, generation, query, results, expires_at, columns):
+        self.backend_name = backend_name
+        self.generation = generation
+        self.query = query
+        self.results = results
+        self.expires_at = expires_at
+        # 結果集包含的原始欄位，None 代表全部
+        self.columns = columns
+
+
+class QueryRefiner:
+    """依用戶端保存最近的完整結果集，並以其回答延伸查詢
+
+    Args:
+        history: 每個用戶端保存的結果集數量
+        max_clients: 最多追蹤的用戶端數量 (超過時淘汰最久未查詢的用戶端)
+        ttl: 結果集有效秒數 (與結果快取相同，避免使用過舊的 Everything 結果)
+        enabled: False 時直接呼叫 search_func
+    """
+
+    def __init__(self, history: int = 8, max_clients: int = 256, ttl: float = 30.0,
+                 enabled: bool = True):
+        self.history = history
+        self.max_clients = max_clients
+        self.ttl = ttl
+        self.enabled = enabled
+        self._clients: "OrderedDict[Hashable, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.refinements = 0
+        self.lookups = 0
+
+    def _find_base(self, backend, client: Hashable, query: str, columns) -> Optional[_BaseResult]:
+        """找出可縮小為 query 的最小完整結果集 (須包含本次要求的所有欄位)"""
+        generation = getattr(backend, 'index_generation', None)
+        now = time.monotonic()
+        with self._lock:
+            bases = self._clients.get(client)
+            if not bases:
+                return None
+            candidates = [base for base in bases
+                          if base.backend_name == backend.name and base.generation == generation
+                          and base.expires_at > now
+                          and (base.columns is None or (columns is not None and columns <= base.columns))]
+        best = None
+        for base in candidates:
+            if best is not None and len(base.results) >= len(best.results):
+                continue
+            try:
+                if backend.is_refinement(base.query, query):
+                    best = base
+            except Exception:
+                continue
+        return best
+
+    def _refine(self, backend, base: _BaseResult, query: str):
+        indexes = []
+        for i, result in enumerate(base.results):
+            matched = backend.matches_result(result, query)
+            if matched is None:
+                return None
+            if matched:
+                indexes.append(i)
+        if isinstance(base.results, ResultBatch):
+            return base.results.take(indexes)
+        return [base.results[i] for i in indexes]
+
+    def _record(self, backend, client: Hashable, query: str, results: List, generation, columns):
+        if columns is not None and not _MATCH_COLUMNS <= columns:
+            # 沒有檔名與路徑就無法判斷延伸查詢是否符合
+            return
+        if not isinstance(results, ResultBatch):
+            results = list(results)
+        base = _BaseResult(backend.name, generation, query, results, time.monotonic() + self.ttl, columns)
+        with self._lock:
+            bases = self._clients.get(client)
+            if bases is None:
+                bases = self._clients[client] = deque(maxlen=self.history)
+            else:
+                self._clients.move_to_end(client)
+            bases.append(base)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+
+    def search(self, backend, query: str, max_results: int, client: Hashable,
+               search_func: Callable[[], Tuple[List, int]], fields=None,
+               offset: int = 0) -> Tuple[List, int, bool]:
+        """
+        先嘗試以先前的完整結果縮小，否則呼叫 search_func
+
+        Args:
+            backend: 搜尋後端 (提供 is_refinement / matches_result)
+            query: 搜尋查詢字串
+            max_results: 最大結果數量
+            client: 用戶端識別 (例如 remote_addr)
+            search_func: 實際執行搜尋的函式，返回 (results, total_count)
+            fields: 要求的結果欄位 (只使用包含這些欄位的結果集縮小)
+            offset: 分頁位移；完整結果集縮小後直接切片，但只有第一頁會被保存為縮小基礎
+
+        Returns:
+            (results, total_count, refined)
+        """
+        if not self.enabled:
+            results, total_count = search_func()
+            return results, total_count, False
+
+        with self._lock:
+            self.lookups += 1
+        generation = getattr(backend, 'index_generation', None)
+        columns = required_columns(fields)
+        base = self._find_base(backend, client, query, columns)
+        if base is not None:
+            refined = self._refine(backend, base, query)
+            if refined is not None:
+                with self._lock:
+                    self.refinements += 1
+                # 完整結果集過濾後仍是完整的，可繼續作為下一次延伸查詢的基礎
+                self._record(backend, client, query, refined, base.generation, base.columns)
+                return refined[offset:offset + max_results], len(refined), True
+
+        results, total_count = search_func()
+        # 只有未被截斷的第一頁才能保證包含所有延伸查詢的結果
+        if offset == 0 and total_count == len(results) < max_results:
+            self._record(backend, client, query, results, generation, columns)
+        return results, total_count, False
+
+    def stats(self) -> Dict:
+        """縮小查詢統計 (顯示於 /status)"""
+        with self._lock:
+            clients = len(self._clients)
+        return {
+            'enabled': self.enabled,
+            'clients': clients,
+            'lookups': self.lookups,
+            'refinements': self.refinements,
+        }
@@ -0,0 +1,250 @@
+"""
+搜尋結果相關度排序
+各後端返回結果的順序不同 (Everything 依其排序、Windows Search 依修改時間、模擬資料依列表順序)，
+連結詞語時需要的是最佳匹配排在最前面：檔名完全相符 > 詞語邊界相符 > 一般子字串，
+再依修改時間的新舊與「檔案優先於資料夾」加權。
+
+每個項目與查詢無關的特徵 (小寫檔名、主檔名、新舊與類型加權) 先整欄計算一次，
+同一批候選結果翻頁時直接重用；查詢相關的部分只是一次字串比對。
+最後以有界堆積 (heapq.nlargest) 選出前 k 名，從 10 萬筆候選取前 50 名只需 O(n log k)。
+"""
+import heapq
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    from .result_batch import RESULT_FIELDS, ResultBatch
+except ImportError:
+    from result_batch import RESULT_FIELDS, ResultBatch
+
+# 排序方式：backend 保留後端的順序，relevance 依相關度排序
+SORT_BACKEND = 'backend'
+SORT_RELEVANCE = 'relevance'
+SORT_MODES = (SORT_BACKEND, SORT_RELEVANCE)
+
+# 計算相關度需要的結果欄位
+RANKING_FIELDS = frozenset({'filename', 'is_folder', 'date_modified'})
+
+# 匹配等級
+TIER_EXACT = 3      # 檔名或主檔名 (不含副檔名) 與查詢相同
+TIER_WORD = 2       # 查詢出現在詞語邊界 (前後不是字母或數字)
+TIER_SUBSTRING = 1  # 查詢出現在檔名中
+TIER_NONE = 0       # 只有路徑相符等
+
+# 分數權重：匹配等級之間的差距大於其他加權的總和，等級永遠優先
+_TIER_WEIGHT = 10.0
+_RECENCY_WEIGHT = 1.0
+_FILE_BOOST = 0.5
+# 同等級時較短的檔名較接近查詢 (上限 0.25)
+_LENGTH_PENALTY = 0.001
+_MAX_PENALIZED_LENGTH = 250
+
+_SECONDS_PER_DAY = 86400.0
+# 查詢修飾詞 (ext:pdf 等) 與萬用字元不參與檔名比對
+_WILDCARDS = '*?"'
+# 保存特徵的候選結果集數量
+_FEATURE_CACHE_SIZE = 16
+
+
+def parse_sort(value, default: str = SORT_BACKEND) -> str:
+    """
+    解析 sort 參數，未指定時為 default
+
+    Raises:
+        ValueError: 不支援的排序方式
+    """
+    if value is None or value == '':
+        return default
+    sort = str(value).strip().lower()
+    if sort not in SORT_MODES:
+        raise ValueError(f"不支援的排序方式: {value}；可用排序: {', '.join(SORT_MODES)}")
+    return sort
+
+
+def ranking_fields(fields: Optional[Sequence[str]]) -> Optional[Tuple[str, ...]]:
+    """要求的欄位加上計算相關度需要的欄位 (None 代表全部欄位)"""
+    if fields is None:
+        return None
+    names = set(fields) | RANKING_FIELDS
+    return tuple(name for name in RESULT_FIELDS if name in names)
+
+
+def match_terms(query: str) -> Tuple[str, ...]:
+    """取出查詢中要與檔名比對的詞語 (小寫，去除修飾詞、排除條件與萬用字元)"""
+    terms = []
+    for term in query.lower().split():
+        if ':' in term or term.startswith('-') or term.startswith('!'):
+            continue
+        term = term.strip(_WILDCARDS)
+        if term:
+            terms.append(term)
+    return tuple(terms)
+
+
+class RankingFeatures:
+    """
+    候選結果與查詢無關的排序特徵 (整欄預先計算)
+
+    Attributes:
+        names: 小寫檔名
+        stems: 小寫主檔名 (資料夾為完整名稱)
+        static_scores: 新舊、類型與檔名長度的加權總和
+    """
+    __slots__ = ('names', 'stems', 'static_scores')
+
+    def __init__(self, names: List[str], stems: List[str], static_scores: List[float]):
+        self.names = names
+        self.stems = stems
+        self.static_scores = static_scores
+
+    @classmethod
+    def from_results(cls, results, half_life_days: float,
+                     now: Optional[float] = None) -> 'RankingFeatures':
+        """由 ResultBatch 或逐筆結果物件建立"""
+        if isinstance(results, ResultBatch):
+            filenames = results.filenames
+            folders = results.column_values('is_folder')
+            modified = results.epoch_seconds(results.modified)
+        else:
+            filenames = [result.filename or '' for result in results]
+            folders = [bool(result.is_folder) for result in results]
+            modified = [result.date_modified.timestamp() if result.date_modified else None
+                        for result in results]
+
+        names = [name.lower() for name in filenames]
+        # 沒有副檔名 (或以 . 開頭) 時 rpartition 的前半為空字串，主檔名即完整名稱
+        stems = [name if folder else name.rpartition('.')[0] or name
+                 for name, folder in zip(names, folders)]
+
+        now = time.time() if now is None else now
+        # 半衰期 half_life_days 的指數衰減：剛修改為 1，每經過一個半衰期減半；未來的時間視為剛修改
+        decay = -1.0 / (max(half_life_days, 0.001) * _SECONDS_PER_DAY)
+        recency = [0.0 if seconds is None else
+                   _RECENCY_WEIGHT * 2.0 ** ((now - seconds) * decay if seconds < now else 0.0)
+                   for seconds in modified]
+        static_scores = [
+            (0.0 if folder else _FILE_BOOST) + recent
+            - _LENGTH_PENALTY * (len(name) if len(name) < _MAX_PENALIZED_LENGTH else _MAX_PENALIZED_LENGTH)
+            for name, folder, recent in zip(names, folders, recency)]
+        return cls(names, stems, static_scores)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def match_tiers(self, terms: Sequence[str]) -> List[int]:
+        """每個項目與查詢詞語的匹配等級"""
+        if not terms:
+            return [TIER_NONE] * len(self.names)
+        phrase = ' '.join(terms)
+        boundary = re.compile(r'(?<![^\W_])' + re.escape(phrase) + r'(?![^\W_])')
+        tiers = []
+        for name, stem in zip(self.names, self.stems):
+            if name == phrase or stem == phrase:
+                tiers.append(TIER_EXACT)
+            elif phrase in name:
+                tiers.append(TIER_WORD if boundary.search(name) else TIER_SUBSTRING)
+            elif len(terms) > 1 and all(term in name for term in terms):
+                # 多個詞語分散在檔名中
+                tiers.append(TIER_SUBSTRING)
+            else:
+                tiers.append(TIER_NONE)
+        return tiers
+
+    def scores(self, terms: Sequence[str]) -> List[float]:
+        """每個項目的相關度分數"""
+        return [_TIER_WEIGHT * tier + static
+                for tier, static in zip(self.match_tiers(terms), self.static_scores)]
+
+
+class RelevanceRanker:
+    """依相關度選出前 k 名結果
+
+    Args:
+        candidates: 相關度排序時向後端取得的候選結果數量
+        batch_candidates: 批次查詢 top1 模式每個詞語的候選結果數量
+        half_life_days: 修改時間加權的半衰期 (天)
+    """
+
+    def __init__(self, candidates: int = 1000, batch_candidates: int = 20,
+                 half_life_days: float = 180.0):
+        self.candidates = max(int(candidates), 1)
+        self.batch_candidates = max(int(batch_candidates), 1)
+        self.half_life_days = half_life_days
+        # id(候選結果集) -> (結果集, 特徵)；保留結果集的參照，避免 id 被重新使用
+        self._features: "OrderedDict[int, Tuple[ResultBatch, RankingFeatures]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rankings = 0
+        self.scored = 0
+        self.feature_hits = 0
+        self.elapsed = 0.0
+
+    def features(self, results) -> RankingFeatures:
+        """取得候選結果的特徵；結果快取返回的同一個 ResultBatch 只計算一次"""
+        if not isinstance(results, ResultBatch):
+            return RankingFeatures.from_results(results, self.half_life_days)
+        key = id(results)
+        with self._lock:
+            cached = self._features.get(key)
+            if cached is not None and cached[0] is results:
+                self._features.move_to_end(key)
+                self.feature_hits += 1
+                return cached[1]
+        features = RankingFeatures.from_results(results, self.half_life_days)
+        with self._lock:
+            self._features[key] = (results, features)
+            self._features.move_to_end(key)
+            while len(self._features) > _FEATURE_CACHE_SIZE:
+                self._features.popitem(last=False)
+        return features
+
+    def top_indexes(self, results, query: str, k: int) -> List[int]:
+        """分數最高的 k 個項目的列號 (依分數由高到低；同分時保留後端的順序)"""
+        started = time.perf_counter()
+        scores = self.features(results).scores(match_terms(query))
+        k = min(max(k, 0), len(scores))
+        if k == len(scores):
+            indexes = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+        else:
+            indexes = heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
+        with self._lock:
+            self.rankings += 1
+            self.scored += len(scores)
+            self.elapsed += time.perf_counter() - started
+        return indexes
+
+    def rank(self, results, query: str, k: int):
+        """
+        依相關度排序並只保留前 k 筆
+
+        Returns:
+            與輸入相同類型的結果 (ResultBatch 或列表)
+        """
+        indexes = self.top_indexes(results, query, k)
+        if isinstance(results, ResultBatch):
+            return results.take(indexes)
+        return [results[i] for i in indexes]
+
+    def stats(self) -> Dict:
+        """排序統計 (顯示於 /status)"""
+        with self._lock:
+            return {
+                'candidates': self.candidates,
+                'batch_candidates': self.batch_candidates,
+                'half_life_days': self.half_life_days,
+                'rankings': self.rankings,
+                'scored': self.scored,
+                'feature_hits': self.feature_hits,
+                'elapsed_ms': round(self.elapsed * 1000, 1),
+            }
+
+
+def create_ranker(config: Optional[Dict] = None) -> RelevanceRanker:
+    """依 config.yml 的 ranking 區段建立相關度排序器"""
+    config = config or {}
+    return RelevanceRanker(
+        candidates=int(config.get('candidates', 1000)),
+        batch_candidates=int(config.get('batch_candidates', 20)),
+        half_life_days=float(config.get('recency_half_life_days', 180)))
@@ -0,0 +1,462 @@
+"""
+欄式 (columnar) 搜尋結果
+以平行陣列保存一批結果：名稱與路徑為字串列表，大小、時間與旗標為 array，
+時間保存原始整數 (Windows FILETIME 或 POSIX 秒數)，只有在實際序列化時才轉換為 datetime / ISO 字串。
+ResultRow 是不複製資料的輕量列視圖，提供與逐筆結果物件 (MockEverythingSearchResult) 相同的屬性與 to_dict()，
+讓既有程式可以照舊逐筆存取。
+時間欄位在序列化時整欄一次轉換，可輸出 ISO 字串或 epoch 秒數 (time_format)。
+"""
+import datetime
+import os
+from array import array
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+# 時間欄位的單位
+TIME_BASE_FILETIME = 'filetime'   # 自 1601-01-01 起的 100 奈秒刻度
+TIME_BASE_EPOCH = 'epoch'         # 自 1970-01-01 起的秒數
+
+# FILETIME 與 POSIX epoch 的差距 (100 奈秒刻度)
+FILETIME_TICKS_PER_SECOND = 10_000_000
+FILETIME_EPOCH_OFFSET = 116444736000000000
+
+_FLAG_FOLDER = 0x01
+
+# 估計記憶體用量時每列的固定開銷 (陣列欄位 + 列表指標)
+_ROW_OVERHEAD = 64
+
+# 時間欄位的輸出格式：ISO 8601 字串 (本地時間) 或 epoch 秒數 (由用戶端自行格式化)
+TIME_FORMAT_ISO = 'iso'
+TIME_FORMAT_EPOCH = 'epoch'
+TIME_FORMATS = (TIME_FORMAT_ISO, TIME_FORMAT_EPOCH)
+
+# 批次至少有這麼多列時才以 NumPy (若已安裝) 轉換時間欄位
+_NUMPY_MIN_ROWS = 2048
+
+# API 可要求的欄位 (依 to_dict 的順序)
+RESULT_FIELDS = ('filename', 'path', 'full_path', 'extension', 'size', 'size_formatted',
+                 'date_created', 'date_modified', 'date_accessed', 'is_file', 'is_folder')
+
+# 每個 API 欄位需要後端取得的原始欄位
+_FIELD_COLUMNS = {
+    'filename': ('filename',),
+    'path': ('path',),
+    'full_path': ('filename', 'path'),
+    'extension': ('extension', 'filename', 'is_folder'),
+    'size': ('size',),
+    'size_formatted': ('size', 'is_folder'),
+    'date_created': ('date_created',),
+    'date_modified': ('date_modified',),
+    'date_accessed': ('date_accessed',),
+    'is_file': ('is_folder',),
+    'is_folder': ('is_folder',),
+}
+
+
+def parse_fields(value) -> Optional[Tuple[str, ...]]:
+    """
+    解析 fields 參數 (逗號分隔字串或列表)
+
+    Returns:
+        依 RESULT_FIELDS 順序排列的欄位；未指定或為 '*' 時返回 None (全部欄位)
+
+    Raises:
+        ValueError: 包含未知的欄位名稱
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    names = {str(name).strip() for name in value} - {''}
+    if not names or '*' in names:
+        return None
+    unknown = names - set(RESULT_FIELDS)
+    if unknown:
+        raise ValueError(f"未知的欄位: {', '.join(sorted(unknown))}；可用欄位: {', '.join(RESULT_FIELDS)}")
+    return tuple(name for name in RESULT_FIELDS if name in names)
+
+
+def parse_time_format(value) -> str:
+    """
+    解析 time_format 參數，未指定時為 TIME_FORMAT_ISO
+
+    Raises:
+        ValueError: 不支援的格式
+    """
+    if value is None or value == '':
+        return TIME_FORMAT_ISO
+    time_format = str(value).strip().lower()
+    if time_format not in TIME_FORMATS:
+        raise ValueError(f"不支援的時間格式: {value}；可用格式: {', '.join(TIME_FORMATS)}")
+    return time_format
+
+
+def _numpy():
+    """NumPy 為可選套件，第一次需要時才匯入"""
+    if not hasattr(_numpy, "module"):
+        try:
+            import numpy
+            _numpy.module = numpy
+        except ImportError:
+            _numpy.module = None
+    return _numpy.module
+
+
+def _isoformat_seconds(seconds: float) -> Optional[str]:
+    try:
+        return datetime.datetime.fromtimestamp(seconds).isoformat()
+    except (ValueError, OSError, OverflowError):
+        return None
+
+
+def required_columns(fields: Optional[Iterable[str]]) -> Optional[FrozenSet[str]]:
+    """取得 fields 需要後端取得的原始欄位；None 代表全部"""
+    if fields is None:
+        return None
+    return frozenset(column for field in fields for column in _FIELD_COLUMNS[field])
+
+
+def format_size(size_bytes: int, is_folder: bool = False) -> str:
+    """格式化檔案大小（整數單位，不顯示小數），資料夾顯示 '-'"""
+    if is_folder:
+        return "-"
+    try:
+        if size_bytes is None or size_bytes == 0:
+            return "0 B"
+        size = int(size_bytes)
+    except (TypeError, ValueError):
+        return "-"
+
+    size_names = ["B", "KB", "MB", "GB", "TB"]
+    i = 0
+    while size >= 1024 and i < len(size_names) - 1:
+        size = size // 1024
+        i += 1
+    return f"{size} {size_names[i]}"
+
+
+def datetime_to_filetime(value: Optional[datetime.datetime]) -> int:
+    """將 datetime 轉換為 FILETIME 刻度 (None 為 0)"""
+    if value is None:
+        return 0
+    try:
+        return int(value.timestamp() * FILETIME_TICKS_PER_SECOND) + FILETIME_EPOCH_OFFSET
+    except (ValueError, OSError, OverflowError):
+        return 0
+
+
+def ns_to_filetime(nanoseconds: int) -> int:
+    """將 os.stat 的 st_*_ns 轉換為 FILETIME 刻度"""
+    return nanoseconds // 100 + FILETIME_EPOCH_OFFSET
+
+
+class ResultBatch:
+    """一批以欄位保存的搜尋結果
+
+    Args:
+        time_base: 時間欄位的單位 (TIME_BASE_FILETIME 或 TIME_BASE_EPOCH)，0 代表沒有時間
+        path_separator: 組合 full_path 時使用的路徑分隔符號
+    """
+
+    __slots__ = ('time_base', 'path_separator', 'filenames', 'paths', 'extensions',
+                 'sizes', 'created', 'modified', 'accessed', 'flags')
+
+    def __init__(self, time_base: str = TIME_BASE_FILETIME, path_separator: str = os.sep):
+        self.time_base = time_base
+        self.path_separator = path_separator
+        self.filenames: List[str] = []
+        self.paths: List[str] = []
+        # None 代表依檔名推導副檔名
+        self.extensions: List[Optional[str]] = []
+        self.sizes = array('q')
+        self.created = array('q')
+        self.modified = array('q')
+        self.accessed = array('q')
+        self.flags = array('B')
+
+    def append(self, filename: str, path: str, size: int = 0, created: int = 0, modified: int = 0,
+               accessed: int = 0, is_folder: bool = False, extension: Optional[str] = None):
+        """加入一列 (時間為 time_base 單位的整數)"""
+        self.filenames.append(filename)
+        self.paths.append(path)
+        self.extensions.append(extension)
+        self.sizes.append(size or 0)
+        self.created.append(created or 0)
+        self.modified.append(modified or 0)
+        self.accessed.append(accessed or 0)
+        self.flags.append(_FLAG_FOLDER if is_folder else 0)
+
+    def extend_columns(self, filenames: List[str], paths: List[str],
+                       sizes: Optional[Iterable[int]] = None,
+                       created: Optional[Iterable[int]] = None,
+                       modified: Optional[Iterable[int]] = None,
+                       folders: Optional[Iterable[bool]] = None):
+        """一次加入多列 (每個欄位一個序列，None 代表該欄位全部為 0)"""
+        count = len(filenames)
+        zeros = array('q', bytes(8 * count))
+        self.filenames.extend(filenames)
+        self.paths.extend(paths)
+        self.extensions.extend([None] * count)
+        self.sizes.extend(zeros if sizes is None else array('q', sizes))
+        self.created.extend(zeros if created is None else array('q', created))
+        self.modified.extend(zeros if modified is None else array('q', modified))
+        self.accessed.extend(zeros)
+        self.flags.extend(bytes(count) if folders is None else
+                          array('B', [_FLAG_FOLDER if folder else 0 for folder in folders]))
+
+    @classmethod
+    def from_results(cls, results: Iterable, path_separator: str = os.sep) -> 'ResultBatch':
+        """由 MockEverythingSearchResult 等逐筆物件建立"""
+        batch = cls(TIME_BASE_FILETIME, path_separator)
+        for result in results:
+            batch.append(result.filename, result.path, result.size,
+                         datetime_to_filetime(result.date_created),
+                         datetime_to_filetime(result.date_modified),
+                         datetime_to_filetime(getattr(result, 'date_accessed', None)),
+                         result.is_folder, result.extension)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.take(range(*key.indices(len(self))))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("ResultBatch index out of range")
+        return ResultRow(self, key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield ResultRow(self, i)
+
+    def take(self, indexes: Iterable[int]) -> 'ResultBatch':
+        """依列號取出子集合 (新的批次)"""
+        indexes = list(indexes)
+        batch = ResultBatch(self.time_base, self.path_separator)
+        for name in ('filenames', 'paths', 'extensions'):
+            column = getattr(self, name)
+            setattr(batch, name, [column[i] for i in indexes])
+        for name in ('sizes', 'created', 'modified', 'accessed', 'flags'):
+            column = getattr(self, name)
+            setattr(batch, name, array(column.typecode, [column[i] for i in indexes]))
+        return batch
+
+    @classmethod
+    def concat(cls, batches: Sequence['ResultBatch']) -> 'ResultBatch':
+        """依序串接同一來源的多個批次 (時間基準與路徑分隔符號以第一個批次為準)"""
+        batch = cls(batches[0].time_base, batches[0].path_separator) if batches else cls()
+        for part in batches:
+            for name in ('filenames', 'paths', 'extensions', 'sizes', 'created', 'modified',
+                         'accessed', 'flags'):
+                getattr(batch, name).extend(getattr(part, name))
+        return batch
+
+    @property
+    def nbytes(self) -> int:
+        """估計佔用的記憶體 (位元組)，供結果快取計算上限"""
+        text = sum(len(name) for name in self.filenames) + sum(len(path) for path in self.paths)
+        return len(self) * _ROW_OVERHEAD + 2 * text
+
+    # ------------------------------------------------------------------
+    # 欄位轉換 (只在序列化時執行)
+    # ------------------------------------------------------------------
+
+    def full_path_at(self, i: int) -> str:
+        path = self.paths[i]
+        filename = self.filenames[i]
+        if not path:
+            return filename
+        if path.endswith(self.path_separator):
+            return path + filename
+        return path + self.path_separator + filename
+
+    def extension_at(self, i: int) -> str:
+        extension = self.extensions[i]
+        if extension is not None:
+            return extension
+        if self.flags[i] & _FLAG_FOLDER:
+            return ""
+        _, ext = os.path.splitext(self.filenames[i])
+        return ext.lstrip('.')
+
+    def to_datetime(self, value: int) -> Optional[datetime.datetime]:
+        """將時間欄位的原始整數轉換為 datetime"""
+        if not value:
+            return None
+        try:
+            if self.time_base == TIME_BASE_FILETIME:
+                return datetime.datetime.fromtimestamp(
+                    (value - FILETIME_EPOCH_OFFSET) / FILETIME_TICKS_PER_SECOND)
+            return datetime.datetime.fromtimestamp(value)
+        except (ValueError, OSError, OverflowError):
+            return None
+
+    def _isoformat(self, value: int) -> Optional[str]:
+        converted = self.to_datetime(value)
+        return converted.isoformat() if converted else None
+
+    def _epoch(self, value: int) -> Optional[float]:
+        if not value:
+            return None
+        if self.time_base == TIME_BASE_FILETIME:
+            return (value - FILETIME_EPOCH_OFFSET) / FILETIME_TICKS_PER_SECOND
+        return value
+
+    def _time_value(self, value: int, time_format: str):
+        if time_format == TIME_FORMAT_EPOCH:
+            return self._epoch(value)
+        return self._isoformat(value)
+
+    def epoch_seconds(self, column: array) -> List[Optional[float]]:
+        """整欄轉換為 epoch 秒數 (0 為 None)；列數夠多且已安裝 NumPy 時以向量運算轉換"""
+        if self.time_base != TIME_BASE_FILETIME:
+            return [value or None for value in column]
+        numpy = _numpy() if len(column) >= _NUMPY_MIN_ROWS else None
+        if numpy is not None:
+            ticks = numpy.frombuffer(column, dtype=numpy.int64)
+            seconds = ((ticks - FILETIME_EPOCH_OFFSET) / FILETIME_TICKS_PER_SECOND).tolist()
+            return [value if tick else None for tick, value in zip(column, seconds)]
+        return [(value - FILETIME_EPOCH_OFFSET) / FILETIME_TICKS_PER_SECOND if value else None
+                for value in column]
+
+    def time_column(self, field: str, time_format: str = TIME_FORMAT_ISO) -> List:
+        """整欄轉換時間欄位 (date_created / date_modified / date_accessed)"""
+        seconds = self.epoch_seconds(getattr(self, _TIME_COLUMNS[field]))
+        if time_format == TIME_FORMAT_EPOCH:
+            return seconds
+        return [None if value is None else _isoformat_seconds(value) for value in seconds]
+
+    def column_values(self, field: str, time_format: str = TIME_FORMAT_ISO) -> Sequence:
+        """取得一個 API 欄位的整欄數值"""
+        if field in _TIME_COLUMNS:
+            return self.time_column(field, time_format)
+        if field == 'filename':
+            return self.filenames
+        if field == 'path':
+            return self.paths
+        if field == 'size':
+            return self.sizes
+        if field == 'is_folder':
+            return [bool(flag & _FLAG_FOLDER) for flag in self.flags]
+        if field == 'is_file':
+            return [not flag & _FLAG_FOLDER for flag in self.flags]
+        getter = _FIELD_GETTERS[field]
+        return [getter(self, i) for i in range(len(self))]
+
+    def row_dict(self, i: int, fields: Optional[Iterable[str]] = None,
+                 time_format: str = TIME_FORMAT_ISO) -> Dict:
+        """將第 i 列轉換為 API 使用的字典，指定 fields 時只轉換這些欄位"""
+        row = {}
+        for field in RESULT_FIELDS if fields is None else fields:
+            column = _TIME_COLUMNS.get(field)
+            if column is not None:
+                row[field] = self._time_value(getattr(self, column)[i], time_format)
+            else:
+                row[field] = _FIELD_GETTERS[field](self, i)
+        return row
+
+    def to_dicts(self, fields: Optional[Iterable[str]] = None,
+                 time_format: str = TIME_FORMAT_ISO) -> List[Dict]:
+        """將整批結果轉換為字典列表 (逐欄轉換後再組合，不建立列視圖)"""
+        names = RESULT_FIELDS if fields is None else tuple(fields)
+        if not names:
+            return [{} for _ in range(len(self))]
+        columns = [self.column_values(field, time_format) for field in names]
+        return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+# 時間欄位對應的陣列
+_TIME_COLUMNS = {
+    'date_created': 'created',
+    'date_modified': 'modified',
+    'date_accessed': 'accessed',
+}
+
+# 單一欄位的轉換函式 (欄位投影時使用，未要求的欄位完全不轉換)
+_FIELD_GETTERS = {
+    'filename': lambda batch, i: batch.filenames[i],
+    'path': lambda batch, i: batch.paths[i],
+    'full_path': ResultBatch.full_path_at,
+    'extension': ResultBatch.extension_at,
+    'size': lambda batch, i: batch.sizes[i],
+    'size_formatted': lambda batch, i: format_size(batch.sizes[i], is_folder=bool(batch.flags[i] & _FLAG_FOLDER)),
+    'is_file': lambda batch, i: not batch.flags[i] & _FLAG_FOLDER,
+    'is_folder': lambda batch, i: bool(batch.flags[i] & _FLAG_FOLDER),
+}
+
+
+class ResultRow:
+    """ResultBatch 中單一列的唯讀視圖，屬性與 MockEverythingSearchResult 相同"""
+
+    __slots__ = ('_batch', '_index')
+
+    def __init__(self, batch: ResultBatch, index: int):
+        self._batch = batch
+        self._index = index
+
+    @property
+    def filename(self) -> str:
+        return self._batch.filenames[self._index]
+
+    @property
+    def path(self) -> str:
+        return self._batch.paths[self._index]
+
+    @property
+    def full_path(self) -> str:
+        return self._batch.full_path_at(self._index)
+
+    @property
+    def extension(self) -> str:
+        return self._batch.extension_at(self._index)
+
+    @property
+    def size(self) -> int:
+        return self._batch.sizes[self._index]
+
+    @property
+    def date_created(self) -> Optional[datetime.datetime]:
+        return self._batch.to_datetime(self._batch.created[self._index])
+
+    @property
+    def date_modified(self) -> Optional[datetime.datetime]:
+        return self._batch.to_datetime(self._batch.modified[self._index])
+
+    @property
+    def date_accessed(self) -> Optional[datetime.datetime]:
+        return self._batch.to_datetime(self._batch.accessed[self._index])
+
+    @property
+    def is_folder(self) -> bool:
+        return bool(self._batch.flags[self._index] & _FLAG_FOLDER)
+
+    @property
+    def is_file(self) -> bool:
+        return not self.is_folder
+
+    def to_dict(self, fields: Optional[Iterable[str]] = None,
+                time_format: str = TIME_FORMAT_ISO) -> Dict:
+        """轉換為字典格式"""
+        return self._batch.row_dict(self._index, fields, time_format)
+
+    def __repr__(self) -> str:
+        return f"ResultRow({self.full_path!r})"
+
+
+def results_to_dicts(results, fields: Optional[Iterable[str]] = None,
+                     time_format: str = TIME_FORMAT_ISO) -> List[Dict]:
+    """
+    將搜尋結果 (ResultBatch 或逐筆物件列表) 轉換為字典列表
+
+    指定 fields 時只輸出這些欄位；time_format 為 TIME_FORMAT_EPOCH 時時間欄位輸出 epoch 秒數
+    """
+    if isinstance(results, ResultBatch):
+        return results.to_dicts(fields, time_format)
+    if time_format == TIME_FORMAT_EPOCH:
+        return ResultBatch.from_results(results).to_dicts(fields, time_format)
+    dicts = [result.to_dict() for result in results]
+    if fields is not None:
+        dicts = [{field: data[field] for field in fields} for data in dicts]
+    return dicts
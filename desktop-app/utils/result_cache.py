@@ -0,0 +1,327 @@
+"""
+搜尋結果快取
+包在任何 SearchBackend 前面的有界快取：以 (後端, 正規化查詢, max_results, sort, fields, offset) 為鍵，
+依估計的記憶體用量做 LRU 淘汰並設有 TTL；後端提供 index_generation 時，索引更新後舊結果自動失效。
+同一頁面上重複出現的字詞因此只需查一次字典，而不必再經過 DLL 或索引。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+try:
+    from .result_batch import ResultBatch
+except ImportError:
+    from result_batch import ResultBatch
+
+# 每個結果物件與快取項目的固定額外開銷估計 (位元組)
+_RESULT_OVERHEAD = 600
+_ENTRY_OVERHEAD = 300
+
+
+def normalize_query(query: str) -> str:
+    """正規化查詢字串：去除多餘空白，並在未使用 case: 修飾詞時忽略大小寫"""
+    normalized = ' '.join(query.split())
+    if 'case:' in normalized.lower():
+        return normalized
+    return normalized.lower()
+
+
+def estimate_results_size(results) -> int:
+    """估計結果佔用的記憶體 (位元組)"""
+    size = _ENTRY_OVERHEAD
+    if isinstance(results, ResultBatch):
+        return size + results.nbytes
+    for result in results:
+        # full_path 以外的字串 (filename / path) 大致與 full_path 等長
+        size += _RESULT_OVERHEAD + 2 * len(getattr(result, 'full_path', '') or '')
+    return size
+
+
+def _copy_results(results):
+    """逐筆物件列表複製一份避免被呼叫端修改；ResultBatch 建立後不再修改，直接共用"""
+    if isinstance(results, ResultBatch):
+        return results
+    return list(results)
+
+
+class _CacheEntry:
+    __slots__ = ('results', 'total_count', 'size', 'expires_at', 'generation')
+
+    def __init__(self, results, total_count, size, expires_at, generation):
+        self.results = results
+        self.total_count = total_count
+        self.size = size
+        self.expires_at = expires_at
+        self.generation = generation
+
+
+class SearchResultCache:
+    """搜尋結果的 LRU + TTL 快取
+
+    Args:
+        max_entries: 最多保存的查詢數量
+        max_bytes: 估計記憶體用量上限，超過時由最久未使用的項目開始淘汰
+        ttl: 結果有效秒數 (沒有索引世代可判斷的後端，例如 Everything，以此控制新鮮度)
+        enabled: False 時直接呼叫後端，不保存任何結果
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024,
+                 ttl: float = 30.0, enabled: bool = True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(backend, query: str, max_results: int, sort=None, fields=None,
+                 offset: int = 0) -> Tuple:
+        """建立快取鍵"""
+        if fields is not None:
+            fields = tuple(sorted(fields))
+        return (backend.name, normalize_query(query), max_results, sort, fields, offset)
+
+    @staticmethod
+    def _generation(backend) -> Optional[int]:
+        return getattr(backend, 'index_generation', None)
+
+    def get(self, key: Hashable, generation: Optional[int] = None) -> Optional[Tuple[List, int]]:
+        """
+        取得快取的結果
+
+        Returns:
+            (results, total_count)；沒有、已過期或索引世代不符時返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if entry.generation != generation:
+                self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _copy_results(entry.results), entry.total_count
+
+    def put(self, key: Hashable, results: List, total_count: int, generation: Optional[int] = None):
+        """保存結果，超過上限時淘汰最久未使用的項目"""
+        size = estimate_results_size(results)
+        if size > self.max_bytes:
+            return
+        entry = _CacheEntry(_copy_results(results), total_count, size, time.monotonic() + self.ttl, generation)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def search(self, backend, query: str, max_results: int = 100, sort=None, fields=None,
+               search_func: Optional[Callable[[], Tuple[List, int]]] = None,
+               offset: int = 0) -> Tuple[List, int, bool]:
+        """
+        透過快取執行搜尋
+
+        Args:
+            backend: 搜尋後端
+            query: 搜尋查詢字串
+            max_results: 最大結果數量
+            sort: 排序方式 (納入快取鍵)
+            fields: 要求的欄位 (納入快取鍵)
+            search_func: 實際執行搜尋的函式，預設為 backend.search(query, max_results, fields, offset)
+            offset: 分頁位移 (納入快取鍵)
+
+        Returns:
+            (results, total_count, cached)
+        """
+        if search_func is None:
+            def search_func():
+                return backend.search(query, max_results, fields=fields, offset=offset)
+
+        if not self.enabled:
+            results, total_count = search_func()
+            return results, total_count, False
+
+        key = self.make_key(backend, query, max_results, sort, fields, offset)
+        # 先記下世代，搜尋期間索引若有更新，存入的結果會在下次讀取時失效
+        generation = self._generation(backend)
+        cached = self.get(key, generation)
+        if cached is not None:
+            return cached[0], cached[1], True
+
+        results, total_count = search_func()
+        self.put(key, results, total_count, generation)
+        return results, total_count, False
+
+    def peek(self, backend, query: str, max_results: int, fields=None,
+             offset: int = 0) -> Optional[Tuple[List, int]]:
+        """只查看 search() 快取的結果，不呼叫後端；沒有時返回 None"""
+        if not self.enabled:
+            return None
+        return self.get(self.make_key(backend, query, max_results, None, fields, offset),
+                        self._generation(backend))
+
+    def store(self, backend, query: str, max_results: int, results, total_count: int,
+              fields=None, offset: int = 0):
+        """保存由其他途徑取得的完整結果 (例如事件串流逐批送出的結果)，之後的 search() 可直接使用"""
+        if self.enabled:
+            self.put(self.make_key(backend, query, max_results, None, fields, offset),
+                     results, total_count, self._generation(backend))
+
+    def search_many(self, backend, queries: List[str], max_results: int = 1,
+                    fields=None) -> List:
+        """
+        透過快取執行多個查詢，只把未命中的查詢一次交給 backend.search_many()
+
+        Returns:
+            與 queries 順序相同的列表，每項為 (results, total_count, cached)；該查詢失敗時為例外物件
+        """
+        if not self.enabled:
+            return [outcome if isinstance(outcome, Exception) else (outcome[0], outcome[1], False)
+                    for outcome in backend.search_many(queries, max_results, fields)]
+
+        generation = self._generation(backend)
+        keys = [self.make_key(backend, query, max_results, None, fields) for query in queries]
+        outcomes: List = [None] * len(queries)
+        misses = []
+        for i, key in enumerate(keys):
+            cached = self.get(key, generation)
+            if cached is None:
+                misses.append(i)
+            else:
+                outcomes[i] = (cached[0], cached[1], True)
+
+        if misses:
+            fetched = backend.search_many([queries[i] for i in misses], max_results, fields)
+            for i, outcome in zip(misses, fetched):
+                if not isinstance(outcome, Exception):
+                    results, total_count = outcome
+                    self.put(keys[i], results, total_count, generation)
+                    outcome = (results, total_count, False)
+                outcomes[i] = outcome
+        return outcomes
+
+    def _count_key(self, backend, query: str) -> Tuple:
+        # max_results 位置放 'count'，與一般搜尋的快取鍵不會重疊
+        return self.make_key(backend, query, 'count')
+
+    def count(self, backend, query: str) -> Tuple[int, bool]:
+        """
+        透過快取取得查詢的結果總數 (backend.count())
+
+        Returns:
+            (total_count, cached)
+        """
+        if not self.enabled:
+            return backend.count(query), False
+
+        key = self._count_key(backend, query)
+        generation = self._generation(backend)
+        cached = self.get(key, generation)
+        if cached is not None:
+            return cached[1], True
+
+        total_count = backend.count(query)
+        self.put(key, [], total_count, generation)
+        return total_count, False
+
+    def cached_count(self, backend, query: str) -> Optional[int]:
+        """只查看快取的結果總數，不呼叫後端；沒有時返回 None"""
+        if not self.enabled:
+            return None
+        cached = self.get(self._count_key(backend, query), self._generation(backend))
+        return None if cached is None else cached[1]
+
+    def store_count(self, backend, query: str, total_count: int):
+        """保存由其他途徑得知的確切總數 (例如搜尋結果不足一頁時)"""
+        if self.enabled:
+            self.put(self._count_key(backend, query), [], total_count, self._generation(backend))
+
+    def count_many(self, backend, queries: List[str]) -> List:
+        """
+        透過快取取得多個查詢的結果總數，只把未命中的查詢一次交給 backend.count_many()
+
+        Returns:
+            與 queries 順序相同的列表，每項為 (total_count, cached)；該查詢失敗時為例外物件
+        """
+        if not self.enabled:
+            return [outcome if isinstance(outcome, Exception) else (outcome, False)
+                    for outcome in backend.count_many(queries)]
+
+        generation = self._generation(backend)
+        keys = [self._count_key(backend, query) for query in queries]
+        outcomes: List = [None] * len(queries)
+        misses = []
+        for i, key in enumerate(keys):
+            cached = self.get(key, generation)
+            if cached is None:
+                misses.append(i)
+            else:
+                outcomes[i] = (cached[1], True)
+
+        if misses:
+            fetched = backend.count_many([queries[i] for i in misses])
+            for i, outcome in zip(misses, fetched):
+                if not isinstance(outcome, Exception):
+                    self.put(keys[i], [], outcome, generation)
+                    outcome = (outcome, False)
+                outcomes[i] = outcome
+        return outcomes
+
+    def clear(self):
+        """清除所有快取項目"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """快取統計 (顯示於 /status)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+def create_result_cache(config: Optional[Dict] = None) -> SearchResultCache:
+    """依 config.yml 的 cache 區段建立快取"""
+    config = config or {}
+    return SearchResultCache(
+        max_entries=int(config.get('max_entries', 1024)),
+        max_bytes=int(float(config.get('max_memory_mb', 32)) * 1024 * 1024),
+        ttl=float(config.get('ttl', 30)),
+        enabled=bool(config.get('enabled', True)))
@@ -0,0 +1,146 @@
+"""
+搜尋結果串流輸出
+將後端的 iter_search_batches() 逐批轉成 NDJSON、CSV 或 Server-Sent Events 文字區塊，
+每個批次序列化後立即交給 WSGI 伺服器送出 (chunked transfer encoding)，
+伺服器端同時只保留一個批次，記憶體用量與匯出的總筆數無關。
+"""
+import csv
+import io
+import json
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence
+
+try:
+    from .result_batch import RESULT_FIELDS, TIME_FORMAT_ISO, results_to_dicts
+except ImportError:
+    from result_batch import RESULT_FIELDS, TIME_FORMAT_ISO, results_to_dicts
+
+# 支援的串流格式與對應的 Content-Type
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+# Server-Sent Events 的 Content-Type
+SSE_CONTENT_TYPE = 'text/event-stream; charset=utf-8'
+
+
+class StreamStats:
+    """串流過程的統計 (輸出筆數、批次、計時與錯誤)，串流結束後供記錄使用"""
+    __slots__ = ('rows', 'batches', 'error', 'started_at', 'first_batch_at')
+
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.error: Optional[str] = None
+        self.started_at = time.monotonic()
+        self.first_batch_at: Optional[float] = None
+
+    def add_batch(self, rows: int):
+        self.rows += rows
+        self.batches += 1
+        if self.first_batch_at is None:
+            self.first_batch_at = time.monotonic()
+
+    def elapsed_ms(self) -> float:
+        """開始到現在的毫秒數"""
+        return round((time.monotonic() - self.started_at) * 1000, 1)
+
+    def first_batch_ms(self) -> Optional[float]:
+        """開始到第一個批次的毫秒數，沒有結果時為 None"""
+        if self.first_batch_at is None:
+            return None
+        return round((self.first_batch_at - self.started_at) * 1000, 1)
+
+
+def iter_ndjson(batches: Iterable, fields: Optional[Sequence[str]] = None,
+                stats: Optional[StreamStats] = None,
+                time_format: str = TIME_FORMAT_ISO) -> Iterator[str]:
+    """每筆結果一行 JSON；中途發生錯誤時以 {"error": ...} 行結束"""
+    stats = stats or StreamStats()
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    try:
+        for batch in batches:
+            rows = results_to_dicts(batch, fields, time_format)
+            if not rows:
+                continue
+            stats.add_batch(len(rows))
+            yield '\n'.join(map(dumps, rows)) + '\n'
+    except Exception as e:
+        stats.error = str(e)
+        print(f"串流輸出中斷: {e}")
+        yield dumps({'error': str(e)}) + '\n'
+
+
+def iter_csv(batches: Iterable, fields: Optional[Sequence[str]] = None,
+             stats: Optional[StreamStats] = None,
+             time_format: str = TIME_FORMAT_ISO) -> Iterator[str]:
+    """第一行為欄位名稱，之後每筆結果一行；中途發生錯誤時直接結束"""
+    stats = stats or StreamStats()
+    columns = list(fields or RESULT_FIELDS)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    yield buffer.getvalue()
+    try:
+        for batch in batches:
+            rows = results_to_dicts(batch, fields, time_format)
+            if not rows:
+                continue
+            stats.add_batch(len(rows))
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    except Exception as e:
+        stats.error = str(e)
+        print(f"串流輸出中斷: {e}")
+
+
+def _sse_event(event: str, data: Dict, dumps) -> str:
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+
+def iter_sse(batches: Iterable, fields: Optional[Sequence[str]] = None,
+             stats: Optional[StreamStats] = None,
+             summary: Optional[Callable[[StreamStats], Dict]] = None,
+             time_format: str = TIME_FORMAT_ISO) -> Iterator[str]:
+    """
+    以 Server-Sent Events 逐批送出結果
+
+    每個批次一個 results 事件 ({"results": [...], "offset": n})，
+    結束時送出 summary 事件 (summary(stats) 的內容加上筆數與計時)；發生錯誤時送出 error 事件。
+    """
+    stats = stats or StreamStats()
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    try:
+        for batch in batches:
+            rows = results_to_dicts(batch, fields, time_format)
+            if not rows:
+                continue
+            offset = stats.rows
+            stats.add_batch(len(rows))
+            yield _sse_event('results', {'results': rows, 'offset': offset}, dumps)
+    except Exception as e:
+        stats.error = str(e)
+        print(f"串流輸出中斷: {e}")
+        yield _sse_event('error', {'success': False, 'error': str(e)}, dumps)
+        return
+
+    data = dict(summary(stats)) if summary is not None else {}
+    data.update({
+        'success': True,
+        'displayed_count': stats.rows,
+        'batches': stats.batches,
+        'elapsed_ms': stats.elapsed_ms(),
+        'first_result_ms': stats.first_batch_ms(),
+    })
+    yield _sse_event('summary', data, dumps)
+
+
+def iter_stream(format_name: str, batches: Iterable, fields: Optional[Sequence[str]] = None,
+                stats: Optional[StreamStats] = None,
+                time_format: str = TIME_FORMAT_ISO) -> Iterator[str]:
+    """依格式名稱 (STREAM_FORMATS 的鍵) 選擇序列化方式"""
+    if format_name == 'csv':
+        return iter_csv(batches, fields, stats, time_format)
+    return iter_ndjson(batches, fields, stats, time_format)
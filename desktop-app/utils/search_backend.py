@@ -0,0 +1,525 @@
+"""
+搜尋後端介面與註冊表
+所有搜尋引擎 (Everything / Windows Search / 本機索引 / 簡化搜尋 / 示範模式) 都實作 SearchBackend，
+並透過 SearchBackendRegistry 在每次請求時依優先順序選出可用的後端
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 後端建立與可用性探測的預設期限 (秒)
+DEFAULT_PROBE_TIMEOUT = 3.0
+
+# 含有這些字元的查詢使用萬用字元或 Everything 運算子，無法安全地在記憶體中縮小結果
+_QUERY_OPERATOR_CHARS = set('*?|!<>":')
+
+
+def plain_terms(query: str) -> Optional[List[str]]:
+    """將查詢拆成小寫條件；含萬用字元或運算子時返回 None"""
+    query = query.lower()
+    if _QUERY_OPERATOR_CHARS.intersection(query):
+        return None
+    return query.split()
+
+
+def is_term_refinement(previous: str, query: str) -> bool:
+    """條件 AND 語意下，query 的結果是否必定為 previous 結果的子集合
+
+    previous 的每個條件都必須是 query 某個條件的子字串 (例如加長字串或新增條件)。
+    """
+    previous_terms = plain_terms(previous)
+    terms = plain_terms(query)
+    if not previous_terms or not terms or previous_terms == terms:
+        return False
+    return all(any(p in t for t in terms) for p in previous_terms)
+
+
+def is_substring_refinement(previous: str, query: str) -> bool:
+    """整串子字串語意下，query 的結果是否必定為 previous 結果的子集合"""
+    previous = ' '.join(previous.lower().split())
+    query = ' '.join(query.lower().split())
+    if plain_terms(previous) is None or plain_terms(query) is None:
+        return False
+    return bool(previous) and previous != query and previous in query
+
+
+class SearchBackend:
+    """搜尋後端的共同介面
+
+    子類別需覆寫 search() 與 is_available()，並以類別屬性宣告能力旗標，
+    讓快取、分頁與併發等共用層可以依旗標決定如何包裝各個引擎。
+    """
+
+    # 後端識別名稱 (註冊表與 API 使用)
+    name: str = "base"
+    # 顯示名稱 (/status 的 search_engine 欄位)
+    display_name: str = "Base"
+
+    # 能力旗標
+    supports_offset: bool = False      # search() 可從指定位移開始取結果
+    supports_sort: bool = False        # search() 可依指定欄位排序
+    supports_count_only: bool = False  # count() 不必建立結果物件且成本遠低於搜尋
+    is_thread_safe: bool = False       # 可同時被多個執行緒呼叫
+    streams_progressively: bool = False  # 完整搜尋很慢，iter_search_batches() 能在結束前先產生結果
+
+    def search(self, query: str, max_results: int = 100,
+               fields: Optional[Tuple[str, ...]] = None,
+               offset: int = 0) -> Tuple[List, int]:
+        """
+        執行搜尋
+
+        Args:
+            query: 搜尋查詢字串
+            max_results: 最大結果數量
+            fields: 需要的結果欄位 (result_batch.RESULT_FIELDS 的子集合)，None 代表全部；
+                後端可略過未要求的欄位，不取得也不轉換
+            offset: 略過的結果數 (僅 supports_offset 為 True 的後端會收到非 0 值)
+
+        Returns:
+            (results, total_count): 搜尋結果列表和總結果數
+        """
+        raise NotImplementedError
+
+    def count(self, query: str) -> int:
+        """
+        符合查詢的總數 (與 search() 的 total_count 相同語意)
+
+        預設只取一筆結果並返回 total_count；能直接計數的後端應覆寫並設定 supports_count_only。
+        """
+        _, total_count = self.search(query, 1, fields=('filename',))
+        return total_count
+
+    def count_many(self, queries: Sequence[str]) -> List:
+        """
+        一次計數多個查詢
+
+        Returns:
+            與 queries 順序相同的列表，每項為總數；該查詢失敗時為例外物件
+        """
+        outcomes = []
+        for query in queries:
+            try:
+                outcomes.append(self.count(query))
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+    def search_many(self, queries: Sequence[str], max_results: int = 1,
+                    fields: Optional[Tuple[str, ...]] = None) -> List:
+        """
+        一次執行多個查詢 (批次查詢端點使用)
+
+        預設依序呼叫 search()；需要共用昂貴設定 (例如序列化執行緒) 的後端可覆寫。
+
+        Returns:
+            與 queries 順序相同的列表，每項為 (results, total_count)；該查詢失敗時為例外物件
+        """
+        outcomes = []
+        for query in queries:
+            try:
+                outcomes.append(self.search(query, max_results, fields=fields))
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+    def iter_search_batches(self, query: str, batch_size: int = 1000,
+                            fields: Optional[Tuple[str, ...]] = None,
+                            max_results: Optional[int] = None) -> Iterator:
+        """
+        依序產生結果批次 (ResultBatch 或結果列表)，供串流匯出使用
+
+        預設以 offset 逐頁呼叫 search()，每次只保留一個批次；不支援位移的後端只能取一次
+        (最多 max_results 或 batch_size 筆)。能一次走訪全部結果的後端應覆寫此方法。
+
+        Args:
+            query: 搜尋查詢字串
+            batch_size: 每個批次的筆數
+            fields: 需要的結果欄位，None 代表全部
+            max_results: 最多產生的結果數，None 代表不限
+        """
+        if not self.supports_offset:
+            results, _ = self.search(query, max_results or batch_size, fields=fields)
+            if len(results):
+                yield results
+            return
+
+        offset = 0
+        while max_results is None or offset < max_results:
+            size = batch_size if max_results is None else min(batch_size, max_results - offset)
+            results, total_count = self.search(query, size, fields=fields, offset=offset)
+            if not len(results):
+                return
+            yield results
+            offset += len(results)
+            if offset >= total_count:
+                return
+
+    def is_available(self) -> bool:
+        """檢查後端目前是否可用"""
+        return True
+
+    def is_refinement(self, previous: str, query: str) -> bool:
+        """
+        query 的結果是否必定包含於 previous 的結果之中
+
+        預設為 Everything 式的語意：以空白分隔的條件 AND、不分大小寫。
+        整串比對的後端應改用 is_substring_refinement。
+        """
+        return is_term_refinement(previous, query)
+
+    def matches_result(self, result, query: str) -> Optional[bool]:
+        """
+        以與 search() 相同的語意判斷單一結果是否符合查詢，用於在記憶體中縮小先前的結果
+
+        Returns:
+            True / False；無法判斷時返回 None (此時不會使用縮小結果)
+        """
+        terms = plain_terms(query)
+        if terms is None:
+            return None
+        filename = result.filename.lower()
+        full_path = result.full_path.lower().replace('/', '\\')
+        for term in terms:
+            if '/' in term or '\\' in term:
+                if term.replace('/', '\\') not in full_path:
+                    return False
+            elif term not in filename:
+                return False
+        return True
+
+    def status(self) -> Dict:
+        """後端的執行狀態 (例如索引新鮮度)，顯示於 /status"""
+        return {}
+
+    def close(self):
+        """釋放後端資源 (應用程式結束時呼叫)"""
+
+    def capabilities(self) -> Dict[str, bool]:
+        """取得能力旗標"""
+        return {
+            'supports_offset': self.supports_offset,
+            'supports_sort': self.supports_sort,
+            'supports_count_only': self.supports_count_only,
+            'is_thread_safe': self.is_thread_safe,
+            'streams_progressively': self.streams_progressively,
+        }
+
+
+class _BackendEntry:
+    """註冊表內部使用的後端紀錄"""
+
+    def __init__(self, name: str, factory: Callable[[], SearchBackend], priority: int,
+                 probe_timeout: float):
+        self.name = name
+        self.factory = factory
+        self.priority = priority
+        self.probe_timeout = probe_timeout
+        self.instance: Optional[SearchBackend] = None
+        self.available: Optional[bool] = None
+        self.checked_at: float = 0.0
+        self.error: Optional[str] = None
+        self.lock = threading.Lock()
+        # 背景探測狀態
+        self.probing = False
+        self.probe_started: float = 0.0
+        self.probe_done = threading.Event()
+        self.probe_ms: Optional[float] = None
+
+
+class SearchBackendRegistry:
+    """搜尋後端註冊表
+
+    後端以工廠函式註冊，建立實例與可用性探測都在背景執行緒中進行，
+    每個後端各自並行探測並有自己的期限 (probe_timeout)，逾時視為暫時不可用。
+    可用的探測結果會快取 probe_interval 秒，不可用的結果則在 retry_interval 秒後重新探測；
+    重新探測期間沿用上一次的結果，因此請求不必等待探測，
+    較優先的後端探測成功後，下一個請求就會自動改用它。
+    """
+
+    def __init__(self, probe_interval: float = 30.0, retry_interval: float = 5.0):
+        self.probe_interval = probe_interval
+        self.retry_interval = retry_interval
+        self._entries: Dict[str, _BackendEntry] = {}
+        self._lock = threading.Lock()
+        # 每完成一次探測加一並通知等待中的請求
+        self._probe_finished = threading.Condition()
+        self._finished_probes = 0
+
+    def register(self, name: str, factory: Callable[[], SearchBackend], priority: int = 100,
+                 probe_timeout: float = DEFAULT_PROBE_TIMEOUT):
+        """註冊後端工廠，priority 數值越小越優先；probe_timeout 為建立與探測的期限 (秒)"""
+        with self._lock:
+            self._entries[name] = _BackendEntry(name, factory, priority, probe_timeout)
+
+    def names(self) -> List[str]:
+        """依優先順序取得所有已註冊的後端名稱"""
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e.priority)
+        return [entry.name for entry in entries]
+
+    def _get_entry(self, name: str) -> _BackendEntry:
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"未註冊的搜尋後端: {name}")
+        return entry
+
+    def get_backend(self, name: str) -> Optional[SearchBackend]:
+        """取得指定後端實例，建立失敗時返回 None"""
+        entry = self._get_entry(name)
+        with entry.lock:
+            return self._instantiate(entry)
+
+    def _instantiate(self, entry: _BackendEntry) -> Optional[SearchBackend]:
+        if entry.instance is None and entry.error is None:
+            try:
+                entry.instance = entry.factory()
+            except Exception as e:
+                entry.error = str(e)
+                entry.available = False
+                entry.checked_at = time.monotonic()
+        return entry.instance
+
+    def start_probes(self):
+        """並行探測所有後端 (不等待結果)"""
+        for name in self.names():
+            entry = self._get_entry(name)
+            with entry.lock:
+                self._start_probe(entry)
+
+    def wait_for_probes(self, timeout: Optional[float] = None) -> Dict[str, Optional[bool]]:
+        """
+        等待進行中的探測完成 (每個後端最多等到自己的期限，整體最多 timeout 秒)
+
+        Returns:
+            {後端名稱: 是否可用}，仍未完成的為 None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in self.names():
+            entry = self._get_entry(name)
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            self._wait_for_probe(entry, remaining)
+        return {name: self._get_entry(name).available for name in self.names()}
+
+    def _start_probe(self, entry: _BackendEntry):
+        """在背景執行緒中建立實例並探測可用性 (呼叫端需持有 entry.lock)"""
+        if entry.probing:
+            return
+        entry.probing = True
+        entry.probe_started = time.monotonic()
+        entry.probe_done = threading.Event()
+        threading.Thread(target=self._run_probe, args=(entry, entry.probe_done),
+                         name=f"probe-{entry.name}", daemon=True).start()
+
+    def _run_probe(self, entry: _BackendEntry, done: threading.Event):
+        backend = entry.instance
+        error = None
+        try:
+            if backend is None:
+                backend = entry.factory()
+            available = bool(backend.is_available())
+        except Exception as e:
+            available = False
+            error = str(e)
+
+        with entry.lock:
+            if entry.instance is None:
+                entry.instance = backend
+            entry.available = available
+            entry.error = error
+            entry.checked_at = time.monotonic()
+            entry.probe_ms = round((entry.checked_at - entry.probe_started) * 1000, 1)
+            entry.probing = False
+        done.set()
+        with self._probe_finished:
+            self._finished_probes += 1
+            self._probe_finished.notify_all()
+
+    def _wait_for_probe(self, entry: _BackendEntry, wait: Optional[float]):
+        """等待 entry 的探測完成，最多 wait 秒 (None 代表等到探測期限)"""
+        with entry.lock:
+            if not entry.probing:
+                return
+            done = entry.probe_done
+            remaining = entry.probe_started + entry.probe_timeout - time.monotonic()
+        if wait is not None:
+            remaining = min(remaining, wait)
+        if remaining > 0:
+            done.wait(remaining)
+
+    def is_backend_available(self, name: str, force: bool = False,
+                             wait: Optional[float] = None) -> bool:
+        """
+        檢查指定後端是否可用
+
+        結果會快取 probe_interval 秒 (不可用時為 retry_interval 秒)，過期時在背景重新探測並沿用上一次的結果。
+        從未完成探測時等待探測，最多 wait 秒 (None 代表等到該後端的探測期限)，仍未完成視為不可用。
+
+        Args:
+            force: 立即重新探測並等待結果
+            wait: 首次探測最多等待的秒數，0 代表不等待
+        """
+        entry = self._get_entry(name)
+        with entry.lock:
+            now = time.monotonic()
+            interval = self.probe_interval if entry.available else self.retry_interval
+            fresh = entry.available is not None and now - entry.checked_at < interval
+            if fresh and not force:
+                return entry.available
+            self._start_probe(entry)
+            if entry.available is not None and not force:
+                # 重新探測期間沿用上一次的結果
+                return entry.available
+
+        self._wait_for_probe(entry, wait)
+        with entry.lock:
+            if entry.probing and (entry.available is None or force):
+                if time.monotonic() - entry.probe_started >= entry.probe_timeout:
+                    entry.error = f"探測逾時 ({entry.probe_timeout} 秒)"
+                return False
+            return bool(entry.available)
+
+    def get_active_backend(self, preferred: Optional[str] = None) -> SearchBackend:
+        """
+        取得目前應使用的後端
+
+        尚在探測中的後端先略過，使用目前可用的最優先後端；
+        只有明確指定的後端，或沒有任何後端完成探測時，才會等待探測 (最多到各自的期限)。
+
+        Args:
+            preferred: 指定優先使用的後端名稱，不可用時退回一般順序
+
+        Returns:
+            第一個可用的後端
+        """
+        candidates = self.names()
+        if preferred and preferred in candidates:
+            candidates.remove(preferred)
+            candidates.insert(0, preferred)
+
+        while True:
+            with self._probe_finished:
+                finished = self._finished_probes
+            for name in candidates:
+                if self.is_backend_available(name, wait=None if name == preferred else 0):
+                    return self.get_backend(name)
+
+            # 還沒有任何後端可用 (例如剛啟動)：等到下一個探測完成後重新選擇
+            deadline = self._pending_deadline()
+            if deadline is None:
+                break
+            with self._probe_finished:
+                if self._finished_probes == finished:
+                    self._probe_finished.wait(max(deadline - time.monotonic(), 0.0))
+
+        raise RuntimeError("沒有可用的搜尋後端")
+
+    def _pending_deadline(self) -> Optional[float]:
+        """尚未逾時的探測中最晚的期限，沒有時返回 None"""
+        now = time.monotonic()
+        deadlines = []
+        for name in self.names():
+            entry = self._get_entry(name)
+            with entry.lock:
+                if entry.probing and entry.probe_started + entry.probe_timeout > now:
+                    deadlines.append(entry.probe_started + entry.probe_timeout)
+        return max(deadlines, default=None)
+
+    def close(self):
+        """關閉所有已建立的後端"""
+        for name in self.names():
+            backend = self._get_entry(name).instance
+            if backend is not None:
+                try:
+                    backend.close()
+                except Exception as e:
+                    print(f"⚠ 關閉搜尋後端 {name} 時發生錯誤: {e}")
+
+    def describe(self) -> List[Dict]:
+        """取得所有後端的狀態摘要"""
+        summary = []
+        for name in self.names():
+            entry = self._get_entry(name)
+            backend = entry.instance
+            summary.append({
+                'name': name,
+                'display_name': backend.display_name if backend else name,
+                'priority': entry.priority,
+                'available': entry.available,
+                'error': entry.error,
+                'probing': entry.probing,
+                'probe_ms': entry.probe_ms,
+                'capabilities': backend.capabilities() if backend else None,
+                'status': backend.status() if backend else None,
+            })
+        return summary
+
+
+def register_default_backends(registry: SearchBackendRegistry, config: Optional[Dict] = None,
+                              data_dir: Optional[str] = None) -> SearchBackendRegistry:
+    """
+    依預設備援順序註冊內建後端
+    (Everything → Windows Search → 本機索引 → 簡化搜尋 → 示範模式)
+
+    本機索引建立期間回報不可用，此時由簡化搜尋的平行爬蟲直接遍歷目錄提供結果。
+
+    Args:
+        registry: 要註冊的註冊表
+        config: 應用程式配置 (config.yml 內容)
+        data_dir: 保存索引等資料檔的目錄 (與 config.yml 相同)
+    """
+    local_index_config = (config or {}).get('local_index', {})
+    simple_search_config = (config or {}).get('simple_search', {})
+    index_file = local_index_config.get('index_file')
+    index_path = os.path.join(data_dir or os.path.abspath("."), index_file) if index_file else None
+
+    def everything_factory():
+        from .everything_sdk import get_everything_sdk
+        return get_everything_sdk()
+
+    def windows_search_factory():
+        from .windows_search_api import get_windows_search_api
+        return get_windows_search_api()
+
+    def simple_search_factory():
+        from .simple_windows_search import get_simple_windows_search
+        return get_simple_windows_search(
+            use_powershell=bool(simple_search_config.get('use_powershell', False)),
+            shell_workers=int(simple_search_config.get('shell_workers', 2)))
+
+    def local_index_factory():
+        from .local_index import LocalIndexBackend
+        return LocalIndexBackend(
+            roots=local_index_config.get('roots'),
+            exclude=local_index_config.get('exclude'),
+            follow_symlinks=local_index_config.get('follow_symlinks', False),
+            index_path=index_path,
+            save_interval=local_index_config.get('save_interval', 600),
+            refresh_on_start=local_index_config.get('refresh_on_start', True),
+            watch=local_index_config.get('watch', True),
+            watch_mode=local_index_config.get('watch_mode', 'auto'),
+            poll_interval=local_index_config.get('poll_interval', 60),
+            trigram_index=local_index_config.get('trigram_index', True))
+
+    def demo_factory():
+        from .mock_everything import get_mock_everything_sdk
+        return get_mock_everything_sdk()
+
+    # 探測期限：Everything 只需載入 DLL 並以 IPC 詢問，Windows Search 需建立 COM 連線，
+    # 簡化搜尋在 Windows 上執行 sc query (本身有 5 秒逾時)
+    registry.register('everything', everything_factory, priority=10, probe_timeout=2.0)
+    registry.register('windows_search', windows_search_factory, priority=20, probe_timeout=5.0)
+    if local_index_config.get('enabled', True):
+        registry.register('local_index', local_index_factory, priority=30, probe_timeout=3.0)
+    registry.register('simple_search', simple_search_factory, priority=40, probe_timeout=6.0)
+    registry.register('demo', demo_factory, priority=100, probe_timeout=2.0)
+    return registry
+
+
+def get_search_backend_registry() -> SearchBackendRegistry:
+    """取得預設後端註冊表 (單例) - 使用函數屬性避免 global 語句"""
+    if not hasattr(get_search_backend_registry, "instance"):
+        get_search_backend_registry.instance = register_default_backends(
+            SearchBackendRegistry())
+    return get_search_backend_registry.instance
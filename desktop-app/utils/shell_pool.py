@@ -0,0 +1,269 @@
+"""
+常驻 shell 进程池
+每次查询都启动新的 powershell 进程仅启动就要数百毫秒。这里保留几个常驻的 shell 进程，
+脚本通过 stdin 发送，输出以逐行读取的方式流式返回；每个请求之后发送一条输出结束标记的命令，
+读到标记即表示该请求的输出已结束，进程可以继续处理下一个请求。
+
+进程池与具体的 shell 无关：命令行与结束标记命令都可以指定，
+因此在 Linux 上可以用 pwsh 或任何读取 stdin 的替身脚本测试。
+"""
+import json
+import queue
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, Sequence
+
+# PowerShell 从 stdin 逐行读取并执行命令
+POWERSHELL_COMMAND = ['powershell' if sys.platform == 'win32' else 'pwsh',
+                      '-NoLogo', '-NoProfile', '-NonInteractive', '-Command', '-']
+POWERSHELL_END_COMMAND = "Write-Output '{marker}'"
+# 输出使用 UTF-8，进度条与错误不写入 stdout
+POWERSHELL_INIT_SCRIPT = ("[Console]::OutputEncoding = [Text.Encoding]::UTF8; "
+                          "$ProgressPreference = 'SilentlyContinue'; $ErrorActionPreference = 'SilentlyContinue'")
+
+
+class ShellError(RuntimeError):
+    """shell 进程结束或请求超时"""
+
+
+class ShellWorker:
+    """
+    一个常驻的 shell 进程
+
+    stdout 由背景线程逐行读入队列，读取时可以设置期限；进程结束时队列收到 None。
+    """
+
+    def __init__(self, command: Sequence[str], end_command: str, encoding: str = 'utf-8'):
+        self.command = list(command)
+        self.end_command = end_command
+        creationflags = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        self._process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, encoding=encoding, errors='replace',
+            bufsize=1, creationflags=creationflags)
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._reader = threading.Thread(target=self._read_stdout, name='shell-reader', daemon=True)
+        self._reader.start()
+        self.requests = 0
+
+    def _read_stdout(self):
+        try:
+            for line in self._process.stdout:
+                self._lines.put(line.rstrip('\r\n'))
+        except (OSError, ValueError):
+            pass
+        self._lines.put(None)
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    def run(self, script: str, deadline: float) -> Iterator[str]:
+        """
+        执行脚本，逐行产生输出直到结束标记
+
+        script 不可包含换行 (PowerShell 以行为单位执行 stdin 中的命令)。
+        提前关闭生成器时会读完剩下的输出，让进程回到可以接受下一个请求的状态。
+        """
+        marker = f"__LEW_END_{uuid.uuid4().hex}__"
+        try:
+            self._process.stdin.write(f"{script}\n{self.end_command.format(marker=marker)}\n")
+            self._process.stdin.flush()
+        except (OSError, ValueError) as e:
+            raise ShellError(f"shell 进程已结束: {e}") from e
+        self.requests += 1
+
+        finished = False
+        try:
+            while True:
+                line = self._next_line(deadline)
+                if line == marker:
+                    finished = True
+                    return
+                yield line
+        finally:
+            if not finished:
+                self._drain(marker, deadline)
+
+    def _next_line(self, deadline: float) -> str:
+        try:
+            line = self._lines.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            raise ShellError("shell 请求超时") from None
+        if line is None:
+            raise ShellError("shell 进程已结束")
+        return line
+
+    def _drain(self, marker: str, deadline: float):
+        """丢弃剩下的输出直到结束标记；超时或进程结束时终止进程"""
+        try:
+            while self._next_line(deadline) != marker:
+                pass
+        except ShellError:
+            self.kill()
+
+    def kill(self):
+        if self._process.poll() is None:
+            self._process.kill()
+
+    def close(self):
+        if self._process.poll() is None:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+            try:
+                self._process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+
+class ShellPool:
+    """
+    常驻 shell 进程池
+
+    Args:
+        command: 启动 shell 的命令行 (需从 stdin 逐行读取命令)
+        end_command: 输出结束标记的命令模板，{marker} 会替换为标记字符串
+        size: 最多同时存在的进程数量
+        init_script: 每个进程启动后先执行一次的脚本 (例如设置输出编码)
+        timeout: 默认的请求期限 (秒)
+    """
+
+    def __init__(self, command: Sequence[str] = POWERSHELL_COMMAND,
+                 end_command: str = POWERSHELL_END_COMMAND, size: int = 2,
+                 init_script: Optional[str] = POWERSHELL_INIT_SCRIPT, timeout: float = 30):
+        self.command = list(command)
+        self.end_command = end_command
+        self.size = max(int(size), 1)
+        self.init_script = init_script
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[ShellWorker]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._workers: List[ShellWorker] = []
+        self._starting = 0
+        self._closed = False
+        self.started = 0
+        self.failures = 0
+
+    def _start_worker(self, deadline: float) -> ShellWorker:
+        worker = ShellWorker(self.command, self.end_command)
+        if self.init_script:
+            try:
+                for _ in worker.run(self.init_script, deadline):
+                    pass
+            except ShellError:
+                worker.close()
+                raise
+        return worker
+
+    def _acquire(self, deadline: float) -> ShellWorker:
+        """取得空闲的进程；没有时在未达上限前启动新进程，否则等待"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if self._closed:
+                        raise ShellError("shell 进程池已关闭")
+                    start = len(self._workers) + self._starting < self.size
+                    if start:
+                        self._starting += 1
+                if start:
+                    return self._add_worker(deadline)
+                try:
+                    worker = self._idle.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    raise ShellError("等待空闲 shell 进程超时") from None
+            if worker.alive:
+                return worker
+            self._discard(worker)
+
+    def _add_worker(self, deadline: float) -> ShellWorker:
+        try:
+            worker = self._start_worker(deadline)
+        except (OSError, ShellError):
+            with self._lock:
+                self._starting -= 1
+                self.failures += 1
+            raise
+        with self._lock:
+            self._starting -= 1
+            self._workers.append(worker)
+            self.started += 1
+        return worker
+
+    def _release(self, worker: ShellWorker):
+        if worker.alive and not self._closed:
+            self._idle.put(worker)
+        else:
+            self._discard(worker)
+
+    def _discard(self, worker: ShellWorker):
+        worker.close()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+    def run_lines(self, script: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """在空闲的进程中执行脚本，逐行产生输出 (关闭生成器后进程回到池中)"""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        worker = self._acquire(deadline)
+        healthy = False
+        try:
+            yield from worker.run(script, deadline)
+            healthy = True
+        except GeneratorExit:
+            # 提前关闭：worker.run() 已读完剩下的输出
+            healthy = True
+            raise
+        except ShellError:
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            if healthy:
+                self._release(worker)
+            else:
+                self._discard(worker)
+
+    def run_records(self, script: str, timeout: Optional[float] = None) -> Iterator[Dict]:
+        """
+        执行输出 JSON Lines (每行一个 ConvertTo-Json -Compress 对象) 的脚本，逐条产生解析后的记录
+
+        不是 JSON 对象的行 (例如其他命令的输出) 会被忽略。
+        """
+        for line in self.run_lines(script, timeout):
+            if not line.startswith('{'):
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+    def close(self):
+        """结束所有进程"""
+        with self._lock:
+            self._closed = True
+            workers, self._workers = self._workers, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for worker in workers:
+            worker.close()
+
+    def stats(self) -> Dict:
+        """进程池统计 (显示于 /status)"""
+        with self._lock:
+            return {
+                'workers': len(self._workers),
+                'idle': self._idle.qsize(),
+                'size': self.size,
+                'started': self.started,
+                'failures': self.failures,
+            }
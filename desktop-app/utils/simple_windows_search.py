@@ -1,25 +1,115 @@
 """
 Windows Search API 的简化版本
 当无法使用 pywin32 时的备用实现
-使用 Windows 内置的搜索工具和 Python 的 subprocess
+使用 ParallelCrawler 以多线程 os.scandir 直接遍历常见目录 (Linux 上同样可用)，
+旧的 PowerShell Get-ChildItem 方式保留为可选实现 (在常驻的 PowerShell 进程中执行，结果以 JSON Lines 返回)
 """
+import base64
+import fnmatch
 import os
+import re
 import subprocess
-from typing import List, Tuple
-from everything_sdk import EverythingSearchResult
-
-
-class SimpleWindowsSearch:
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+try:
+    from .parallel_crawler import ParallelCrawler, normalize_roots
+    from .result_batch import ResultBatch, TIME_BASE_FILETIME, ns_to_filetime, required_columns
+    from .search_backend import SearchBackend, is_substring_refinement
+    from .shell_pool import POWERSHELL_COMMAND, ShellPool
+except ImportError:
+    from parallel_crawler import ParallelCrawler, normalize_roots
+    from result_batch import ResultBatch, TIME_BASE_FILETIME, ns_to_filetime, required_columns
+    from search_backend import SearchBackend, is_substring_refinement
+    from shell_pool import POWERSHELL_COMMAND, ShellPool
+
+# 串流输出时，结果未满一个批次也至少每隔这么多秒送出一次
+_STREAM_FLUSH_INTERVAL = 0.5
+# 保存分页顺序的查询数量与秒数 (每次翻页重新计时)
+_PAGE_ORDER_QUERIES = 16
+_PAGE_ORDER_TTL = 300
+
+# PowerShell 每个匹配项输出一行 JSON：p 路径、d 是否为文件夹、s 大小、c/m 创建与修改时间 (FILETIME)
+_POWERSHELL_RECORD = (
+    "ForEach-Object { [pscustomobject]@{ p = $_.FullName; d = [bool]$_.PSIsContainer; "
+    "s = $(if ($_.PSIsContainer) { 0 } else { $_.Length }); "
+    "c = $_.CreationTimeUtc.ToFileTimeUtc(); m = $_.LastWriteTimeUtc.ToFileTimeUtc() } "
+    "| ConvertTo-Json -Compress }")
+
+
+def _name_matcher(query: str):
+    """文件名包含查询字符串 (支持 * 与 ? 通配符，不区分大小写) 的判断函数"""
+    pattern = re.compile(fnmatch.translate(f"*{query.lower()}*"), re.DOTALL)
+
+    def match(entry: os.DirEntry) -> bool:
+        return pattern.match(entry.name.lower()) is not None
+    return match
+
+
+def _entry_path(entry: os.DirEntry) -> str:
+    return entry.path
+
+
+def _powershell_string(value: str) -> str:
+    """把字符串编码为 PowerShell 表达式 (Base64 传递，不受引号与控制台编码影响)"""
+    encoded = base64.b64encode(value.encode('utf-8')).decode('ascii')
+    return f"[Text.Encoding]::UTF8.GetString([Convert]::FromBase64String('{encoded}'))"
+
+
+def _powershell_match_script(roots: Sequence[str], query: str) -> str:
+    """遍历所有根目录并筛选文件名 (与 -like '*query*' 相同，支持 * 与 ? 通配符) 的管道开头"""
+    paths = ', '.join(_powershell_string(root) for root in roots)
+    return (f"$q = {_powershell_string(query)}; "
+            f"Get-ChildItem -LiteralPath @({paths}) -Recurse -Force -ErrorAction SilentlyContinue "
+            f"| Where-Object {{ $_.Name -like \"*$q*\" }}")
+
+
+class SimpleWindowsSearch(SearchBackend):
     """简化的 Windows 搜索实现"""
 
-    def __init__(self):
+    name = "simple_search"
+    display_name = "Simple Search"
+    # 每次搜索使用独立的爬取状态，可安全并发
+    is_thread_safe = True
+    # 平行遍历找到匹配的顺序每次不同，分页由 run_search 取到页尾后切片 (search() 保存每个查询的顺序，前缀固定)
+    supports_offset = False
+    # 遍历一个目录就能产生结果，事件串流不必等整个遍历完成
+    streams_progressively = True
+
+    def __init__(self, search_paths: Optional[List[str]] = None, use_powershell: bool = False,
+                 timeout: float = 30, max_workers: Optional[int] = None,
+                 shell_command: Optional[Sequence[str]] = None, shell_workers: int = 2):
         self._available = None
+        self.use_powershell = use_powershell
+        # PowerShell 实现使用的常驻进程池 (第一次使用时建立)
+        self.shell_command = list(shell_command or POWERSHELL_COMMAND)
+        self.shell_workers = shell_workers
+        self._shell_pool: Optional[ShellPool] = None
+        self._shell_lock = threading.Lock()
+        self.timeout = timeout
+        # 搜索用户目录、桌面、文档等常见位置；重叠的目录只遍历一次
+        self.search_paths = normalize_roots(search_paths or [
+            os.path.expanduser("~"),
+            os.path.join(os.path.expanduser("~"), "Desktop"),
+            os.path.join(os.path.expanduser("~"), "Documents"),
+            os.path.join(os.path.expanduser("~"), "Downloads"),
+        ])
+        self._crawler = ParallelCrawler(max_workers=max_workers)
+        # 查询 -> (过期时间, 已返回过的匹配顺序, 是否包含全部匹配)
+        self._page_orders: "OrderedDict[str, Tuple[float, List[os.DirEntry], bool]]" = OrderedDict()
+        self._page_orders_lock = threading.Lock()
 
     def _is_available(self) -> bool:
-        """检查 Windows Search 是否可用"""
+        """检查 Windows Search 是否可用 (非 Windows 平台直接使用爬虫，总是可用)"""
         if self._available is not None:
             return self._available
 
+        if sys.platform != 'win32':
+            self._available = True
+            return self._available
+
         try:
             # 测试 Windows Search 服务是否运行
             result = subprocess.run(['sc', 'query', 'WSearch'],
@@ -30,144 +120,296 @@ class SimpleWindowsSearch:
             self._available = False
             return False
 
-    def search(self, query: str, max_results: int = 100) -> Tuple[List[EverythingSearchResult], int]:
-        """
-        使用 Windows 内置命令行工具进行搜索
+    def search(self, query: str, max_results: int = 100,
+               fields: Optional[Tuple[str, ...]] = None,
+               cancel_event: Optional[threading.Event] = None,
+               offset: int = 0) -> Tuple[ResultBatch, int]:
         """
-        if not self._is_available():
-            print("Windows Search 服务不可用")
-            return [], 0
-
-        results = []
+        并行遍历常见目录，返回文件名包含查询字符串的项目
 
-        try:
-            # 使用 PowerShell 进行搜索
-            # 搜索用户目录、桌面、文档等常见位置
-            search_paths = [
-                os.path.expanduser("~"),
-                os.path.join(os.path.expanduser("~"), "Desktop"),
-                os.path.join(os.path.expanduser("~"), "Documents"),
-                os.path.join(os.path.expanduser("~"), "Downloads"),
-            ]
-
-            # 为了安全，限制搜索深度
-            for search_path in search_paths:
-                if not os.path.exists(search_path):
-                    continue
-
-                try:
-                    # 使用 PowerShell Get-ChildItem 进行搜索
-                    ps_command = f"""
-Get-ChildItem -Path '{search_path}' -Recurse -Force -ErrorAction SilentlyContinue | 
-Where-Object {{$_.Name -like '*{query}*'}} | 
-Select-Object -First {max_results} FullName, Name, DirectoryName, Length, LastWriteTime, CreationTime, Attributes
-"""
+        第一次查询找到 offset + max_results + 1 个匹配即停止遍历；要求更多结果时才遍历全部匹配，
+        接在已返回的匹配之后按路径排序。每个查询的匹配顺序会保存一段时间，取不同长度的结果时前缀相同，
+        翻页不会重复或遗漏；只有返回的项目调用 stat。
 
-                    result = subprocess.run(
-                        ['powershell', '-Command', ps_command],
-                        capture_output=True, text=True, timeout=30
-                    )
+        Args:
+            query: 搜索查询字符串 (支持 * 与 ? 通配符，与 PowerShell -like 相同)
+            max_results: 最大结果数量
+            fields: 需要的结果字段，未要求大小与日期时不调用 stat
+            cancel_event: 设置后中止遍历
+            offset: 跳过的结果数
 
-                    if result.returncode == 0 and result.stdout.strip():
-                        results.extend(
-                            self._parse_powershell_output(result.stdout))
+        Returns:
+            (results, total_count): 提前停止时 total_count 为下限 (多找的一个只用来判断是否还有下一页)
 
-                except (subprocess.TimeoutExpired, Exception) as e:
-                    print(f"搜索路径 {search_path} 时出错: {e}")
-                    continue
-
-                # 如果已经找到足够的结果，停止搜索
-                if len(results) >= max_results:
-                    break
-
-            # 限制结果数量
-            results = results[:max_results]
-
-        except Exception as e:
-            print(f"Windows 搜索失败: {e}")
-
-        return results, len(results)
-
-    def _parse_powershell_output(self, output: str) -> List[EverythingSearchResult]:
-        """解析 PowerShell 输出"""
-        results = []
-        lines = output.strip().split('\n')
-
-        current_item = {}
+        Raises:
+            CrawlInterrupted: 遍历超时或被中止 (不返回不完整的结果)
+        """
+        if not self._is_available():
+            print("Windows Search 服务不可用")
+            return ResultBatch(), 0
 
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        if self.use_powershell:
+            return self._search_powershell(query, max_results, offset)
 
-            # 解析 PowerShell 对象输出
-            if line.startswith('FullName'):
-                if current_item:
-                    result = self._create_result_from_item(current_item)
-                    if result:
-                        results.append(result)
-                current_item = {'FullName': line.split(':', 1)[1].strip()}
-            elif ':' in line and current_item:
-                key, value = line.split(':', 1)
-                current_item[key.strip()] = value.strip()
+        return self._search_crawl(query, max_results, fields, cancel_event, offset)
 
-        # 处理最后一个项目
-        if current_item:
-            result = self._create_result_from_item(current_item)
-            if result:
-                results.append(result)
+    def search_many(self, queries: Sequence[str], max_results: int = 1,
+                    fields: Optional[Tuple[str, ...]] = None) -> List:
+        """
+        批量查询 (页面字词查找) 不分页，找到 max_results + 1 个匹配即停止遍历
 
-        return results
+        返回的项目是最先找到的匹配，total_count 为下限 (多找的一个只用来判断是否还有更多)。
+        """
+        if not self._is_available():
+            return [(ResultBatch(), 0) for _ in queries]
+        outcomes = []
+        for query in queries:
+            try:
+                if self.use_powershell:
+                    outcomes.append(self._search_powershell(query, max_results))
+                else:
+                    outcomes.append(self._search_crawl(query, max_results, fields,
+                                                       early_stop=True))
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+    def _search_crawl(self, query: str, max_results: int, fields: Optional[Tuple[str, ...]],
+                      cancel_event: Optional[threading.Event] = None, offset: int = 0,
+                      early_stop: bool = False) -> Tuple[ResultBatch, int]:
+        """以并行爬虫搜索；early_stop 时找到 offset + max_results + 1 个匹配即停止 (顺序不固定，不保存)"""
+        columns = required_columns(fields)
+        need_stat = columns is None or bool(
+            columns & {'size', 'date_created', 'date_modified'})
+        limit = offset + max_results
+        if early_stop:
+            entries = self._crawler.crawl(self.search_paths, _name_matcher(query),
+                                          max_results=limit + 1, cancel_event=cancel_event,
+                                          timeout=self.timeout)
+            found = len(entries)
+        else:
+            entries, found = self._ordered_matches(query, limit, cancel_event)
+
+        results = ResultBatch(TIME_BASE_FILETIME, path_separator=os.sep)
+        for entry in entries[offset:limit]:
+            self._append_entry(results, entry, need_stat)
+        return results, found
+
+    def _ordered_matches(self, query: str, limit: int,
+                         cancel_event: Optional[threading.Event] = None) -> Tuple[List[os.DirEntry], int]:
+        """
+        按固定顺序返回至少前 limit 个匹配 (不足 limit 个时为全部匹配) 与匹配数
 
-    def _create_result_from_item(self, item: dict) -> EverythingSearchResult:
-        """从解析的项目创建搜索结果"""
+        没有保存的顺序时只找 limit + 1 个；已保存的匹配不够时遍历全部，
+        已返回过的匹配保持原顺序，其余按路径排序接在后面。
+        """
+        key = query.lower()
+        now = time.monotonic()
+        with self._page_orders_lock:
+            saved = self._page_orders.get(key)
+            if saved is not None and saved[0] <= now:
+                del self._page_orders[key]
+                saved = None
+            if saved is not None:
+                _, ordered, complete = saved
+                if complete or len(ordered) > limit:
+                    self._page_orders[key] = (now + _PAGE_ORDER_TTL, ordered, complete)
+                    self._page_orders.move_to_end(key)
+                    return ordered, len(ordered)
+
+        match = _name_matcher(query)
+        if saved is None:
+            # 第一页：找到 limit + 1 个即停止，找不到这么多时就是全部匹配
+            entries = self._crawler.crawl(self.search_paths, match, max_results=limit + 1,
+                                          cancel_event=cancel_event, timeout=self.timeout)
+            ordered = sorted(entries, key=_entry_path)
+            complete = len(ordered) <= limit
+        else:
+            entries = self._crawler.crawl(self.search_paths, match, cancel_event=cancel_event,
+                                          timeout=self.timeout)
+            ordered = saved[1]
+            returned = {entry.path for entry in ordered}
+            ordered = ordered + sorted((entry for entry in entries if entry.path not in returned),
+                                       key=_entry_path)
+            complete = True
+
+        with self._page_orders_lock:
+            self._page_orders[key] = (time.monotonic() + _PAGE_ORDER_TTL, ordered, complete)
+            self._page_orders.move_to_end(key)
+            while len(self._page_orders) > _PAGE_ORDER_QUERIES:
+                self._page_orders.popitem(last=False)
+        return ordered, len(ordered)
+
+    def count(self, query: str) -> int:
+        """遍历全部目录计数 (不调用 stat，也不建立结果)；成本与完整遍历相同，超时时引发 CrawlInterrupted"""
+        if not self._is_available():
+            return 0
+        if self.use_powershell:
+            return self._count_powershell(query)
+        match = _name_matcher(query)
+        return sum(len(entries) for entries in
+                   self._crawler.iter_crawl(self.search_paths, match, timeout=self.timeout))
+
+    def iter_search_batches(self, query: str, batch_size: int = 1000,
+                            fields: Optional[Tuple[str, ...]] = None,
+                            max_results: Optional[int] = None) -> Iterator[ResultBatch]:
+        """
+        边遍历边产生结果：第一个匹配立即送出，之后累积到 batch_size 个匹配或每 0.5 秒送出一个批次，
+        不必等整个遍历完成；关闭生成器会停止遍历，遍历超时时在已送出的批次之后引发 CrawlInterrupted
+        """
+        if not self._is_available():
+            print("Windows Search 服务不可用")
+            return
+        if self.use_powershell:
+            yield from self._iter_powershell_batches(query, batch_size, max_results)
+            return
+
+        match = _name_matcher(query)
+        columns = required_columns(fields)
+        need_stat = columns is None or bool(
+            columns & {'size', 'date_created', 'date_modified'})
+        batch = ResultBatch(TIME_BASE_FILETIME, path_separator=os.sep)
+        flushed_at = time.monotonic()
+        # 第一个批次不等待
+        interval = 0.0
+        for entries in self._crawler.iter_crawl(self.search_paths, match, max_results=max_results,
+                                                timeout=self.timeout,
+                                                poll_interval=_STREAM_FLUSH_INTERVAL):
+            for entry in entries:
+                self._append_entry(batch, entry, need_stat)
+            if len(batch) and (len(batch) >= batch_size
+                               or time.monotonic() - flushed_at >= interval):
+                yield batch
+                batch = ResultBatch(TIME_BASE_FILETIME, path_separator=os.sep)
+                flushed_at = time.monotonic()
+                interval = _STREAM_FLUSH_INTERVAL
+        if len(batch):
+            yield batch
+
+    def _append_entry(self, results: ResultBatch, entry: os.DirEntry, need_stat: bool = True):
+        """将 os.DirEntry 加入搜索结果 (时间以 FILETIME 保存，序列化时才转换)"""
         try:
-            result = EverythingSearchResult()
-
-            full_path = item.get('FullName', '')
-            if not full_path:
-                return None
+            is_folder = entry.is_dir(follow_symlinks=False)
+            if not need_stat:
+                results.append(entry.name, os.path.dirname(entry.path), is_folder=is_folder)
+                return
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            return
+        created_ns = getattr(st, 'st_birthtime_ns', None) or st.st_ctime_ns
+        results.append(entry.name, os.path.dirname(entry.path), 0 if is_folder else st.st_size,
+                       ns_to_filetime(created_ns), ns_to_filetime(st.st_mtime_ns), 0, is_folder)
+
+    def _shells(self) -> ShellPool:
+        with self._shell_lock:
+            if self._shell_pool is None:
+                self._shell_pool = ShellPool(self.shell_command, size=self.shell_workers,
+                                             timeout=self.timeout)
+            return self._shell_pool
+
+    def _powershell_records(self, query: str, limit: Optional[int] = None) -> Iterator[Dict]:
+        """在常驻的 PowerShell 进程中执行 Get-ChildItem，逐条产生匹配项的记录"""
+        roots = [path for path in self.search_paths if os.path.exists(path)]
+        if not roots:
+            return
+        script = _powershell_match_script(roots, query)
+        if limit is not None:
+            script += f" | Select-Object -First {int(limit)}"
+        yield from self._shells().run_records(f"{script} | {_POWERSHELL_RECORD}")
+
+    @staticmethod
+    def _append_record(results: ResultBatch, record: Dict):
+        """将 PowerShell 输出的记录加入搜索结果"""
+        try:
+            path, filename = os.path.split(record.get('p') or '')
+            is_folder = bool(record.get('d'))
+            results.append(filename, path, 0 if is_folder else int(record.get('s') or 0),
+                           int(record.get('c') or 0), int(record.get('m') or 0), 0, is_folder)
+        except (ValueError, TypeError):
+            pass
+
+    def _search_powershell(self, query: str, max_results: int,
+                           offset: int = 0) -> Tuple[ResultBatch, int]:
+        """
+        使用 PowerShell Get-ChildItem 搜索 (取前 offset + max_results + 1 个，跳过前 offset 个)
 
-            result.full_path = full_path
-            result.filename = os.path.basename(full_path)
-            result.path = os.path.dirname(full_path)
+        Get-ChildItem -Recurse 的顺序是固定的，翻页时前缀相同；total_count 为下限
+        (最多 offset + max_results + 1，多找的一个只用来判断是否还有下一页)。
+        """
+        results = ResultBatch(TIME_BASE_FILETIME, path_separator=os.sep)
+        found = 0
+        # PowerShell 进程结束或超时 (ShellError) 时直接引发，不返回不完整的结果
+        for record in self._powershell_records(query, offset + max_results + 1):
+            if offset <= found < offset + max_results:
+                self._append_record(results, record)
+            found += 1
+        return results, found
+
+    def _iter_powershell_batches(self, query: str, batch_size: int,
+                                 max_results: Optional[int]) -> Iterator[ResultBatch]:
+        """边读取 PowerShell 的输出边产生批次 (第一个匹配立即送出)"""
+        batch = ResultBatch(TIME_BASE_FILETIME, path_separator=os.sep)
+        flushed_at = time.monotonic()
+        interval = 0.0
+        for record in self._powershell_records(query, max_results):
+            self._append_record(batch, record)
+            if len(batch) >= batch_size or time.monotonic() - flushed_at >= interval:
+                yield batch
+                batch = ResultBatch(TIME_BASE_FILETIME, path_separator=os.sep)
+                flushed_at = time.monotonic()
+                interval = _STREAM_FLUSH_INTERVAL
+        if len(batch):
+            yield batch
+
+    def _count_powershell(self, query: str) -> int:
+        """以 Measure-Object 在 PowerShell 中计数，只返回一行"""
+        roots = [path for path in self.search_paths if os.path.exists(path)]
+        if not roots:
+            return 0
+        script = (f"{_powershell_match_script(roots, query)} | Measure-Object "
+                  f"| ForEach-Object {{ @{{ n = $_.Count }} | ConvertTo-Json -Compress }}")
+        for record in self._shells().run_records(script):
+            return int(record.get('n') or 0)
+        return 0
 
-            # 获取扩展名
-            _, ext = os.path.splitext(result.filename)
-            result.extension = ext.lstrip('.') if ext else ""
+    def is_windows_search_available(self) -> bool:
+        """检查 Windows Search 是否可用"""
+        return self._is_available()
 
-            # 检查是否为文件夹
-            attributes = item.get('Attributes', '')
-            result.is_folder = 'Directory' in attributes
-            result.is_file = not result.is_folder
+    def is_refinement(self, previous: str, query: str) -> bool:
+        """以整个查询字符串匹配文件名，新查询包含旧查询时结果必定是子集"""
+        return is_substring_refinement(previous, query)
 
-            # 获取文件大小
-            if result.is_file:
-                try:
-                    length = item.get('Length', '0')
-                    result.size = int(length) if length.isdigit() else 0
-                except (ValueError, TypeError):
-                    result.size = 0
+    def matches_result(self, result, query: str) -> bool:
+        """与 search() 相同：文件名包含整个查询字符串 (不区分大小写)"""
+        return ' '.join(query.lower().split()) in result.filename.lower()
 
-            return result
+    def is_available(self) -> bool:
+        """检查后端是否可用"""
+        return self._is_available()
 
-        except Exception:
-            return None
+    def status(self) -> Dict:
+        if self._shell_pool is None:
+            return {}
+        return {'shell_pool': self._shell_pool.stats()}
 
-    def is_windows_search_available(self) -> bool:
-        """检查 Windows Search 是否可用"""
-        return self._is_available()
+    def close(self):
+        """关闭爬虫线程池与 PowerShell 进程"""
+        self._crawler.shutdown()
+        if self._shell_pool is not None:
+            self._shell_pool.close()
 
 
 # 创建全局实例
 _simple_windows_search = None
 
 
-def get_simple_windows_search():
-    """获取简化的 Windows Search 实例"""
+def get_simple_windows_search(use_powershell: bool = False, shell_workers: int = 2):
+    """获取简化的 Windows Search 实例 (参数只在第一次建立时使用)"""
     global _simple_windows_search
     if _simple_windows_search is None:
-        _simple_windows_search = SimpleWindowsSearch()
+        _simple_windows_search = SimpleWindowsSearch(use_powershell=use_powershell,
+                                                     shell_workers=shell_workers)
     return _simple_windows_search
 
 
@@ -0,0 +1,87 @@
+"""
+啟動時間軸
+記錄啟動各階段 (匯入、配置、日誌、Flask 應用程式、探測搜尋引擎、開始監聽、第一個請求) 的耗時，
+以 --startup-profile 參數輸出到主控台，並顯示於 /status 的 startup 欄位，方便發現啟動變慢的回歸。
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class StartupTimeline:
+    """
+    啟動階段計時
+
+    依序執行的階段以 mark() 記錄 (從上一個階段結束到現在)；
+    與其他階段並行的階段 (例如背景探測) 以 record() 指定開始與結束時間。
+    所有時間都相對於建立時間軸的時刻 (應用程式模組開始載入時)。
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self._last = self.origin
+        self._phases: List[Dict] = []
+        self._events: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _ms(self, moment: float) -> float:
+        return round((moment - self.origin) * 1000, 1)
+
+    def now(self) -> float:
+        return time.perf_counter()
+
+    def mark(self, name: str, **details):
+        """記錄從上一個依序階段結束到現在的階段"""
+        end = time.perf_counter()
+        with self._lock:
+            start, self._last = self._last, end
+        self.record(name, start, end, **details)
+
+    def record(self, name: str, start: float, end: Optional[float] = None, **details):
+        """記錄指定開始與結束時間的階段 (可與其他階段重疊)"""
+        end = time.perf_counter() if end is None else end
+        phase = {
+            'name': name,
+            'start_ms': self._ms(start),
+            'duration_ms': round((end - start) * 1000, 1),
+        }
+        phase.update(details)
+        with self._lock:
+            self._phases.append(phase)
+
+    def event(self, name: str) -> bool:
+        """記錄一次性的時間點 (例如第一個請求完成)，已記錄過時返回 False"""
+        with self._lock:
+            if name in self._events:
+                return False
+            self._events[name] = time.perf_counter()
+            return True
+
+    def has_event(self, name: str) -> bool:
+        with self._lock:
+            return name in self._events
+
+    def has_phase(self, name: str) -> bool:
+        with self._lock:
+            return any(phase['name'] == name for phase in self._phases)
+
+    def snapshot(self) -> Dict:
+        """時間軸內容 (顯示於 /status)"""
+        with self._lock:
+            phases = [dict(phase) for phase in self._phases]
+            events = {name: self._ms(moment) for name, moment in self._events.items()}
+        return {
+            'phases': phases,
+            'events_ms': events,
+            'uptime_ms': self._ms(time.perf_counter()),
+        }
+
+    def format(self) -> str:
+        """以文字表格輸出時間軸"""
+        snapshot = self.snapshot()
+        lines = ["⏱ 啟動時間軸 (ms)", f"  {'階段':<16}{'開始':>10}{'耗時':>10}"]
+        for phase in snapshot['phases']:
+            lines.append(f"  {phase['name']:<18}{phase['start_ms']:>10.1f}{phase['duration_ms']:>10.1f}")
+        for name, moment in snapshot['events_ms'].items():
+            lines.append(f"  {name:<18}{moment:>10.1f}")
+        return '\n'.join(lines)
@@ -0,0 +1,154 @@
+"""
+三字元組 (trigram) 子字串索引
+每個小寫名稱的每個 3 位元組片段對應一份排序後的項目編號清單 (posting list)。
+清單以「首項 + 差值陣列」壓縮保存，差值陣列依最大差值選用 1 / 2 / 4 位元組寬度，
+解碼時以 itertools.accumulate 在 C 層完成，不需要 Python 迴圈。
+
+子字串查詢先交集最少的幾份清單取得候選，再只驗證候選項目；
+少於 3 個字元或不夠有選擇性的查詢退回在預先建立的小寫名稱串 (blob) 上以 bytes.find 掃描。
+"""
+import struct
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from operator import sub
+from typing import Dict, Iterable, List, Optional
+
+TRIGRAM_SIZE = 3
+
+# 清單標頭: 差值寬度的 array typecode, 首項
+_POSTING_HEADER = struct.Struct('<cI')
+_WIDTHS = (('B', 0xFF), ('H', 0xFFFF), ('I', 0xFFFFFFFF))
+
+# 最少的清單超過總數的這個比例時，逐一驗證候選比直接掃描名稱串慢
+_MAX_SELECTIVITY = 1 / 64
+# 候選數量低於此值，或下一份清單比候選多出此倍數時，不再交集而直接驗證
+_MIN_CANDIDATES_TO_INTERSECT = 64
+_MAX_INTERSECT_RATIO = 8
+
+
+def encode_postings(ids: array) -> bytes:
+    """將遞增的項目編號壓縮為 bytes (首項 + 固定寬度差值)"""
+    first = ids[0]
+    deltas = list(map(sub, ids[1:], ids))
+    largest = max(deltas) if deltas else 0
+    for typecode, limit in _WIDTHS:
+        if largest <= limit:
+            break
+    return _POSTING_HEADER.pack(typecode.encode('ascii'), first) + array(typecode, deltas).tobytes()
+
+
+def decode_postings(data: bytes) -> List[int]:
+    """解壓縮 encode_postings 的結果"""
+    typecode, first = _POSTING_HEADER.unpack_from(data)
+    deltas = array(typecode.decode('ascii'))
+    deltas.frombytes(data[_POSTING_HEADER.size:])
+    return list(accumulate(deltas, initial=first))
+
+
+def posting_count(data: bytes) -> int:
+    """不解壓縮即可取得清單長度"""
+    itemsize = array(data[:1].decode('ascii')).itemsize
+    return 1 + (len(data) - _POSTING_HEADER.size) // itemsize
+
+
+class TrigramIndex:
+    """小寫名稱的 trigram 倒排索引
+
+    Args:
+        postings: trigram → 壓縮後的項目編號清單
+        doc_count: 建立索引時的項目總數
+    """
+
+    def __init__(self, postings: Dict[bytes, bytes], doc_count: int):
+        self.postings = postings
+        self.doc_count = doc_count
+        self.nbytes = sum(len(data) for data in postings.values())
+
+    @classmethod
+    def build(cls, docs: Iterable[bytes]) -> 'TrigramIndex':
+        """由小寫名稱 (依項目編號順序) 建立索引"""
+        lists: Dict[bytes, array] = {}
+        doc_count = 0
+        for doc_id, doc in enumerate(docs):
+            doc_count += 1
+            if len(doc) < TRIGRAM_SIZE:
+                continue
+            for trigram in {doc[i:i + TRIGRAM_SIZE] for i in range(len(doc) - TRIGRAM_SIZE + 1)}:
+                ids = lists.get(trigram)
+                if ids is None:
+                    ids = lists[trigram] = array('I')
+                ids.append(doc_id)
+        return cls({trigram: encode_postings(ids) for trigram, ids in lists.items()}, doc_count)
+
+    def candidates(self, literal: bytes) -> Optional[List[int]]:
+        """
+        取得可能包含 literal 的項目編號 (遞增排序，仍需驗證)
+
+        Returns:
+            候選清單；literal 太短或查詢不夠有選擇性時返回 None，呼叫端應改為掃描
+        """
+        if len(literal) < TRIGRAM_SIZE:
+            return None
+        trigrams = {literal[i:i + TRIGRAM_SIZE] for i in range(len(literal) - TRIGRAM_SIZE + 1)}
+        lists = []
+        for trigram in trigrams:
+            data = self.postings.get(trigram)
+            if data is None:
+                return []
+            lists.append((posting_count(data), data))
+        lists.sort(key=lambda item: item[0])
+
+        if lists[0][0] > self.doc_count * _MAX_SELECTIVITY:
+            return None
+
+        candidates = decode_postings(lists[0][1])
+        for count, data in lists[1:]:
+            if (len(candidates) < _MIN_CANDIDATES_TO_INTERSECT
+                    or count > len(candidates) * _MAX_INTERSECT_RATIO):
+                break
+            candidates = sorted(set(candidates).intersection(decode_postings(data)))
+        return candidates
+
+
+class SubstringIndex:
+    """一組小寫文件的子字串搜尋：trigram 候選 + 驗證，短查詢掃描名稱串
+
+    文件以 NUL 分隔串接成一個 blob (前後各一個 NUL)，掃描命中後以 bisect 換算回文件編號。
+    """
+
+    def __init__(self, docs: List[bytes]):
+        self.docs = docs
+        self.offsets = array('Q')
+        position = 1
+        for doc in docs:
+            self.offsets.append(position)
+            position += len(doc) + 1
+        self.offsets.append(position)
+        self.blob = b'\0' + b'\0'.join(docs) + b'\0'
+        self.trigrams = TrigramIndex.build(docs)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def find(self, needle: bytes) -> List[int]:
+        """依文件編號順序返回包含 needle 的文件"""
+        if not needle:
+            return list(range(len(self.docs)))
+        candidates = self.trigrams.candidates(needle)
+        if candidates is not None:
+            docs = self.docs
+            return [doc_id for doc_id in candidates if needle in docs[doc_id]]
+        return self.scan(needle)
+
+    def scan(self, needle: bytes) -> List[int]:
+        """在名稱串上以 bytes.find 掃描"""
+        blob = self.blob
+        offsets = self.offsets
+        matches = []
+        position = blob.find(needle)
+        while position >= 0:
+            doc_id = bisect_right(offsets, position) - 1
+            matches.append(doc_id)
+            position = blob.find(needle, offsets[doc_id + 1])
+        return matches
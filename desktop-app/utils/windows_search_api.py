@@ -2,9 +2,17 @@
 Windows Search API Python wrapper
 作为 Everything SDK 的备用搜索引擎
 使用 Windows Search Service (WDS) 进行文件搜索
+
+ADO 连接由 ado_pool 按线程保留并重复使用，结果以 GetRows 批量读取为列数组后一次加入 ResultBatch。
+传入 provider (例如 fake_ado.FakeADOProvider) 可在没有 Windows Search 的环境中执行相同的代码路径。
 """
-import os
-from typing import List, Tuple
+import logging
+import ntpath
+import threading
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple
 
 try:
     import pythoncom
@@ -14,22 +22,168 @@ except ImportError:
     WIN32_AVAILABLE = False
     print("⚠ pywin32 模块未安装，Windows Search API 不可用")
 
-from everything_sdk import EverythingSearchResult
+try:
+    from .ado_pool import ADOConnectionPool, fetch_rows
+    from .result_cache import SearchResultCache, normalize_query
+    from .result_batch import ResultBatch, TIME_BASE_FILETIME, datetime_to_filetime, required_columns
+    from .search_backend import SearchBackend, is_substring_refinement
+except ImportError:
+    from ado_pool import ADOConnectionPool, fetch_rows
+    from result_cache import SearchResultCache, normalize_query
+    from result_batch import ResultBatch, TIME_BASE_FILETIME, datetime_to_filetime, required_columns
+    from search_backend import SearchBackend, is_substring_refinement
+
+
+logger = logging.getLogger('LinkEveryWord')
+
+PATH_PROPERTY = 'System.ItemPathDisplay'
+
+# 结果字段对应的 Windows Search 属性
+SELECT_COLUMNS = (
+    ('size', ('System.Size',)),
+    ('date_modified', ('System.DateModified',)),
+    ('date_created', ('System.DateCreated',)),
+    # 没有 System.Kind 的项目以文件属性的目录位判断
+    ('is_folder', ('System.Kind', 'System.FileAttributes')),
+)
+
+FILE_ATTRIBUTE_DIRECTORY = 0x10
+
+# Windows Search 返回的总是 Windows 路径
+_PATH_SEPARATOR = '\\'
+
+# 串流输出时第一个批次的行数 (之后按 batch_size)
+_FIRST_BATCH_SIZE = 20
 
+# 计数与跳过行时每次 GetRows 读取的行数
+_COUNT_CHUNK = 5000
 
-class WindowsSearchAPI:
-    """Windows Search API 的 Python 包装类"""
+# 页面查询完成后等待计数查询的秒数；超过时先返回估计值 (多取一行)，计数完成后缓存供之后的页面使用
+COUNT_WAIT = 1.0
+# 查询总数的缓存秒数
+COUNT_CACHE_TTL = 30.0
+# 计数查询最多读取的行数 (SELECT TOP)；超过时总数为下限 COUNT_LIMIT + 1
+COUNT_LIMIT = 10000
+# 执行计数查询的线程数 (每个线程有自己的 ADO 连接) 与同时进行中的计数上限
+_COUNT_WORKERS = 2
+_MAX_PENDING_COUNTS = 8
 
-    def __init__(self):
+
+def _select_properties(columns: Optional[FrozenSet[str]]) -> List[str]:
+    """需要 SELECT 的属性 (路径总是需要，用于文件名与目录)"""
+    properties = [PATH_PROPERTY]
+    for column, property_names in SELECT_COLUMNS:
+        if columns is None or column in columns:
+            properties.extend(property_names)
+    return properties
+
+
+def _safe_int(value) -> int:
+    try:
+        return int(value) if value else 0
+    except (ValueError, TypeError):
+        return 0
+
+
+def _int_column(values: Sequence) -> List[int]:
+    try:
+        return [int(value) if value else 0 for value in values]
+    except (ValueError, TypeError):
+        return [_safe_int(value) for value in values]
+
+
+def _safe_filetime(value) -> int:
+    try:
+        return datetime_to_filetime(value)
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        return 0
+
+
+def _filetime_column(values: Sequence) -> List[int]:
+    try:
+        return [datetime_to_filetime(value) for value in values]
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        return [_safe_filetime(value) for value in values]
+
+
+def _is_folder(kind, attributes) -> bool:
+    if kind:
+        # System.Kind 是多值属性，例如 ('folder',)
+        return "folder" in str(kind).lower()
+    return bool(_safe_int(attributes) & FILE_ATTRIBUTE_DIRECTORY)
+
+
+def _row_columns(values: Dict[str, Sequence]) -> Dict:
+    """把 GetRows 的列数组 (属性名 -> 列) 转换为 ResultBatch.extend_columns() 的参数"""
+    split = [ntpath.split(full_path or "") for full_path in values[PATH_PROPERTY]]
+    sizes = values.get('System.Size')
+    modified = values.get('System.DateModified')
+    created = values.get('System.DateCreated')
+    kinds = values.get('System.Kind')
+    folders = None
+    if kinds is not None:
+        folders = [_is_folder(kind, attributes)
+                   for kind, attributes in zip(kinds, values['System.FileAttributes'])]
+    # 数值列先转换为 array，超出范围时在加入结果之前引发异常
+    return {
+        'filenames': [filename for _, filename in split],
+        'paths': [path for path, _ in split],
+        'sizes': None if sizes is None else array('q', _int_column(sizes)),
+        'created': None if created is None else array('q', _filetime_column(created)),
+        'modified': None if modified is None else array('q', _filetime_column(modified)),
+        'folders': folders,
+    }
+
+
+class WindowsSearchAPI(SearchBackend):
+    """
+    Windows Search API 的 Python 包装类
+
+    Args:
+        provider: 建立 ADO 对象的提供者 (ado_pool.ComADOProvider 的接口)，None 时使用 pywin32；
+            传入时不检查 Windows Search Service
+        count_wait: 页面查询完成后等待计数查询的秒数
+        count_cache_ttl: 查询总数的缓存秒数
+        count_limit: 计数查询最多读取的行数，超过时总数为下限 count_limit + 1
+    """
+
+    name = "windows_search"
+    display_name = "Windows Search"
+    # 每个线程使用自己的 ADO 连接 (COM 在各线程中分别初始化)
+    is_thread_safe = True
+    supports_offset = True
+    # 逐个记录集页面产生批次，事件串流可先送出第一页
+    streams_progressively = True
+
+    def __init__(self, provider=None, count_wait: float = COUNT_WAIT,
+                 count_cache_ttl: float = COUNT_CACHE_TTL, count_limit: int = COUNT_LIMIT):
         self._connection = None
         self._query_helper = None
         self._connected = False
+        self._provider_injected = provider is not None
+        self._pool = ADOConnectionPool(provider=provider)
+
+        # 与页面查询同时执行的计数查询
+        self.count_wait = count_wait
+        self.count_limit = max(int(count_limit), 1)
+        self._count_cache = SearchResultCache(max_entries=256, max_bytes=1024 * 1024,
+                                              ttl=count_cache_ttl)
+        self._count_executor: Optional[ThreadPoolExecutor] = None
+        self._pending_counts: Dict[str, Future] = {}
+        self._count_lock = threading.Lock()
+        self.exact_totals = 0
+        self.estimated_totals = 0
+        self.capped_counts = 0
 
     def _ensure_connection(self):
         """确保与 Windows Search Service 的连接"""
         if self._connected:
             return
 
+        if self._provider_injected:
+            self._connected = True
+            return
+
         if not WIN32_AVAILABLE:
             raise RuntimeError("pywin32 模块未安装，无法使用 Windows Search API")
 
@@ -49,143 +203,259 @@ class WindowsSearchAPI:
             print(f"⚠ Windows Search API 连接失败: {e}")
             raise RuntimeError(f"无法连接到 Windows Search Service: {e}") from e
 
-    def _execute_sql_query(self, sql_query: str, max_results: int = 100) -> List[EverythingSearchResult]:
-        """执行 SQL 查询并返回结果"""
-        results = []
+    def _append_rows(self, results: ResultBatch, properties: List[str], data):
+        """
+        把 GetRows 读取的列数组 (顺序与 properties 相同) 一次加入结果
 
+        整批转换失败时改为逐行转换，只丢弃无法处理的行
+        """
+        values = dict(zip(properties, data))
         try:
-            # 创建连接字符串
-            connection_string = "Provider=Search.CollatorDSO;Extended Properties='Application=Windows';"
-
-            # 创建 ADO 连接
-            connection = win32com.client.Dispatch("ADODB.Connection")
-            connection.Open(connection_string)
-
-            # 创建记录集
-            recordset = win32com.client.Dispatch("ADODB.Recordset")
-            recordset.Open(sql_query, connection)
-
-            count = 0
-            while not recordset.EOF and count < max_results:
-                result = EverythingSearchResult()
-
-                try:
-                    # 获取文件路径
-                    system_path = recordset.Fields(
-                        "System.ItemPathDisplay").Value
-                    if system_path:
-                        result.full_path = system_path
-                        result.path = os.path.dirname(system_path)
-                        result.filename = os.path.basename(system_path)
-
-                        # 获取扩展名
-                        _, ext = os.path.splitext(result.filename)
-                        result.extension = ext.lstrip('.') if ext else ""
-
-                    # 获取文件大小
-                    try:
-                        size_field = recordset.Fields("System.Size")
-                        if size_field and size_field.Value:
-                            result.size = int(size_field.Value)
-                    except (AttributeError, ValueError, TypeError):
-                        result.size = 0
-
-                    # 获取修改日期
-                    try:
-                        date_modified_field = recordset.Fields(
-                            "System.DateModified")
-                        if date_modified_field and date_modified_field.Value:
-                            result.date_modified = date_modified_field.Value
-                    except (AttributeError, ValueError, TypeError):
-                        pass
-
-                    # 获取创建日期
-                    try:
-                        date_created_field = recordset.Fields(
-                            "System.DateCreated")
-                        if date_created_field and date_created_field.Value:
-                            result.date_created = date_created_field.Value
-                    except (AttributeError, ValueError, TypeError):
-                        pass
-
-                    # 检查是文件还是文件夹
-                    try:
-                        kind_field = recordset.Fields("System.Kind")
-                        if kind_field and kind_field.Value:
-                            kind = str(kind_field.Value).lower()
-                            result.is_folder = "folder" in kind
-                            result.is_file = not result.is_folder
-                        else:
-                            # 如果无法确定，根据路径判断
-                            result.is_file = os.path.isfile(
-                                result.full_path) if result.full_path else True
-                            result.is_folder = not result.is_file
-                    except (AttributeError, ValueError, TypeError):
-                        result.is_file = True
-                        result.is_folder = False
-
-                    results.append(result)
-
-                except Exception as field_error:
-                    print(f"处理记录时出错: {field_error}")
-                    continue
-
-                recordset.MoveNext()
-                count += 1
+            columns = _row_columns(values)
+        except Exception:
+            columns = None
+        if columns is not None:
+            results.extend_columns(**columns)
+            return
 
+        for i in range(len(values[PATH_PROPERTY])):
+            try:
+                columns = _row_columns({name: column[i:i + 1] for name, column in values.items()})
+            except Exception as row_error:
+                logger.warning(f"忽略无法处理的记录 {values[PATH_PROPERTY][i]!r}: {row_error}")
+                continue
+            results.extend_columns(**columns)
+
+    def _skip_rows(self, recordset, skip: int) -> int:
+        """只读取路径列来移动游标，返回实际跳过的行数"""
+        skipped = 0
+        while skipped < skip:
+            data = fetch_rows(recordset, min(skip - skipped, _COUNT_CHUNK), PATH_PROPERTY)
+            if data is None:
+                break
+            skipped += len(data[0])
+        return skipped
+
+    def _execute_sql_query(self, sql_query: str, max_results: int = 100,
+                           columns: Optional[FrozenSet[str]] = None,
+                           skip: int = 0) -> Tuple[ResultBatch, int]:
+        """
+        执行 SQL 查询并返回欄式结果 (只读取 columns 中的字段，None 代表全部)
+
+        前 skip 行只读取路径列；查询失败时抛出异常 (search() 不捕获，交给调用端)。
+
+        Returns:
+            (results, rows): 结果与记录集中的总行数 (包含跳过的行)
+        """
+        results = ResultBatch(TIME_BASE_FILETIME, path_separator=_PATH_SEPARATOR)
+        properties = _select_properties(columns)
+
+        recordset = self._pool.open_recordset(sql_query)
+        try:
+            rows = self._skip_rows(recordset, skip)
+
+            if rows == skip and max_results > 0:
+                data = fetch_rows(recordset, max_results)
+                if data is not None:
+                    self._append_rows(results, properties, data)
+                    rows += len(data[0])
+
+            # 多取的一行只用来判断是否还有下一页
+            if not recordset.EOF:
+                rows += 1
+        finally:
             recordset.Close()
-            connection.Close()
 
-        except Exception as e:
-            print(f"SQL 查询执行失败: {e}")
+        return results, rows
 
-        return results
+    def _build_sql(self, query: str, top: Optional[int], columns: Optional[FrozenSet[str]],
+                   ordered: bool = True) -> str:
+        """构建 SQL 查询 (搜索文件名包含查询字符串的文件，top 为 None 时不限行数，计数时不需要排序)"""
+        # 清理查询字符串，避免 SQL 注入
+        clean_query = query.replace("'", "''").strip()
+
+        return f"""
+        SELECT {f'TOP {top}' if top is not None else ''}
+            {', '.join(_select_properties(columns))}
+        FROM SystemIndex 
+        WHERE CONTAINS(System.FileName, '"{clean_query}"')
+           OR System.FileName LIKE '%{clean_query}%'
+        {'ORDER BY System.DateModified DESC' if ordered else ''}
+        """
+
+    def _start_count(self, query: str) -> Optional[Future]:
+        """在计数线程中执行计数查询 (同一查询只执行一次)；进行中的计数过多时返回 None"""
+        key = normalize_query(query)
+        with self._count_lock:
+            future = self._pending_counts.get(key)
+            if future is not None:
+                return future
+            if len(self._pending_counts) >= _MAX_PENDING_COUNTS:
+                return None
+            if self._count_executor is None:
+                self._count_executor = ThreadPoolExecutor(_COUNT_WORKERS, thread_name_prefix='wsearch-count')
+            # 完成后结果存入缓存
+            future = self._count_executor.submit(self._count_cache.count, self, query)
+            self._pending_counts[key] = future
+
+        def forget(_future):
+            with self._count_lock:
+                if self._pending_counts.get(key) is future:
+                    del self._pending_counts[key]
+        future.add_done_callback(forget)
+        return future
+
+    def _tally(self, exact: bool):
+        with self._count_lock:
+            if exact:
+                self.exact_totals += 1
+            else:
+                self.estimated_totals += 1
+
+    def _resolve_total(self, query: str, rows: int, limit: int, cached_total: Optional[int],
+                       count_future: Optional[Future]) -> int:
+        """
+        决定 total_count
 
-    def search(self, query: str, max_results: int = 100) -> Tuple[List[EverythingSearchResult], int]:
+        rows 为页面查询的行数 (包含跳过的行与多取的一行)，limit 为 offset + max_results
+        """
+        if rows <= limit:
+            # 没有多取到的那一行：最后一个结果已在这一页中，行数就是确切的总数
+            self._count_cache.store_count(self, query, rows)
+            self._tally(exact=True)
+            return rows
+
+        total_count = cached_total
+        if total_count is None and count_future is not None:
+            try:
+                total_count = count_future.result(timeout=self.count_wait)[0]
+            except FutureTimeoutError:
+                pass
+            except Exception as e:
+                print(f"Windows Search API 计数查询失败: {e}")
+
+        if total_count is None:
+            # 计数尚未完成：total_count 比 offset + len(results) 多 1，表示还有下一页
+            self._tally(exact=False)
+            return rows
+        self._tally(exact=True)
+        # 两次查询之间索引可能有变动，总数不少于页面查询已看到的行数
+        return max(total_count, rows)
+
+    def _search(self, query: str, max_results: int, fields: Optional[Tuple[str, ...]],
+                offset: int, count_total: bool) -> Tuple[ResultBatch, int]:
+        self._ensure_connection()
+
+        if not query.strip():
+            return ResultBatch(), 0
+
+        columns = required_columns(fields)
+        sql_query = self._build_sql(query, offset + max_results + 1, columns)
+
+        # 已缓存总数时不再计数；否则计数查询与页面查询同时执行
+        cached_total = self._count_cache.cached_count(self, query)
+        count_future = None
+        if cached_total is None and count_total:
+            count_future = self._start_count(query)
+
+        # 查询失败时抛出异常，避免空结果被结果缓存与增量缩小当作确切的 0 个结果
+        results, rows = self._execute_sql_query(sql_query, max_results, columns, offset)
+        total_count = self._resolve_total(query, rows, offset + max_results,
+                                          cached_total, count_future)
+
+        print(f"Windows Search API 找到 {total_count} 个结果")
+        return results, total_count
+
+    def search(self, query: str, max_results: int = 100,
+               fields: Optional[Tuple[str, ...]] = None,
+               offset: int = 0) -> Tuple[ResultBatch, int]:
         """
         执行搜索
 
+        页面查询 (SELECT TOP offset + max_results + 1) 与只读取路径列的计数查询同时执行，
+        计数查询使用另一个线程的连接，结果按查询缓存，翻页时不必重新计数；
+        计数查询最多读取 count_limit + 1 行，匹配更多时 total_count 为下限。
+
         Args:
             query: 搜索查询字符串
             max_results: 最大结果数量
+            fields: 需要的结果字段，只 SELECT 对应的列，None 代表全部
+            offset: 跳过的结果数 (SELECT TOP offset + max_results + 1 后跳过前 offset 行)
 
         Returns:
-            (results, total_count): 搜索结果列表和总结果数
+            (results, total_count): 搜索结果列表和总结果数；计数查询在 count_wait 秒内未完成时，
+            还有下一页的 total_count 为 offset + len(results) + 1
+        """
+        return self._search(query, max_results, fields, offset, count_total=True)
+
+    def search_many(self, queries: Sequence[str], max_results: int = 1,
+                    fields: Optional[Tuple[str, ...]] = None) -> List:
+        """批量查询 (页面字词查找) 只需知道有没有结果，不执行计数查询 (已缓存的总数仍会使用)"""
+        outcomes = []
+        for query in queries:
+            try:
+                outcomes.append(self._search(query, max_results, fields, 0, count_total=False))
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+    def count(self, query: str) -> int:
+        """
+        只 SELECT 路径列，以 GetRows 分块读取并计数
+
+        最多读取 count_limit + 1 行 (SELECT TOP)，避免很短的查询读取数十万条路径；
+        超过 count_limit 时返回 count_limit + 1，表示总数至少有这么多。
         """
         self._ensure_connection()
 
         if not query.strip():
-            return [], 0
+            return 0
 
-        # 清理查询字符串，避免 SQL 注入
-        clean_query = query.replace("'", "''").strip()
+        recordset = self._pool.open_recordset(
+            self._build_sql(query, self.count_limit + 1, frozenset(), ordered=False))
+        try:
+            total_count = 0
+            while True:
+                data = fetch_rows(recordset, _COUNT_CHUNK)
+                if data is None:
+                    break
+                total_count += len(data[0])
+        finally:
+            recordset.Close()
 
-        # 构建 SQL 查询
-        # 搜索文件名包含查询字符串的文件
-        sql_query = f"""
-        SELECT TOP {max_results}
-            System.ItemPathDisplay,
-            System.FileName,
-            System.Size,
-            System.DateModified,
-            System.DateCreated,
-            System.Kind
-        FROM SystemIndex 
-        WHERE CONTAINS(System.FileName, '"{clean_query}"')
-           OR System.FileName LIKE '%{clean_query}%'
-        ORDER BY System.DateModified DESC
+        if total_count > self.count_limit:
+            with self._count_lock:
+                self.capped_counts += 1
+        return total_count
+
+    def iter_search_batches(self, query: str, batch_size: int = 1000,
+                            fields: Optional[Tuple[str, ...]] = None,
+                            max_results: Optional[int] = None) -> Iterator[ResultBatch]:
         """
+        只执行一次查询，边读取记录集边产生批次
 
-        try:
-            results = self._execute_sql_query(sql_query, max_results)
-            total_count = len(results)  # Windows Search API 不容易获取确切的总数
+        第一个批次只读取少量行就送出，让用户尽快看到结果；关闭生成器会关闭记录集。
+        """
+        self._ensure_connection()
 
-            print(f"Windows Search API 找到 {total_count} 个结果")
-            return results, total_count
+        if not query.strip():
+            return
 
-        except Exception as e:
-            print(f"Windows Search API 搜索失败: {e}")
-            return [], 0
+        columns = required_columns(fields)
+        properties = _select_properties(columns)
+        recordset = self._pool.open_recordset(self._build_sql(query, max_results, columns))
+        try:
+            limit = min(batch_size, _FIRST_BATCH_SIZE)
+            while True:
+                data = fetch_rows(recordset, limit)
+                if data is None:
+                    break
+                batch = ResultBatch(TIME_BASE_FILETIME, path_separator=_PATH_SEPARATOR)
+                self._append_rows(batch, properties, data)
+                yield batch
+                limit = batch_size
+        finally:
+            recordset.Close()
 
     def is_windows_search_available(self) -> bool:
         """检查 Windows Search Service 是否可用"""
@@ -195,6 +465,36 @@ class WindowsSearchAPI:
         except Exception:
             return False
 
+    def is_refinement(self, previous: str, query: str) -> bool:
+        """以整个查询字符串匹配文件名，新查询包含旧查询时结果必定是子集"""
+        return is_substring_refinement(previous, query)
+
+    def matches_result(self, result, query: str) -> bool:
+        """与 search() 相同：文件名包含整个查询字符串 (不区分大小写)"""
+        return ' '.join(query.lower().split()) in result.filename.lower()
+
+    def is_available(self) -> bool:
+        """检查后端是否可用"""
+        return self.is_windows_search_available()
+
+    def status(self) -> Dict:
+        with self._count_lock:
+            pending = len(self._pending_counts)
+        return {
+            'connection_pool': self._pool.stats(),
+            'count_cache': self._count_cache.stats(),
+            'pending_counts': pending,
+            'exact_totals': self.exact_totals,
+            'estimated_totals': self.estimated_totals,
+            'count_limit': self.count_limit,
+            'capped_counts': self.capped_counts,
+        }
+
+    def close(self):
+        if self._count_executor is not None:
+            self._count_executor.shutdown(wait=False, cancel_futures=True)
+        self._pool.close()
+
 
 # 创建全局实例
 _windows_search_api = None
@@ -0,0 +1,264 @@
+"""
+HTTP 伺服器引擎
+app.run() 的 Werkzeug 開發伺服器每個連線開一個執行緒、沒有連線上限，
+新版 Werkzeug 也已移除 werkzeug.server.shutdown。這裡依 config.yml 的 server.engine 建立伺服器：
+
+- waitress: 非同步處理連線，固定數量的工作執行緒執行請求 (閒置的 keep-alive 連線不佔用執行緒)
+- werkzeug: Werkzeug 的 WSGI 伺服器加上固定大小的執行緒池 (不需額外套件)
+- development: 原本的 app.run()，支援 debug 與 use_reloader
+
+兩種正式引擎都提供 shutdown()：停止接受新連線、等待進行中的請求完成 (最多 shutdown_timeout 秒) 後結束。
+"""
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Set
+
+SERVER_ENGINES = ('waitress', 'werkzeug', 'development')
+
+DEFAULT_THREADS = 8
+DEFAULT_BACKLOG = 64
+DEFAULT_KEEP_ALIVE = 15
+DEFAULT_SHUTDOWN_TIMEOUT = 5
+
+
+class AppServer:
+    """
+    HTTP 伺服器的共同介面
+
+    Args:
+        app: WSGI 應用程式
+        host / port: 監聽位址
+        threads: 同時執行請求的執行緒數量
+        backlog: 尚未接受的連線佇列長度 (listen backlog)
+        keep_alive: 閒置的 keep-alive 連線保留秒數
+        shutdown_timeout: 關閉時等待進行中請求的秒數
+    """
+    engine = ''
+
+    def __init__(self, app, host: str, port: int, threads: int = DEFAULT_THREADS,
+                 backlog: int = DEFAULT_BACKLOG, keep_alive: float = DEFAULT_KEEP_ALIVE,
+                 shutdown_timeout: float = DEFAULT_SHUTDOWN_TIMEOUT):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.threads = max(int(threads), 1)
+        self.backlog = max(int(backlog), 1)
+        self.keep_alive = keep_alive
+        self.shutdown_timeout = shutdown_timeout
+        self._stopping = threading.Event()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping.is_set()
+
+    def serve_forever(self):
+        """在目前執行緒處理請求，直到 shutdown() 完成"""
+        raise NotImplementedError
+
+    def shutdown(self):
+        """停止接受新連線，等待進行中的請求完成後結束 serve_forever()"""
+        raise NotImplementedError
+
+    def request_shutdown(self, delay: float = 0.1):
+        """
+        在背景執行緒中關閉伺服器 (可在請求處理中呼叫)
+
+        延遲一小段時間，讓呼叫端的回應先送出
+        """
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+
+        def run():
+            time.sleep(delay)
+            self.shutdown()
+        threading.Thread(target=run, name='server-shutdown', daemon=True).start()
+
+    def describe(self) -> Dict:
+        """伺服器設定 (顯示於 /status)"""
+        return {
+            'engine': self.engine,
+            'threads': self.threads,
+            'backlog': self.backlog,
+            'keep_alive': self.keep_alive,
+        }
+
+
+class WaitressServer(AppServer):
+    """waitress 伺服器 (需要安裝 waitress)"""
+    engine = 'waitress'
+
+    def __init__(self, app, host: str, port: int, **options):
+        super().__init__(app, host, port, **options)
+        import logging
+        import waitress
+        # 多個分頁同時查詢時請求短暫排隊是預期的，不必每次都記錄佇列深度警告
+        logging.getLogger('waitress.queue').setLevel(logging.ERROR)
+        self._server = waitress.create_server(
+            app, host=host, port=port, threads=self.threads, backlog=self.backlog,
+            channel_timeout=self.keep_alive, ident='LinkEveryWord')
+
+    def serve_forever(self):
+        self._server.run()
+
+    def _dispatchers(self):
+        # 單一位址時為 TcpWSGIServer，多個位址時為 MultiSocketServer
+        return list((getattr(self._server, 'map', None) or self._server._map).values())
+
+    def shutdown(self):
+        self._stopping.set()
+        from waitress.server import BaseWSGIServer
+        from waitress.wasyncore import close_all
+
+        dispatchers = self._dispatchers()
+        # 停止接受新連線 (readable() 依 accepting 判斷)
+        for dispatcher in dispatchers:
+            if isinstance(dispatcher, BaseWSGIServer):
+                dispatcher.accepting = False
+
+        # 等待工作執行緒完成進行中的請求，之後再等回應送出
+        deadline = time.monotonic() + self.shutdown_timeout
+        self._server.task_dispatcher.shutdown(cancel_pending=False, timeout=self.shutdown_timeout)
+        while time.monotonic() < deadline and any(
+                getattr(dispatcher, 'total_outbufs_len', 0) for dispatcher in self._dispatchers()):
+            time.sleep(0.05)
+
+        # 關閉所有連線後 asyncore 迴圈即結束
+        close_all(getattr(self._server, 'map', None) or self._server._map)
+
+    def describe(self) -> Dict:
+        info = super().describe()
+        info['connections'] = sum(1 for dispatcher in self._dispatchers()
+                                  if hasattr(dispatcher, 'total_outbufs_len'))
+        return info
+
+
+class WerkzeugServer(AppServer):
+    """Werkzeug WSGI 伺服器加上固定大小的執行緒池"""
+    engine = 'werkzeug'
+
+    def __init__(self, app, host: str, port: int, **options):
+        super().__init__(app, host, port, **options)
+        self._server = _make_pooled_server(self)
+
+    def serve_forever(self):
+        # Werkzeug 的 serve_forever() 結束時會關閉監聽 socket
+        self._server.serve_forever()
+
+    def shutdown(self):
+        self._stopping.set()
+        # 結束 accept 迴圈並關閉監聽 socket
+        self._server.shutdown()
+        self._server.drain(self.shutdown_timeout)
+
+    def describe(self) -> Dict:
+        info = super().describe()
+        info['connections'] = len(self._server.connections)
+        return info
+
+
+def _make_pooled_server(owner: WerkzeugServer):
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        """HTTP/1.1 keep-alive；閒置超過 keep_alive 秒的連線由 socket timeout 結束"""
+        protocol_version = 'HTTP/1.1'
+        timeout = owner.keep_alive
+
+        def run_wsgi(self):
+            server = self.server
+            server.mark_busy(self.connection, True)
+            try:
+                super().run_wsgi()
+            finally:
+                server.mark_busy(self.connection, False)
+                if owner.stopping:
+                    # 關閉中：回應送出後不再保留連線
+                    self.close_connection = True
+
+    class PooledWSGIServer(BaseWSGIServer):
+        multithread = True
+        request_queue_size = owner.backlog
+
+        def __init__(self):
+            self.connections: Dict[socket.socket, bool] = {}
+            self._connections_lock = threading.Lock()
+            self._pool = ThreadPoolExecutor(owner.threads, thread_name_prefix='http')
+            self._futures: Set = set()
+            super().__init__(owner.host, owner.port, owner.app, handler=KeepAliveHandler)
+
+        def mark_busy(self, connection, busy: bool):
+            with self._connections_lock:
+                if connection in self.connections:
+                    self.connections[connection] = busy
+
+        def process_request(self, request, client_address):
+            with self._connections_lock:
+                self.connections[request] = False
+            future = self._pool.submit(self._process_request_thread, request, client_address)
+            self._futures.add(future)
+            future.add_done_callback(self._futures.discard)
+
+        def _process_request_thread(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                with self._connections_lock:
+                    self.connections.pop(request, None)
+                self.shutdown_request(request)
+
+        def _close_connections(self, idle_only: bool):
+            with self._connections_lock:
+                targets = [connection for connection, busy in self.connections.items()
+                           if not (idle_only and busy)]
+            for connection in targets:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+        def drain(self, timeout: float):
+            """關閉閒置連線，等待進行中的請求 (最多 timeout 秒)，之後強制關閉剩下的連線"""
+            deadline = time.monotonic() + timeout
+            self._close_connections(idle_only=True)
+            while self._futures and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self._close_connections(idle_only=False)
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    return PooledWSGIServer()
+
+
+def create_server(app, server_config: Dict) -> Optional[AppServer]:
+    """
+    依 server 設定建立伺服器
+
+    Returns:
+        AppServer；使用開發伺服器 (engine 為 development，或開啟 debug / use_reloader) 時返回 None，
+        由呼叫端執行 app.run()
+    """
+    engine = str(server_config.get('engine', 'waitress')).lower()
+    if engine not in SERVER_ENGINES:
+        print(f"⚠ 不支援的伺服器引擎: {engine}，改用 werkzeug")
+        engine = 'werkzeug'
+    if engine == 'development' or server_config.get('debug') or server_config.get('use_reloader'):
+        return None
+
+    options = {
+        'threads': server_config.get('threads', DEFAULT_THREADS),
+        'backlog': server_config.get('backlog', DEFAULT_BACKLOG),
+        'keep_alive': server_config.get('keep_alive', DEFAULT_KEEP_ALIVE),
+        'shutdown_timeout': server_config.get('shutdown_timeout', DEFAULT_SHUTDOWN_TIMEOUT),
+    }
+    host = server_config['host']
+    port = server_config['port']
+    if engine == 'waitress':
+        try:
+            return WaitressServer(app, host, port, **options)
+        except ImportError:
+            print("⚠ waitress 未安裝，改用 Werkzeug 伺服器")
+    return WerkzeugServer(app, host, port, **options)